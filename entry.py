@@ -3,6 +3,7 @@ import os
 import time
 import random
 import argparse
+import multiprocessing
 from datetime import datetime
 
 from PyQt5.QtWidgets import QApplication
@@ -12,6 +13,7 @@ from src.utils.log import Log
 from src.utils.utils import Utils
 from src.ui.ui import ConfigWindow
 from src.core.clock_manager import run_clock
+from src.core.browser_host import serve_browser_host
 from src.utils.const import Key, AppPath
 from src.extend.email_server import send_email_by_result
 
@@ -48,6 +50,8 @@ else:  # Linux和其他系统
             return True, None
 
 if __name__ == '__main__':
+    # 打包后的程序以 spawn 方式启动角度估计进程时需要
+    multiprocessing.freeze_support()
     Log.open()
 
     parser = argparse.ArgumentParser(
@@ -58,6 +62,9 @@ if __name__ == '__main__':
     )
     parser.add_argument("--task_id", help="指定要执行的任务ID")
     parser.add_argument("--headless", action="store_true", help="以无头模式运行（不显示图形界面）")
+    parser.add_argument("--browser-host", action="store_true", help="以浏览器常驻进程运行（由打卡任务自动启动）")
+    parser.add_argument("--host-idle-minutes", type=float, help="浏览器常驻进程空闲多少分钟后退出")
+    parser.add_argument("--host-max-age-minutes", type=float, help="常驻浏览器实例的最长使用时间（分钟）")
     parser.add_argument("--version", action="version", version="%(prog)s 1.0")
     
     # 添加使用示例
@@ -74,6 +81,11 @@ Auto-Clock - 自动打卡工具
     
     args = parser.parse_args()
 
+    if args.browser_host:
+        serve_browser_host(args.host_idle_minutes, args.host_max_age_minutes)
+        Log.close()
+        sys.exit(0)
+
     clean_invalid_windows_plan()
 
     # 修复GUI启动逻辑：只有当没有任何参数时才启动GUI
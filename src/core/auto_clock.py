@@ -1,18 +1,23 @@
 import time
 
 from selenium import webdriver
+from typing import Optional
 from dataclasses import dataclass
 from selenium.webdriver.common.by import By
 from selenium.common import TimeoutException
-from selenium.webdriver.edge.options import Options
 from selenium.webdriver.edge.service import Service
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 
 from src.utils.log import Log
+from src.utils.const import WebPath
 from src.core.clock import clock
 from src.core.login import login
 from src.core.captcha import captcha, Selectors
+from src.core.captcha_screenshot import RetentionPolicy
+from src.core.captcha_service import EstimatorService
+from src.core.browser_host import edge_options, lease_browser, origin_of
+from src.core.session_store import SessionStore, capture_session, restore_session, clear_session
 
 @dataclass
 class Config:
@@ -22,6 +27,26 @@ class Config:
     user_password: str
     captcha_attempts: int = 3
     tolerance: int = 5
+    captcha_controller: str = "legacy"
+    captcha_trajectory: bool = False
+    captcha_reference: bool = False
+    captcha_index: bool = False
+    captcha_calibration: bool = False
+    captcha_inpage: bool = False
+    captcha_parallel_estimators: bool = False
+    captcha_model: bool = False
+    captcha_refresh_confidence: float = 0.0
+    captcha_max_refreshes: int = 3
+    captcha_solver_processes: int = 0
+    screenshot_format: str = "webp"
+    screenshot_keep_days: Optional[float] = 30
+    screenshot_keep_count: Optional[int] = 3000
+    screenshot_keep_mb: Optional[float] = 500
+    screenshot_remove_legacy: bool = False
+    session_reuse: bool = False
+    browser_host: bool = False
+    browser_host_idle_minutes: Optional[float] = None
+    browser_host_max_age_minutes: Optional[float] = None
     wait_time: int = 2
     always_retry: bool = False
     show_web_page: bool = True
@@ -34,35 +59,77 @@ class AutoClock:
         self.wait_time = config.wait_time
         self.captcha_attempts = config.captcha_attempts
         self.tolerance = config.tolerance
+        self.captcha_controller = config.captcha_controller
+        self.captcha_trajectory = config.captcha_trajectory
+        self.captcha_reference = config.captcha_reference
+        self.captcha_index = config.captcha_index
+        self.captcha_calibration = config.captcha_calibration
+        self.captcha_inpage = config.captcha_inpage
+        self.captcha_parallel_estimators = config.captcha_parallel_estimators
+        self.captcha_model = config.captcha_model
+        self.captcha_refresh_confidence = config.captcha_refresh_confidence
+        self.captcha_max_refreshes = config.captcha_max_refreshes
+        self.screenshot_format = config.screenshot_format
+        self.screenshot_retention = RetentionPolicy(
+            max_age_days=config.screenshot_keep_days,
+            max_count=config.screenshot_keep_count,
+            max_bytes=None if config.screenshot_keep_mb is None else int(config.screenshot_keep_mb * 1024 * 1024),
+            remove_legacy=config.screenshot_remove_legacy,
+        )
         self.remote_url = config.remote_url
         self.always_retry = config.always_retry
         self.show_web_page = config.show_web_page
+        self.session_reuse = config.session_reuse
+        self.session_store = None
+        self.browser_host = config.browser_host
+        self.browser_host_idle_minutes = config.browser_host_idle_minutes
+        self.browser_host_max_age_minutes = config.browser_host_max_age_minutes
+        self.lease = None
         self.driver = None
+        # 角度估计进程池在启动浏览器与登录期间完成预热
+        self.solver_service = None
+        if config.captcha_solver_processes > 0:
+            try:
+                self.solver_service = EstimatorService(config.captcha_solver_processes,
+                                                       use_model=self.captcha_model).start()
+            except Exception as e:
+                Log.waring(f"角度估计服务启动失败，改为同步估计: {e}")
+                self.solver_service = None
         try:
             self.driver = self.create_driver()
         except Exception as e:
             Log.error(f"Create driver error: {e}")
+            if self.solver_service is not None:
+                self.solver_service.close()
             raise Exception(f"Failed to create WebDriver: {e}")
 
+    def lease_driver(self):
+        # 从浏览器常驻进程租用预热的会话，失败时返回 None
+        started = time.perf_counter()
+        try:
+            self.lease = lease_browser(self.driver_path, self.show_web_page,
+                                       idle_minutes=self.browser_host_idle_minutes,
+                                       max_age_minutes=self.browser_host_max_age_minutes)
+            driver = self.lease.attach()
+        except Exception as e:
+            Log.waring(f"租用常驻浏览器失败，改为启动新浏览器: {e}")
+            if self.lease is not None:
+                self.lease.release(healthy=False)
+                self.lease = None
+            return None
+        Log.info(f"已租用常驻浏览器: {'预热会话' if self.lease.warm else '新启动'}，"
+                 f"实例已运行 {self.lease.age:.0f}s，耗时 {time.perf_counter() - started:.2f}s")
+        return driver
+
     def create_driver(self):
         # 创建浏览器驱动
-        opts = Options()
-        if not self.show_web_page:
-            opts.add_argument("--headless=new")
-            # 添加headless模式必需的选项
-            opts.add_argument("--no-sandbox")
-            opts.add_argument("--disable-dev-shm-usage")
-            opts.add_argument("--disable-gpu")
-        
-        opts.add_argument("--window-size=1920,1080")
-        opts.add_argument("--start-maximized")
-        opts.add_argument("--enable-logging")
-        opts.add_argument("--v=1")
-        # 禁用一些可能导致问题的功能
-        opts.add_argument("--disable-blink-features=AutomationControlled")
-        
+        if self.browser_host:
+            driver = self.lease_driver()
+            if driver is not None:
+                return driver
+
         service = Service(executable_path=self.driver_path)
-        driver = webdriver.Edge(service=service, options=opts)
+        driver = webdriver.Edge(service=service, options=edge_options(self.show_web_page))
 
         Log.info("create driver successfully")
         return driver
@@ -100,9 +167,24 @@ class AutoClock:
             selectors = Selectors(
                 canvas='#captchaImage',
                 slider='.captcha-root .captcha-control-button',
-                track='.captcha-control-wrap'
+                track='.captcha-control-wrap',
+                # 换图按钮未在考勤页面上核实，不换图
+                refresh=None,
+                success='.captcha-state .captcha-state-icon-success',
+                # 失败状态元素未在考勤页面上核实，不检测，失败时按地址与超时判断
+                failure=None
             )
-            ret, error = captcha(self.driver, selectors=selectors, max_attempts=self.captcha_attempts,tolerance=self.tolerance)
+            ret, error = captcha(self.driver, selectors=selectors, max_attempts=self.captcha_attempts,tolerance=self.tolerance,
+                                 controller=self.captcha_controller, inpage=self.captcha_inpage,
+                                 trajectory=self.captcha_trajectory, use_reference=self.captcha_reference,
+                                 use_index=self.captcha_index, use_calibration=self.captcha_calibration,
+                                 parallel_estimators=self.captcha_parallel_estimators,
+                                 use_model=self.captcha_model,
+                                 refresh_confidence=self.captcha_refresh_confidence,
+                                 max_refreshes=self.captcha_max_refreshes,
+                                 screenshot_format=self.screenshot_format,
+                                 retention=self.screenshot_retention,
+                                 service=self.solver_service)
             if ret:
                 Log.info(f"识别验证码成功。")
             else:
@@ -126,11 +208,66 @@ class AutoClock:
             return False, str(e)
 
     def quit(self):
+        if self.solver_service is not None:
+            self.solver_service.close()
+            self.solver_service = None
+        if self.lease is not None:
+            # 归还给常驻进程，由其清理后保留
+            self.lease.release(origins=[origin_of(self.remote_url)])
+            self.lease = None
+            self.driver = None
         if self.driver:
             self.driver.quit()
 
+    def reuse_session(self):
+        """
+        保存的会话仍有效时跳过登录与验证码直接打卡
+
+        :return: 打卡结果；会话不存在、已过期或打卡页面验证失败时返回 None，需执行完整流程
+        """
+        started = time.perf_counter()
+        injected = False
+        try:
+            self.session_store = SessionStore(self.user_name).load()
+            # 没有未过期的 Cookie 时 restore_session 不会访问页面，也就没有需要清除的内容
+            injected = bool(self.session_store.valid_cookies())
+            valid = restore_session(self.driver, self.session_store, WebPath.NeusoftKQPath, self.remote_url)
+        except Exception as e:
+            Log.waring(f"恢复保存的会话失败: {e}")
+            valid = False
+        if valid:
+            restore_seconds = time.perf_counter() - started
+            Log.info(f"保存的会话仍有效，跳过登录与验证码，耗时 {restore_seconds:.2f}s")
+            ret, error = self.do_clock()
+            if ret:
+                self.session_store.record_run(True, restore_seconds)
+                self.save_session()
+                return ret, error
+            Log.waring(f"复用会话后打卡失败，改为完整登录流程: {error}")
+        else:
+            Log.info("没有可用的保存会话，执行完整登录流程")
+        if injected:
+            clear_session(self.driver)
+        if self.session_store is not None:
+            self.session_store.discard()
+            self.session_store.record_run(False)
+        return None
+
+    def save_session(self):
+        # 在打卡页面保存 Cookie 与 localStorage，文件在流程结束时写入
+        try:
+            cookies, local_storage = capture_session(self.driver)
+            self.session_store.put(cookies, local_storage, self.driver.current_url)
+        except Exception as e:
+            Log.waring(f"保存会话失败: {e}")
+
     def auto_clock(self):
         try:
+            if self.session_reuse:
+                result = self.reuse_session()
+                if result is not None:
+                    return result
+            started = time.perf_counter()
             ret_login = self.auto_login()
             Log.info(f"Login Result: {format(ret_login)}")
             ret, error = self.auto_captcha()
@@ -143,9 +280,16 @@ class AutoClock:
                         Log.info(f"Captcha retry: {format(ret)}, error: {error}")
                 else:
                     return ret, error
+            if self.session_store is not None:
+                self.session_store.record_full(time.perf_counter() - started)
+                self.save_session()
             return self.do_clock()
         except Exception as e:
             return False, str(e)
+        finally:
+            if self.session_store is not None:
+                self.session_store.save()
+                Log.info(self.session_store.summary())
 
     def run(self):
         ok, error = self.auto_clock()
@@ -0,0 +1,584 @@
+import os
+import sys
+import json
+import time
+import uuid
+import signal
+import secrets
+import threading
+import subprocess
+
+from pathlib import Path
+from urllib.parse import urlsplit
+from multiprocessing.connection import Listener, Client
+
+from selenium import webdriver
+from selenium.webdriver.edge.options import Options
+from selenium.webdriver.edge.service import Service
+
+from src.utils.log import Log
+from src.utils.const import AppPath
+
+HOST_STATE_VERSION = 1
+HOST_ADDRESS = ("127.0.0.1", 47615)
+HOST_KEY_FILE = os.path.join(AppPath.DataRoot, "browser_host.key")
+HOST_STATE_FILE = os.path.join(AppPath.DataRoot, "browser_host.json")
+DEFAULT_IDLE_MINUTES = 720
+DEFAULT_MAX_AGE_MINUTES = 1440
+
+def edge_options(show_web_page):
+    opts = Options()
+    if not show_web_page:
+        opts.add_argument("--headless=new")
+        # 添加headless模式必需的选项
+        opts.add_argument("--no-sandbox")
+        opts.add_argument("--disable-dev-shm-usage")
+        opts.add_argument("--disable-gpu")
+
+    opts.add_argument("--window-size=1920,1080")
+    opts.add_argument("--start-maximized")
+    opts.add_argument("--enable-logging")
+    opts.add_argument("--v=1")
+    # 禁用一些可能导致问题的功能
+    opts.add_argument("--disable-blink-features=AutomationControlled")
+    return opts
+
+def origin_of(url):
+    parts = urlsplit(url or "")
+    if parts.scheme not in ("http", "https") or not parts.netloc:
+        return None
+    return f"{parts.scheme}://{parts.netloc}"
+
+def load_key_file(path, size=32):
+    """
+    读取密钥文件，首次使用时生成随机密钥；文件只有当前用户可读（Windows 上依赖用户目录的权限）
+    """
+    try:
+        with open(path, "rb") as f:
+            key = f.read()
+        if len(key) >= size:
+            return key
+    except FileNotFoundError:
+        pass
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    key = secrets.token_bytes(size)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "wb") as f:
+        f.write(key)
+    try:
+        # 并发生成时以先写入的为准
+        os.link(tmp, path)
+    except FileExistsError:
+        with open(path, "rb") as f:
+            key = f.read()
+    except OSError:
+        os.replace(tmp, path)
+    if os.path.exists(tmp):
+        os.remove(tmp)
+    return key
+
+def load_authkey(path=HOST_KEY_FILE):
+    # 常驻进程与租用方共用的连接密钥
+    return load_key_file(path)
+
+def _kill_tree(pid):
+    try:
+        if os.name == 'nt':
+            subprocess.run(["taskkill", "/F", "/T", "/PID", str(pid)], capture_output=True, timeout=10)
+        else:
+            # 驱动以独立进程组启动，浏览器进程在同一组内
+            os.killpg(pid, signal.SIGTERM)
+    except Exception as e:
+        Log.waring(f"结束浏览器进程 {pid} 失败: {e}")
+
+def _is_process(pid, exe):
+    # 只结束确认仍是浏览器驱动的进程，避免 pid 被系统复用后误杀
+    try:
+        if os.name == 'nt':
+            out = subprocess.run(["tasklist", "/FI", f"PID eq {pid}", "/FO", "CSV", "/NH"],
+                                 capture_output=True, text=True, timeout=10).stdout
+            return exe.lower() in out.lower()
+        with open(f"/proc/{pid}/cmdline", "rb") as f:
+            return exe.encode() in f.read()
+    except Exception:
+        return False
+
+class HostedBrowser:
+    """
+    常驻进程持有的一个 Edge 实例及其驱动服务
+
+    :param driver_path: msedgedriver 路径
+    :param headless: 是否无头模式
+    """
+    def __init__(self, driver_path, headless):
+        self.driver_path = driver_path
+        self.headless = headless
+        popen_kw = {} if os.name == 'nt' else {"start_new_session": True}
+        self.service = Service(executable_path=driver_path, popen_kw=popen_kw)
+        self.driver = webdriver.Edge(service=self.service, options=edge_options(not headless))
+        self.created = time.time()
+
+    @property
+    def executor_url(self):
+        return self.service.service_url
+
+    @property
+    def session_id(self):
+        return self.driver.session_id
+
+    @property
+    def capabilities(self):
+        return self.driver.capabilities
+
+    @property
+    def pid(self):
+        return self.service.process.pid if self.service.process else None
+
+    @property
+    def exe(self):
+        return os.path.basename(self.driver_path)
+
+    def healthy(self):
+        try:
+            return self.service.is_connectable() and self.driver.execute_script("return 1") == 1
+        except Exception:
+            return False
+
+    def clean(self, origins=()):
+        """
+        归还后清理：关闭多余窗口、回到空白页、清除 Cookie 与站点存储、恢复默认超时；保留 HTTP 缓存
+        """
+        handles = self.driver.window_handles
+        for handle in handles[1:]:
+            self.driver.switch_to.window(handle)
+            self.driver.close()
+        self.driver.switch_to.window(handles[0])
+        origins = set(filter(None, origins)) | set(filter(None, [origin_of(self.driver.current_url)]))
+        self.driver.get("about:blank")
+        self.driver.execute_cdp_cmd("Network.clearBrowserCookies", {})
+        for origin in origins:
+            self.driver.execute_cdp_cmd("Storage.clearDataForOrigin", {"origin": origin, "storageTypes": "all"})
+        self.driver.implicitly_wait(0)
+        self.driver.set_script_timeout(30)
+        self.driver.set_page_load_timeout(300)
+
+    def close(self):
+        pid = self.pid
+        try:
+            self.driver.quit()
+        except Exception as e:
+            Log.waring(f"关闭浏览器失败，结束进程: {e}")
+            if pid:
+                _kill_tree(pid)
+
+class BrowserHost:
+    """
+    浏览器常驻进程：保持预热的 Edge 实例与驱动服务，通过本地连接（multiprocessing.connection，密钥认证）
+    把干净的会话租给打卡任务。租用方断开即视为归还；归还后清理再放回池中
+
+    :param address: 监听地址
+    :param authkey: 连接密钥
+    :param idle_timeout: 没有租用超过该时间（秒）后退出
+    :param max_age: 浏览器实例的最长使用时间（秒），超过后归还时关闭并重新启动
+    :param health_interval: 空闲实例健康检查间隔（秒）
+    :param state_path: 记录驱动进程号的状态文件，异常退出后下次启动时清理残留进程；None 表示不记录
+    :param factory: 创建浏览器实例的函数 (driver_path, headless) -> HostedBrowser
+    """
+    def __init__(self, address=HOST_ADDRESS, authkey=None, idle_timeout=DEFAULT_IDLE_MINUTES * 60,
+                 max_age=DEFAULT_MAX_AGE_MINUTES * 60, health_interval=60.0, state_path=None, factory=HostedBrowser):
+        self.address = address
+        self.authkey = authkey
+        self.idle_timeout = idle_timeout
+        self.max_age = max_age
+        self.health_interval = health_interval
+        self.state_path = state_path
+        self.factory = factory
+        self.idle = {}
+        self.leased = {}
+        self.keys = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._listener = None
+        self.last_activity = time.time()
+        self.leases = 0
+        self.warm_leases = 0
+        self.recovered = 0
+        self.retired = 0
+
+    # -------------------------------------------------------------------------------------------状态文件
+    def _save_state(self):
+        if not self.state_path:
+            return
+        with self._lock:
+            browsers = [b for pool in self.idle.values() for b in pool] + list(self.leased.values())
+        data = {"version": HOST_STATE_VERSION, "pid": os.getpid(), "address": list(self.address),
+                "drivers": [{"pid": b.pid, "exe": b.exe} for b in browsers if b.pid]}
+        try:
+            os.makedirs(os.path.dirname(self.state_path), exist_ok=True)
+            tmp = f"{self.state_path}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False, indent=4)
+            os.replace(tmp, self.state_path)
+        except Exception as e:
+            Log.waring(f"浏览器常驻进程状态写入失败: {e}")
+
+    def recover_stale(self):
+        # 上一个常驻进程异常退出时留下的驱动与浏览器进程
+        if not self.state_path or not os.path.exists(self.state_path):
+            return 0
+        try:
+            with open(self.state_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except Exception as e:
+            Log.waring(f"浏览器常驻进程状态读取失败: {e}")
+            return 0
+        if data.get("version") != HOST_STATE_VERSION or data.get("pid") == os.getpid():
+            return 0
+        killed = 0
+        for driver in data.get("drivers", []):
+            if _is_process(driver["pid"], driver["exe"]):
+                Log.waring(f"清理上次残留的浏览器驱动进程: {driver['pid']}")
+                _kill_tree(driver["pid"])
+                killed += 1
+        return killed
+
+    # -------------------------------------------------------------------------------------------浏览器池
+    def _create(self, key):
+        started = time.perf_counter()
+        browser = self.factory(*key)
+        Log.info(f"启动浏览器实例: {key[0]} 无头={key[1]}，耗时 {time.perf_counter() - started:.1f}s")
+        return browser
+
+    def _dispose(self, browser, reason):
+        Log.info(f"关闭浏览器实例（{reason}），已使用 {time.time() - browser.created:.0f}s")
+        browser.close()
+
+    def _take_idle(self, key):
+        while True:
+            with self._lock:
+                pool = self.idle.get(key)
+                if not pool:
+                    return None
+                browser = pool.pop()
+            if time.time() - browser.created > self.max_age:
+                self.retired += 1
+                self._dispose(browser, "超过最长使用时间")
+            elif browser.healthy():
+                return browser
+            else:
+                self.recovered += 1
+                self._dispose(browser, "健康检查失败")
+
+    def lease(self, driver_path, headless):
+        """
+        :return: 租用信息；没有空闲实例时启动新实例
+        """
+        key = (driver_path, bool(headless))
+        started = time.perf_counter()
+        browser = self._take_idle(key)
+        warm = browser is not None
+        if browser is None:
+            browser = self._create(key)
+        lease_id = uuid.uuid4().hex
+        with self._lock:
+            self.keys.add(key)
+            self.leased[lease_id] = browser
+            self.leases += 1
+            self.warm_leases += warm
+            self.last_activity = time.time()
+        self._save_state()
+        return {"ok": True, "lease": lease_id, "executor": browser.executor_url, "session_id": browser.session_id,
+                "capabilities": browser.capabilities, "warm": warm, "age": time.time() - browser.created,
+                "seconds": time.perf_counter() - started}
+
+    def release(self, lease_id, healthy=True, origins=()):
+        with self._lock:
+            browser = self.leased.pop(lease_id, None)
+            self.last_activity = time.time()
+        if browser is None:
+            return
+        if not healthy:
+            self.recovered += 1
+            self._dispose(browser, "租用方报告异常")
+        elif time.time() - browser.created > self.max_age:
+            self.retired += 1
+            self._dispose(browser, "超过最长使用时间")
+        else:
+            try:
+                browser.clean(origins)
+                with self._lock:
+                    self.idle.setdefault((browser.driver_path, browser.headless), []).append(browser)
+            except Exception as e:
+                self.recovered += 1
+                self._dispose(browser, f"清理失败: {e}")
+        self._save_state()
+        self._replenish()
+
+    def _replenish(self):
+        # 实例因崩溃或到期被关闭后，保持每种配置至少一个预热实例
+        with self._lock:
+            busy = {(b.driver_path, b.headless) for b in self.leased.values()}
+            missing = [key for key in self.keys if not self.idle.get(key) and key not in busy]
+        for key in missing:
+            if self._stop.is_set():
+                return
+            try:
+                browser = self._create(key)
+            except Exception as e:
+                Log.error(f"重新启动浏览器实例失败: {e}")
+                continue
+            with self._lock:
+                self.idle.setdefault(key, []).append(browser)
+        if missing:
+            self._save_state()
+
+    def check_idle(self):
+        """
+        空闲实例健康检查：崩溃或到期的实例关闭后重新启动
+        """
+        with self._lock:
+            keys = list(self.idle)
+        for key in keys:
+            with self._lock:
+                pool, self.idle[key] = self.idle.get(key, []), []
+            alive = []
+            for browser in pool:
+                if time.time() - browser.created > self.max_age:
+                    self.retired += 1
+                    self._dispose(browser, "超过最长使用时间")
+                elif browser.healthy():
+                    alive.append(browser)
+                else:
+                    self.recovered += 1
+                    self._dispose(browser, "健康检查失败")
+            with self._lock:
+                self.idle[key] = alive + self.idle[key]
+        self._save_state()
+        self._replenish()
+
+    def status(self):
+        with self._lock:
+            return {"pid": os.getpid(), "idle": sum(len(pool) for pool in self.idle.values()),
+                    "leased": len(self.leased), "leases": self.leases, "warm_leases": self.warm_leases,
+                    "recovered": self.recovered, "retired": self.retired,
+                    "idle_seconds": time.time() - self.last_activity}
+
+    # -------------------------------------------------------------------------------------------连接
+    def start(self):
+        """
+        :raise OSError: 地址已被占用（通常是已有常驻进程在运行）
+        """
+        self._listener = Listener(self.address, authkey=self.authkey)
+        self.address = self._listener.address
+        self.recover_stale()
+        self._save_state()
+        return self
+
+    def serve(self):
+        if self._listener is None:
+            self.start()
+        Log.info(f"浏览器常驻进程已启动: {self.address}，空闲 {self.idle_timeout / 60:.0f} 分钟后退出")
+        threading.Thread(target=self._monitor, daemon=True).start()
+        try:
+            while not self._stop.is_set():
+                try:
+                    conn = self._listener.accept()
+                except Exception as e:
+                    if not self._stop.is_set():
+                        Log.waring(f"浏览器常驻进程连接失败: {e}")
+                    continue
+                if self._stop.is_set():
+                    conn.close()
+                    break
+                threading.Thread(target=self._serve_connection, args=(conn,), daemon=True).start()
+        finally:
+            self._shutdown()
+
+    def _serve_connection(self, conn):
+        lease_id = None
+        try:
+            while not self._stop.is_set():
+                try:
+                    request = conn.recv()
+                except (EOFError, OSError):
+                    break
+                op = request.get("op") if isinstance(request, dict) else None
+                if op == "lease" and lease_id is None:
+                    try:
+                        reply = self.lease(request.get("driver_path"), request.get("headless", True))
+                        lease_id = reply["lease"]
+                    except Exception as e:
+                        Log.error(f"租用浏览器失败: {e}")
+                        reply = {"ok": False, "error": str(e)}
+                elif op == "release" and lease_id is not None:
+                    # 先回复，清理在租用方退出后进行
+                    conn.send({"ok": True})
+                    self.release(lease_id, request.get("healthy", True), request.get("origins", ()))
+                    lease_id = None
+                    continue
+                elif op == "ping":
+                    reply = {"ok": True, **self.status()}
+                elif op == "stop":
+                    conn.send({"ok": True})
+                    self.stop()
+                    break
+                else:
+                    reply = {"ok": False, "error": f"无效的请求: {op}"}
+                conn.send(reply)
+        except Exception as e:
+            Log.waring(f"浏览器常驻进程连接异常: {e}")
+        finally:
+            if lease_id is not None:
+                Log.waring("租用方未归还即断开连接，回收浏览器")
+                self.release(lease_id)
+            conn.close()
+
+    def _monitor(self):
+        while not self._stop.wait(self.health_interval):
+            try:
+                self.check_idle()
+            except Exception as e:
+                Log.waring(f"浏览器健康检查失败: {e}")
+            status = self.status()
+            if not status["leased"] and status["idle_seconds"] > self.idle_timeout:
+                Log.info(f"浏览器常驻进程空闲 {status['idle_seconds'] / 60:.0f} 分钟，退出")
+                self.stop()
+
+    def stop(self):
+        if self._stop.is_set():
+            return
+        self._stop.set()
+        # accept 不响应 close，连接一次自身使其返回
+        try:
+            Client(self.address, authkey=self.authkey).close()
+        except Exception:
+            pass
+
+    def _shutdown(self):
+        try:
+            self._listener.close()
+        except Exception:
+            pass
+        with self._lock:
+            browsers = [b for pool in self.idle.values() for b in pool] + list(self.leased.values())
+            self.idle, self.leased = {}, {}
+        for browser in browsers:
+            self._dispose(browser, "常驻进程退出")
+        self._save_state()
+        Log.info(f"浏览器常驻进程已退出: 租用 {self.leases} 次，其中预热 {self.warm_leases} 次，"
+                 f"恢复 {self.recovered} 次，到期 {self.retired} 次")
+
+def serve_browser_host(idle_minutes=None, max_age_minutes=None):
+    """
+    常驻进程入口（entry.py --browser-host）
+    """
+    host = BrowserHost(authkey=load_authkey(), state_path=HOST_STATE_FILE,
+                       idle_timeout=(idle_minutes or DEFAULT_IDLE_MINUTES) * 60,
+                       max_age=(max_age_minutes or DEFAULT_MAX_AGE_MINUTES) * 60)
+    try:
+        host.start()
+    except OSError as e:
+        Log.info(f"浏览器常驻进程已在运行或地址被占用: {e}")
+        return False
+    host.serve()
+    return True
+
+# ---------------------------------------------------------------------------------------------------租用方
+class AttachedDriver(webdriver.Remote):
+    """
+    连接到常驻进程中已有的会话，不新建会话
+    """
+    def __init__(self, executor_url, session_id, capabilities):
+        self._attach_session = (session_id, capabilities)
+        super().__init__(command_executor=executor_url, options=Options())
+
+    def start_session(self, capabilities):
+        self.session_id, self.caps = self._attach_session
+
+class BrowserLease:
+    """
+    租用的浏览器会话；连接保持到归还为止，进程异常退出时常驻进程自动回收
+    """
+    def __init__(self, conn, reply):
+        self.conn = conn
+        self.lease_id = reply["lease"]
+        self.executor = reply["executor"]
+        self.session_id = reply["session_id"]
+        self.capabilities = reply["capabilities"]
+        self.warm = reply["warm"]
+        self.age = reply["age"]
+
+    def attach(self):
+        return AttachedDriver(self.executor, self.session_id, self.capabilities)
+
+    def release(self, healthy=True, origins=()):
+        if self.conn is None:
+            return
+        try:
+            self.conn.send({"op": "release", "healthy": healthy, "origins": list(origins)})
+            if self.conn.poll(5):
+                self.conn.recv()
+        except Exception as e:
+            Log.waring(f"归还浏览器失败: {e}")
+        finally:
+            self.conn.close()
+            self.conn = None
+
+def host_command(idle_minutes=None, max_age_minutes=None):
+    args = ["--browser-host"]
+    if idle_minutes:
+        args.append(f"--host-idle-minutes={idle_minutes}")
+    if max_age_minutes:
+        args.append(f"--host-max-age-minutes={max_age_minutes}")
+    if getattr(sys, 'frozen', False):
+        return [sys.executable] + args
+    return [sys.executable, str(Path(__file__).parent.parent.parent / "entry.py")] + args
+
+def start_host_process(idle_minutes=None, max_age_minutes=None):
+    kwargs = {"stdin": subprocess.DEVNULL, "stdout": subprocess.DEVNULL, "stderr": subprocess.DEVNULL}
+    if os.name == 'nt':
+        kwargs["creationflags"] = subprocess.DETACHED_PROCESS | subprocess.CREATE_NEW_PROCESS_GROUP
+    else:
+        kwargs["start_new_session"] = True
+    # 常驻进程独立于当前任务，任务结束后继续运行
+    return subprocess.Popen(host_command(idle_minutes, max_age_minutes), **kwargs)
+
+def _connect(address, authkey):
+    try:
+        return Client(address, authkey=authkey)
+    except Exception:
+        return None
+
+def lease_browser(driver_path, show_web_page, address=HOST_ADDRESS, authkey=None, autostart=True,
+                  idle_minutes=None, max_age_minutes=None, start_timeout=30.0, lease_timeout=90.0):
+    """
+    从常驻进程租用浏览器会话，常驻进程未运行时启动它
+
+    :return: BrowserLease
+    :raise ConnectionError: 无法连接常驻进程
+    :raise TimeoutError: 常驻进程未在 lease_timeout 内返回会话
+    :raise RuntimeError: 常驻进程启动浏览器失败
+    """
+    authkey = authkey or load_authkey()
+    conn = _connect(address, authkey)
+    if conn is None and autostart:
+        Log.info("浏览器常驻进程未运行，启动中")
+        start_host_process(idle_minutes, max_age_minutes)
+        deadline = time.time() + start_timeout
+        while conn is None and time.time() < deadline:
+            time.sleep(0.2)
+            conn = _connect(address, authkey)
+    if conn is None:
+        raise ConnectionError(f"无法连接浏览器常驻进程: {address}")
+    try:
+        conn.send({"op": "lease", "driver_path": driver_path, "headless": not show_web_page})
+        if not conn.poll(lease_timeout):
+            raise TimeoutError(f"浏览器常驻进程 {lease_timeout:.0f}s 内未返回会话")
+        reply = conn.recv()
+        if not reply.get("ok"):
+            raise RuntimeError(reply.get("error"))
+    except Exception:
+        conn.close()
+        raise
+    return BrowserLease(conn, reply)
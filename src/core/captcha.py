@@ -1,17 +1,29 @@
-import os
 import cv2
 import numpy as np
-import time, base64, io, math, random
+import time, base64, io, math, random, hashlib
 
 from PIL import Image
+from functools import cached_property, lru_cache
+from collections import OrderedDict
 from datetime import datetime
-from dataclasses import dataclass
+from typing import Optional, Callable
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
 from selenium.webdriver.common.by import By
 from selenium.webdriver.common.action_chains import ActionChains
 from selenium.webdriver.support.ui import WebDriverWait
 
 from src.utils.log import Log
-from src.utils.const import AppPath, WebPath
+from src.utils.const import WebPath
+from src.core.captcha_reference import ReferenceLibrary
+from src.core.captcha_index import CaptchaIndex, rotation_invariant_hash
+from src.core.captcha_calibration import SliderCalibration
+from src.core.captcha_controller import create_controller
+from src.core.captcha_trajectory import TrajectoryActions
+from src.core.captcha_inpage import InPageSolver
+from src.core.captcha_verify import CaptchaVerifier
+from src.core.captcha_screenshot import ScreenshotWriter
+from src.core.captcha_model import AngleModel, MODEL_MIN_CONFIDENCE
 
 # ---------------------------------------------------------------------------------------------------获取图片
 def dataurl_to_cv2(data_url):
@@ -38,6 +50,34 @@ def get_canvas_dataurl(driver, selector):
     """
     return driver.execute_script(script, selector)
 
+def get_canvas_raw(driver, selector):
+    # 浏览器端直接读取像素，去掉 alpha 后以 base64 传输 RGB 原始字节，免去 PNG 编解码
+    script = """
+    var el = document.querySelector(arguments[0]);
+    if (!el || !el.getContext) return null;
+    try {
+      var w = el.width, h = el.height;
+      if (!w || !h) return null;
+      var rgba = el.getContext('2d').getImageData(0, 0, w, h).data;
+      var rgb = new Uint8Array(w * h * 3);
+      for (var i = 0, j = 0; i < rgba.length; i += 4, j += 3) {
+        rgb[j] = rgba[i]; rgb[j + 1] = rgba[i + 1]; rgb[j + 2] = rgba[i + 2];
+      }
+      var parts = [];
+      for (var k = 0; k < rgb.length; k += 0x8000) {
+        parts.push(String.fromCharCode.apply(null, rgb.subarray(k, k + 0x8000)));
+      }
+      return [w, h, btoa(parts.join(''))];
+    } catch(e) { return null; }
+    """
+    return driver.execute_script(script, selector)
+
+def raw_to_cv2(raw):
+    w, h, b64 = raw
+    buf = np.frombuffer(base64.b64decode(b64), dtype=np.uint8)
+    # RGB -> BGR 仅为视图，不产生拷贝
+    return buf.reshape(int(h), int(w), 3)[:, :, ::-1]
+
 def element_screenshot_bytes(driver, selector):
     try:
         we = driver.find_element(By.CSS_SELECTOR, selector)
@@ -45,7 +85,33 @@ def element_screenshot_bytes(driver, selector):
     except Exception:
         return None
 
-def get_image(driver, canvas_sel):
+# 最近一次从画布取到的画面，调试截图直接复用，不再单独截图
+_last_frame = None
+
+def last_frame():
+    return _last_frame
+
+def get_image(driver, canvas_sel, raw=True):
+    global _last_frame
+    img = read_image(driver, canvas_sel, raw)
+    if img is not None:
+        _last_frame = img
+    return img
+
+def read_image(driver, canvas_sel, raw=True):
+    img = None
+    if raw:
+        try:
+            data = get_canvas_raw(driver, canvas_sel)
+            if data:
+                img = raw_to_cv2(data)
+                Log.info("使用原始像素获取图片")
+        except Exception as e:
+            Log.waring(f"原始像素解析失败: {e}")
+            img = None
+    if img is not None:
+        return img
+
     dataurl = get_canvas_dataurl(driver, canvas_sel)
     if dataurl:
         try:
@@ -69,59 +135,451 @@ def get_image(driver, canvas_sel):
     else:
         return img
 # ---------------------------------------------------------------------------------------------------获取角度
-def estimate_angle_pca(cv_img):
-    gray = cv2.cvtColor(cv_img, cv2.COLOR_BGR2GRAY)
-    edges = cv2.Canny(gray, 50, 150)
-    ys, xs = np.where(edges > 0)
-    if len(xs) < 20:
+RING_BINS = 360
+RING_MIN_CONFIDENCE = 0.4
+GRAY_WEIGHTS = np.array([[0.114, 0.587, 0.299]], dtype=np.float32)  # BGR 转灰度
+
+@lru_cache(maxsize=16)
+def circular_mask(h, w, ratio):
+    # 按 (尺寸, 半径比例) 缓存的圆形 ROI，半径略小于内切圆以避开圆盘边缘
+    mask = np.zeros((h, w), dtype=np.uint8)
+    cv2.circle(mask, (w // 2, h // 2), max(1, int(min(h, w) / 2 * ratio)), 255, -1)
+    mask.setflags(write=False)
+    return mask
+
+
+class FrameAnalysis:
+    """
+    单帧分析上下文：灰度、边缘、边缘点坐标与上下半区亮度按需计算一次，供各估计器共享；
+    画面先按面积插值缩小到工作分辨率，边缘与统计只在中心圆形区域内进行，排除方形四角与周围控件
+
+    :param work_size: 工作分辨率（长边像素），None 使用类属性 WORK_SIZE，0 表示不缩放
+    :param mask_ratio: 圆形 ROI 半径占内切圆半径的比例，None 使用类属性 MASK_RATIO，0 表示不使用遮罩
+    :param buffers: 预分配的 FrameBuffers，提供时中间结果直接写入其中
+    """
+    WORK_SIZE = 128
+    MASK_RATIO = 0.9
+
+    def __init__(self, img, work_size=None, mask_ratio=None, buffers=None):
+        self.img = img
+        self.work_size = self.WORK_SIZE if work_size is None else work_size
+        self.mask_ratio = self.MASK_RATIO if mask_ratio is None else mask_ratio
+        self.buffers = buffers
+
+    @cached_property
+    def scale(self):
+        return work_scale(self.img.shape, self.work_size)
+
+    @cached_property
+    def contiguous(self):
+        img, buf = self.img, self.buffers
+        if buf is not None and not img.flags.c_contiguous:
+            # 原始像素取图得到的是负步长视图，先拷入连续缓冲区，避免 OpenCV 内部临时拷贝
+            np.copyto(buf.contig, img)
+            return buf.contig
+        return img
+
+    @cached_property
+    def gray(self):
+        img, buf = self.contiguous, self.buffers
+        if self.scale < 1.0:
+            h, w = img.shape[:2]
+            size = (max(1, round(w * self.scale)), max(1, round(h * self.scale)))
+            img = cv2.resize(img, size, dst=buf.small if buf is not None else None, interpolation=cv2.INTER_AREA)
+        return cv2.cvtColor(img, cv2.COLOR_BGR2GRAY, dst=buf.gray if buf is not None else None)
+
+    @cached_property
+    def mask(self):
+        if not self.mask_ratio:
+            return None
+        h, w = self.gray.shape[:2]
+        return circular_mask(h, w, self.mask_ratio)
+
+    @cached_property
+    def edges(self):
+        edges = cv2.Canny(self.gray, 50, 150, edges=self.buffers.edges if self.buffers is not None else None)
+        if self.mask is not None:
+            edges = cv2.bitwise_and(edges, self.mask, dst=edges)
+        return edges
+
+    @cached_property
+    def edge_moments(self):
+        return cv2.moments(self.edges, binaryImage=True)
+
+    @cached_property
+    def polar(self):
+        # 原图分辨率的极坐标灰度展开：行为角度（RING_BINS 份，图像坐标系中顺时针），列为半径（每列 1px）
+        h, w = self.img.shape[:2]
+        radius = min(h, w) // 2
+        buf = self.buffers
+        polar = cv2.warpPolar(self.contiguous, (radius, RING_BINS), (w / 2, h / 2), radius, cv2.INTER_LINEAR,
+                              dst=buf.polar if buf is not None else None)
+        return cv2.transform(polar, GRAY_WEIGHTS, dst=buf.polar_gray if buf is not None else None)
+
+    @cached_property
+    def ring_diff(self):
+        # 各角度、各半径处相邻两圈的灰度差（列 k 对应半径 k + 1）
+        polar = self.polar
+        return cv2.absdiff(polar[:, 2:], polar[:, :-2],
+                           dst=self.buffers.polar_diff if self.buffers is not None else None)
+
+    @cached_property
+    def ring_energy(self):
+        # 各半径处的平均灰度差，内外圆盘接缝处出现尖峰
+        return cv2.reduce(self.ring_diff, 0, cv2.REDUCE_AVG, dtype=cv2.CV_32F)[0]
+
+    @cached_property
+    def half_brightness(self):
+        h = self.gray.shape[0]
+        if self.mask is None:
+            return self.gray[:h // 2].mean(), self.gray[h // 2:].mean()
+        return (cv2.mean(self.gray[:h // 2], self.mask[:h // 2])[0],
+                cv2.mean(self.gray[h // 2:], self.mask[h // 2:])[0])
+
+def work_scale(shape, work_size):
+    longest = max(shape[:2])
+    if not work_size or longest <= work_size:
+        return 1.0
+    return work_size / longest
+
+class FrameBuffers:
+    """
+    按画布尺寸预分配的 连续拷贝/缩放/灰度/边缘/极坐标 缓冲区
+    """
+    def __init__(self, shape, work_size, mask_ratio):
+        h, w = shape[:2]
+        scale = work_scale(shape, work_size)
+        sh, sw = max(1, round(h * scale)), max(1, round(w * scale))
+        self.contig = np.empty(shape, dtype=np.uint8)
+        self.small = np.empty((sh, sw) + tuple(shape[2:]), dtype=np.uint8) if scale < 1.0 else None
+        self.gray = np.empty((sh, sw), dtype=np.uint8)
+        self.edges = np.empty((sh, sw), dtype=np.uint8)
+        radius = min(h, w) // 2
+        self.polar = np.empty((RING_BINS, radius) + tuple(shape[2:]), dtype=np.uint8)
+        self.polar_gray = np.empty((RING_BINS, radius), dtype=np.uint8)
+        self.polar_diff = np.empty((RING_BINS, max(1, radius - 2)), dtype=np.uint8)
+
+class CaptchaSolver:
+    """
+    复用缓冲区的角度估计：按画布尺寸缓存 FrameBuffers，预热后连续帧的估计不再分配图像内存；
+    缓冲区在帧之间复用，上一帧的 FrameAnalysis 在下一帧开始分析后失效
+
+    :param work_size: 工作分辨率，同 FrameAnalysis
+    :param mask_ratio: 圆形 ROI 比例，同 FrameAnalysis
+    :param max_shapes: 最多缓存的画布尺寸数量
+    """
+    def __init__(self, work_size=None, mask_ratio=None, max_shapes=4):
+        self.work_size = FrameAnalysis.WORK_SIZE if work_size is None else work_size
+        self.mask_ratio = FrameAnalysis.MASK_RATIO if mask_ratio is None else mask_ratio
+        self.max_shapes = max_shapes
+        self._buffers = OrderedDict()
+
+    def frame(self, img):
+        buffers = self._buffers.get(img.shape)
+        if buffers is None:
+            buffers = FrameBuffers(img.shape, self.work_size, self.mask_ratio)
+            self._buffers[img.shape] = buffers
+            while len(self._buffers) > self.max_shapes:
+                self._buffers.popitem(last=False)
+        else:
+            self._buffers.move_to_end(img.shape)
+        return FrameAnalysis(img, self.work_size, self.mask_ratio, buffers=buffers)
+
+    def estimate(self, img):
+        return estimate_angle(self.frame(img))
+
+def as_frame(img):
+    return img if isinstance(img, FrameAnalysis) else FrameAnalysis(img)
+
+_ring_layouts = OrderedDict()
+
+def reset_ring_layouts():
+    # 每次验证开始或切换站点（画布布局可能不同）时清空已检测到的接缝半径
+    _ring_layouts.clear()
+
+def _outer_profile(polar, radius, band=3):
+    # 接缝外侧细圆环的归一化灰度曲线；拖动中外圈图片不动，用于确认仍是同一张圆盘验证码
+    if radius + 1 + band > polar.shape[1]:
         return None
-    coords = np.vstack([xs, ys]).T.astype(np.float32)
-    coords_cent = coords - coords.mean(axis=0)
-    cov = np.cov(coords_cent, rowvar=False)
-    vals, vecs = np.linalg.eig(cov)
-    principal = vecs[:, np.argmax(vals)]
-    angle = math.degrees(math.atan2(principal[1], principal[0]))
-    return angle
+    profile = cv2.reduce(polar[:, radius + 1:radius + 1 + band], 1, cv2.REDUCE_AVG, dtype=cv2.CV_32F)[:, 0]
+    std = profile.std()
+    return (profile - profile.mean()) / std if std >= 1e-3 else None
 
-def estimate_angle_hough(cv_img):
-    gray = cv2.cvtColor(cv_img, cv2.COLOR_BGR2GRAY)
-    edges = cv2.Canny(gray, 50, 150)
-    lines = cv2.HoughLines(edges, 1, np.pi/180, 120)
-    if lines is None:
+def detect_ring(cv_img, min_ratio=1.8, min_coverage=0.5, min_match=0.9):
+    """
+    检测内外圆盘布局：某个半径处的径向灰度差明显高于其他半径（内圆盘旋转后与外圈图片的接缝）
+    时返回该半径（原图像素）。接近对齐时接缝变弱，沿用同尺寸画布检测到的半径，
+    但只在接缝外侧的圆环与检测时一致（外圈图片未动，仍是同一张图）时沿用，
+    整图旋转的验证码或换了图片时不会误用
+
+    :param min_ratio: 接缝处灰度差与各半径中位数之比的下限
+    :param min_coverage: 接缝处灰度差高于两侧的角度比例下限（接缝绕满一圈，形状边缘只占少数角度）
+    :param min_match: 沿用半径时，外侧圆环与检测时的相关系数下限
+    """
+    frame = as_frame(cv_img)
+    key = frame.img.shape[:2]
+    energy = frame.ring_energy
+    radius = len(energy) + 2
+    lo, hi = int(radius * 0.25), int(radius * 0.92)
+    if hi - lo >= 8:
+        k = lo + int(np.argmax(energy[lo:hi]))
+        median = float(np.median(energy[lo:hi]))
+        diff = frame.ring_diff
+        if median > 0 and energy[k] / median >= min_ratio and \
+                np.mean(diff[:, k] > np.maximum(diff[:, k - 4], diff[:, k + 4])) >= min_coverage:
+            _ring_layouts[key] = (k + 1, _outer_profile(frame.polar, k + 1))
+            _ring_layouts.move_to_end(key)
+            while len(_ring_layouts) > 8:
+                _ring_layouts.popitem(last=False)
+            return k + 1
+    cached = _ring_layouts.get(key)
+    if cached is None or cached[1] is None:
         return None
-    angles = []
-    for l in lines[:,0]:
-        theta = l[1]
-        angle = math.degrees(theta) - 90
-        angles.append(angle)
-    if not angles:
+    profile = _outer_profile(frame.polar, cached[0])
+    if profile is None or float(np.dot(profile, cached[1])) / len(profile) < min_match:
         return None
-    return float(np.median(angles))
-
-def estimate_angle_normal(img):
-    # 粗粒度旋转对比 (示例：按 10° 样本选择锐度最佳)
-    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-    best = None;
-    best_score = -1e9
-    for a in range(0, 360, 10):
-        M = cv2.getRotationMatrix2D((img.shape[1] / 2, img.shape[0] / 2), a, 1.0)
-        rot = cv2.warpAffine(gray, M, (img.shape[1], img.shape[0]), flags=cv2.INTER_LINEAR,
+    return cached[0]
+
+def estimate_angle_ring(cv_img, band=3):
+    """
+    内外圆盘布局的角度估计：在接缝内外各取一条细圆环的灰度曲线，一次 FFT 循环互相关，
+    峰值位置即内圆盘相对外圈图片的旋转角度
+
+    :param band: 每条圆环的宽度（px）
+    :return: (角度, 置信度)，置信度为峰值处的归一化相关系数；不是圆盘布局时返回 (None, 0.0)
+    """
+    frame = as_frame(cv_img)
+    radius = detect_ring(frame)
+    polar = frame.polar
+    if radius is None or radius - band < 1 or radius + 1 + band > polar.shape[1]:
+        return None, 0.0
+    inner = cv2.reduce(polar[:, radius - band:radius], 1, cv2.REDUCE_AVG, dtype=cv2.CV_32F)[:, 0]
+    outer = cv2.reduce(polar[:, radius + 1:radius + 1 + band], 1, cv2.REDUCE_AVG, dtype=cv2.CV_32F)[:, 0]
+    inner_std, outer_std = inner.std(), outer.std()
+    if inner_std < 1e-3 or outer_std < 1e-3:
+        return None, 0.0
+    inner = (inner - inner.mean()) / inner_std
+    outer = (outer - outer.mean()) / outer_std
+    corr = np.fft.irfft(np.fft.rfft(outer) * np.conj(np.fft.rfft(inner)), n=RING_BINS) / RING_BINS
+
+    peak = int(np.argmax(corr))
+    c_lo, c0, c_hi = corr[peak - 1], corr[peak], corr[(peak + 1) % RING_BINS]
+    denom = c_lo - 2 * c0 + c_hi
+    shift = peak + (0.5 * (c_lo - c_hi) / denom if denom < 0 else 0.0)
+    # 内圆盘在图像坐标系中转过 shift 格，与其他估计器同一约定取负
+    return normalize_angle(-shift * 360 / RING_BINS), max(0.0, float(c0))
+
+def estimate_angle_pca(cv_img):
+    # 边缘点的主方向：由二阶中心矩直接求协方差主轴，不生成坐标数组；
+    # 置信度为特征值之差与之和的比 (λ1 - λ2) / (λ1 + λ2)，边缘点各向同性时趋于 0
+    m = as_frame(cv_img).edge_moments
+    if m["m00"] < 20:
+        return None, 0.0
+    spread = m["mu20"] + m["mu02"]
+    confidence = math.hypot(m["mu20"] - m["mu02"], 2 * m["mu11"]) / spread if spread > 0 else 0.0
+    return math.degrees(0.5 * math.atan2(2 * m["mu11"], m["mu20"] - m["mu02"])), confidence
+
+def estimate_angle_hough(cv_img):
+    frame = as_frame(cv_img)
+    # 票数阈值随工作分辨率缩放（原图 120 票）
+    lines = cv2.HoughLines(frame.edges, 1, np.pi/180, max(30, int(120 * frame.scale)))
+    if lines is None:
+        return None, 0.0
+    angles = np.degrees(lines[:, 0, 1]) - 90
+    if not len(angles):
+        return None, 0.0
+    angle = float(np.median(angles))
+    # 置信度为与中位方向相差 5° 以内（180° 周期）的直线比例
+    diff = (angles - angle) % 180
+    confidence = float(np.mean(np.minimum(diff, 180 - diff) <= 5))
+    return angle, confidence
+
+def peak_contrast(scores):
+    # 得分曲线的峰值对比度 (最大值 - 中位数) / 最大值：各角度得分接近时趋于 0
+    best = float(np.max(scores))
+    return (best - float(np.median(scores))) / best if best > 0 else 0.0
+
+class RotationEngine:
+    """
+    旋转搜索引擎：按 (画布尺寸, 角度集合) 预计算并缓存 remap 网格，
+    一次 remap 生成所有候选角度的旋转图，再用批量 numpy 计算锐度得分；
+    search 在图像金字塔上由粗到细搜索，只在最后几步使用原图
+
+    :param step: 角度分辨率（度），默认 10°
+    :param max_cache: 最多缓存的网格数量
+    """
+    def __init__(self, step=10, max_cache=8):
+        self.step = step
+        self.max_cache = max_cache
+        self._cache = OrderedDict()
+        self._buffers = {}
+        self.cost = 0
+        self.last_cost = 0.0
+        self.last_contrast = 0.0
+
+    def _buffer(self, name, shape, dtype=np.uint8):
+        # 按 (用途, 尺寸) 复用的输出缓冲区
+        key = (name, shape)
+        buf = self._buffers.get(key)
+        if buf is None:
+            if len(self._buffers) >= self.max_cache * 4:
+                self._buffers.clear()
+            buf = self._buffers[key] = np.empty(shape, dtype=dtype)
+        return buf
+
+    def angles(self, step=None):
+        step = step or self.step
+        return tuple(float(a) for a in np.arange(0, 360, step))
+
+    def get_maps(self, shape, angles):
+        key = (shape[0], shape[1], tuple(angles))
+        maps = self._cache.get(key)
+        if maps is not None:
+            self._cache.move_to_end(key)
+            return maps
+
+        h, w = shape[:2]
+        # 每个角度占 h + 2 行：首尾各补一行 reflect-101 镜像行，整体做一次拉普拉斯时各块互不干扰
+        rows = np.concatenate(([1], np.arange(h), [h - 2])).astype(np.float32)
+        xs, ys = np.meshgrid(np.arange(w, dtype=np.float32), rows)
+        tile_h = h + 2
+        map_x = np.empty((len(angles) * tile_h, w), dtype=np.float32)
+        map_y = np.empty((len(angles) * tile_h, w), dtype=np.float32)
+        for i, a in enumerate(angles):
+            # 与 warpAffine 一致：目标像素反算回源图坐标
+            M = cv2.getRotationMatrix2D((w / 2, h / 2), a, 1.0)
+            inv = cv2.invertAffineTransform(M)
+            map_x[i * tile_h:(i + 1) * tile_h] = inv[0, 0] * xs + inv[0, 1] * ys + inv[0, 2]
+            map_y[i * tile_h:(i + 1) * tile_h] = inv[1, 0] * xs + inv[1, 1] * ys + inv[1, 2]
+        maps = cv2.convertMaps(map_x, map_y, cv2.CV_16SC2)
+
+        self._cache[key] = maps
+        while len(self._cache) > self.max_cache:
+            self._cache.popitem(last=False)
+        return maps
+
+    def _rotate_tiles(self, gray, angles, reuse=True):
+        h, w = gray.shape[:2]
+        map1, map2 = self.get_maps(gray.shape, angles)
+        dst = self._buffer("tiles", map1.shape[:2]) if reuse else None
+        stacked = cv2.remap(gray, map1, map2, cv2.INTER_LINEAR, dst=dst, borderMode=cv2.BORDER_REPLICATE)
+        return stacked, h + 2
+
+    def rotate_all(self, gray, angles):
+        stacked, tile_h = self._rotate_tiles(gray, angles, reuse=False)
+        return stacked.reshape(len(angles), tile_h, -1)[:, 1:-1]
+
+    def scores(self, gray, angles, mask_ratio=0):
+        stacked, tile_h = self._rotate_tiles(gray, angles)
+        # 整体一次拉普拉斯（等价于逐张 cv2.Laplacian ksize=1；uint8 输入时 int16 不会溢出）
+        lap = cv2.Laplacian(stacked, cv2.CV_16S, dst=self._buffer("tiles_lap", stacked.shape, np.int16))
+        lap = lap.reshape(len(angles), tile_h, -1)[:, 1:-1]
+        # 逐块求方差（只统计圆形 ROI 内的像素），不产生整块的类型转换副本
+        mask = circular_mask(gray.shape[0], gray.shape[1], mask_ratio) if mask_ratio else None
+        return np.array([cv2.meanStdDev(tile, mask=mask)[1][0, 0] ** 2 for tile in lap])
+
+    def best_angle(self, gray, step=None, mask_ratio=0):
+        angles = self.angles(step)
+        scores = self.scores(gray, angles, mask_ratio)
+        self.last_contrast = peak_contrast(scores)
+        return angles[int(np.argmax(scores))]
+
+    def score_one(self, gray, angle, mask_ratio=0):
+        # 单个任意角度直接 warpAffine，不进网格缓存（得分与 scores 一致）
+        h, w = gray.shape[:2]
+        M = cv2.getRotationMatrix2D((w / 2, h / 2), angle, 1.0)
+        rot = cv2.warpAffine(gray, M, (w, h), dst=self._buffer("rot", (h, w)), flags=cv2.INTER_LINEAR,
                              borderMode=cv2.BORDER_REPLICATE)
-        score = cv2.Laplacian(rot, cv2.CV_64F).var()
-        if score > best_score:
-            best_score = score
-            best = a
-    angle = best
-    return angle
+        self.cost += h * w
+        lap = cv2.Laplacian(rot, cv2.CV_16S, dst=self._buffer("rot_lap", (h, w), np.int16))
+        _, std = cv2.meanStdDev(lap, mask=circular_mask(h, w, mask_ratio) if mask_ratio else None)
+        return float(std[0, 0] ** 2)
 
-def correct_angle_with_semantics(cv_img, angle):
-    h, w = cv_img.shape[:2]
-    top_half = cv_img[:h // 2, :]
-    bottom_half = cv_img[h // 2:, :]
+    def golden_section(self, gray, lo, hi, width, mask_ratio=0):
+        # 黄金分割搜索区间内的得分最大值，直到区间宽度不超过 width；
+        # 区间中点（上一层的最优角度）同时参与比较，0°/90° 等无插值角度的尖峰不会被跳过
+        ratio = (math.sqrt(5) - 1) / 2
+        center = (lo + hi) / 2
+        f_center = self.score_one(gray, center, mask_ratio)
+        a, b = lo + (1 - ratio) * (hi - lo), lo + ratio * (hi - lo)
+        fa, fb = self.score_one(gray, a, mask_ratio), self.score_one(gray, b, mask_ratio)
+        while hi - lo > width:
+            if fa >= fb:
+                hi, b, fb = b, a, fa
+                a = lo + (1 - ratio) * (hi - lo)
+                fa = self.score_one(gray, a, mask_ratio)
+            else:
+                lo, a, fa = a, b, fb
+                b = lo + ratio * (hi - lo)
+                fb = self.score_one(gray, b, mask_ratio)
+        return max((center, f_center), (a, fa), (b, fb), key=lambda r: r[1])
+
+    def search(self, gray, coarse_step=15, candidates=4, min_size=32, precision=1.0, mask_ratio=0):
+        """
+        由粗到细的多分辨率搜索：金字塔顶层按 coarse_step 网格打分，取得分最高的几个候选，
+        中间层用黄金分割缩小各候选区间，原图上先比较各候选再对最优者细化，最后抛物线插值得到亚度级角度
+
+        :param coarse_step: 顶层网格间隔（度）
+        :param candidates: 顶层保留的候选数量
+        :param min_size: 金字塔顶层的最小边长
+        :param precision: 原图上黄金分割的终止区间宽度（度）
+        :param mask_ratio: 圆形 ROI 半径比例，0 表示统计整幅图
+        :return: 角度 [0, 360)；本次开销（折合原图旋转次数）记录在 last_cost，顶层得分的峰值对比度记录在 last_contrast
+        """
+        h, w = gray.shape[:2]
+        pyramid = [gray]
+        while min(pyramid[-1].shape[:2]) // 2 >= min_size:
+            ph, pw = pyramid[-1].shape[:2]
+            size = ((ph + 1) // 2, (pw + 1) // 2)
+            pyramid.append(cv2.pyrDown(pyramid[-1], dst=self._buffer(f"pyramid{len(pyramid)}", size)))
+        self.cost = 0
+
+        top = pyramid[-1]
+        angles = self.angles(coarse_step)
+        scores = self.scores(top, angles, mask_ratio)
+        self.last_contrast = peak_contrast(scores)
+        self.cost += len(angles) * top.shape[0] * top.shape[1]
+        order = np.argsort(scores)[::-1][:candidates]
+        brackets = [(angles[i] - coarse_step, angles[i] + coarse_step) for i in order]
+
+        # 中间层：每层把区间缩到上一层的约 1/5
+        span = coarse_step
+        for level in pyramid[-2:0:-1]:
+            span = max(span / 5, precision * 2)
+            results = [self.golden_section(level, lo, hi, span, mask_ratio) for lo, hi in brackets]
+            brackets = [(a - span, a + span) for a, _ in results]
 
+        # 原图：低分辨率下 0°/90°/180°/270° 等得分接近，候选在原图上决出后只细化最优者
+        if len(brackets) > 1:
+            centers = [self.score_one(gray, (lo + hi) / 2, mask_ratio) for lo, hi in brackets]
+            brackets = [brackets[int(np.argmax(centers))]]
+        best, f0 = self.golden_section(gray, *brackets[0], precision, mask_ratio)
+
+        # 抛物线插值
+        delta = precision / 2
+        f_lo, f_hi = self.score_one(gray, best - delta, mask_ratio), self.score_one(gray, best + delta, mask_ratio)
+        denom = f_lo - 2 * f0 + f_hi
+        if denom < 0:
+            best += delta * (f_lo - f_hi) / (2 * denom)
+        self.last_cost = self.cost / (h * w)
+        return round(best, 3) % 360
+
+_rotation_engine = RotationEngine()
+_captcha_solver = CaptchaSolver()
+
+def estimate_angle_normal(img, step=None):
+    # 旋转锐度对比：指定 step 时按固定网格采样（原有方式），否则由粗到细多分辨率搜索，精度到亚度级；
+    # 置信度为网格（或金字塔顶层）得分的峰值对比度
+    frame = as_frame(img)
+    if step is not None:
+        angle = _rotation_engine.best_angle(frame.gray, step, frame.mask_ratio)
+    else:
+        angle = _rotation_engine.search(frame.gray, mask_ratio=frame.mask_ratio)
+    return angle, _rotation_engine.last_contrast
+
+def correct_angle_with_semantics(cv_img, angle):
     # 计算图片上下两部分亮度均值, 区别天空与地面）
-    top_brightness = cv2.cvtColor(top_half, cv2.COLOR_BGR2GRAY).mean()
-    bottom_brightness = cv2.cvtColor(bottom_half, cv2.COLOR_BGR2GRAY).mean()
+    top_brightness, bottom_brightness = as_frame(cv_img).half_brightness
 
     if top_brightness < bottom_brightness - 10:
         angle = (angle + 180) % 360
@@ -130,17 +588,158 @@ def correct_angle_with_semantics(cv_img, angle):
 def normalize_angle(angle):
     return ((angle + 180) % 360) - 180
 
-def estimate_angle(img):
-    angle = estimate_angle_pca(img)
-    Log.info(f"PCA 检测角度: {angle}")
-    if angle is None:
-        angle = estimate_angle_hough(img)
-        Log.info(f"Hough 检测角度: {angle}")
+@dataclass
+class AngleEstimator:
+    """
+    :param name: 名称（日志与统计用）
+    :param func: 估计函数，输入 FrameAnalysis，返回 (角度, 置信度)
+    :param threshold: 置信度达到此值时直接采用，不再运行后续估计器
+    :param absolute: 角度是否为绝对方向（不做亮度分布修正，也不参与 180° 周期的加权合成）
+    """
+    name: str
+    func: Callable
+    threshold: float
+    absolute: bool = False
+
+@dataclass
+class EstimatorStats:
+    """
+    :param calls: 运行次数
+    :param hits: 置信度达到阈值的次数
+    :param misses: 未给出角度的次数
+    :param total_ms: 累计耗时
+    """
+    calls: int = 0
+    hits: int = 0
+    misses: int = 0
+    total_ms: float = 0.0
+
+    def summary(self):
+        if not self.calls:
+            return "未运行"
+        return f"运行 {self.calls} 次，命中率 {self.hits / self.calls:.0%}，无结果 {self.misses} 次，" \
+               f"平均耗时 {self.total_ms / self.calls:.1f}ms"
+
+@dataclass
+class AngleEstimate:
+    angle: Optional[float]
+    confidence: float = 0.0
+    source: Optional[str] = None
+    absolute: bool = False
+
+def default_estimators():
+    return [
+        AngleEstimator("ring", estimate_angle_ring, RING_MIN_CONFIDENCE, absolute=True),
+        AngleEstimator("pca", estimate_angle_pca, 0.5),
+        AngleEstimator("hough", estimate_angle_hough, 0.6),
+        AngleEstimator("normal", estimate_angle_normal, 0.3),
+    ]
+
+class AngleEnsemble:
+    """
+    按置信度组合多个估计器：依次运行，第一个置信度达到阈值的结果直接采用，后续估计器不再运行；
+    都未达到时按置信度对方向做 180° 周期的加权平均。
+    parallel 时各估计器在线程池中同时运行（OpenCV 计算期间释放 GIL），全部完成后按同样规则选取
+
+    :param estimators: AngleEstimator 列表，按优先级排列
+    :param parallel: 是否并发运行
+    :param max_workers: 线程池大小
+    """
+    def __init__(self, estimators=None, parallel=False, max_workers=3):
+        self.estimators = list(estimators) if estimators is not None else default_estimators()
+        self.parallel = parallel
+        self.max_workers = max_workers
+        self.stats = {e.name: EstimatorStats() for e in self.estimators}
+        self._executor = None
+
+    def _run(self, estimator, frame):
+        started = time.perf_counter()
+        try:
+            angle, confidence = estimator.func(frame)
+        except Exception as e:
+            Log.waring(f"{estimator.name} 估计出错: {e}")
+            angle, confidence = None, 0.0
+        elapsed = (time.perf_counter() - started) * 1000
+        stats = self.stats.setdefault(estimator.name, EstimatorStats())
+        stats.calls += 1
+        stats.total_ms += elapsed
+        if angle is None:
+            stats.misses += 1
+        elif confidence >= estimator.threshold:
+            stats.hits += 1
+        Log.info(f"{estimator.name} 检测角度: {angle}，置信度 {confidence:.2f}，耗时 {elapsed:.1f}ms")
+        return angle, confidence
+
+    def _results(self, frame):
+        if not self.parallel:
+            for estimator in self.estimators:
+                yield (estimator,) + self._run(estimator, frame)
+            return
+        # 共享的灰度与边缘先在当前线程算好，各线程只读；等全部完成再返回，下一帧复用缓冲区时不会有线程仍在读取
+        frame.edges
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="estimator")
+        futures = [self._executor.submit(self._run, estimator, frame) for estimator in self.estimators]
+        results = [(estimator,) + future.result() for estimator, future in zip(self.estimators, futures)]
+        yield from results
+
+    def estimate(self, img):
+        frame = as_frame(img)
+        results = []
+        for estimator, angle, confidence in self._results(frame):
+            if angle is None:
+                continue
+            if confidence >= estimator.threshold:
+                return AngleEstimate(angle, confidence, estimator.name, estimator.absolute)
+            results.append((estimator, angle, confidence))
+        if not results:
+            return AngleEstimate(None)
+
+        # 置信度都不足：绝对方向的结果只在没有其他结果时使用，其余按置信度加权（方向取两倍角平均）
+        axial = [r for r in results if not r[0].absolute] or results
+        total = sum(confidence for _, _, confidence in axial)
+        if total <= 0:
+            estimator, angle, confidence = axial[-1]
+            return AngleEstimate(angle, confidence, estimator.name, estimator.absolute)
+        s = sum(c * math.sin(math.radians(2 * a)) for _, a, c in axial)
+        c = sum(c * math.cos(math.radians(2 * a)) for _, a, c in axial)
+        angle = math.degrees(0.5 * math.atan2(s, c))
+        return AngleEstimate(angle, math.hypot(s, c) / len(axial), "weighted")
+
+    def add(self, estimator, index=None):
+        # 替换同名估计器；index 为插入位置（优先级），None 表示放在最后
+        self.remove(estimator.name)
+        self.estimators.insert(len(self.estimators) if index is None else index, estimator)
+        self.stats.setdefault(estimator.name, EstimatorStats())
+
+    def remove(self, name):
+        self.estimators = [e for e in self.estimators if e.name != name]
+
+    def summary(self):
+        return "；".join(f"{name}: {stats.summary()}" for name, stats in self.stats.items())
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+_angle_ensemble = AngleEnsemble()
+_screenshot_writer = ScreenshotWriter()
+
+def estimate_angle(img, ensemble=None):
+    # 一帧只做一次灰度转换与边缘检测，所有估计器共享
+    frame = as_frame(img)
+    result = (ensemble or _angle_ensemble).estimate(frame)
+    angle = result.angle
     if angle is None:
-        angle = estimate_angle_normal(img)
-        Log.info(f"normal 检测角度: {angle}")
+        Log.waring("所有估计器均未给出角度")
+        return None
+    Log.info(f"采用 {result.source} 角度: {angle}，置信度 {result.confidence:.2f}")
+    if result.absolute:
+        # 内外圆盘布局：圆环相关给出的是相对外圈的绝对角度
+        return normalize_angle(angle)
 
-    angle = correct_angle_with_semantics(img, angle)
+    angle = correct_angle_with_semantics(frame, angle)
     Log.info(f"根据亮度分布修正角度: {angle}")
 
     angle = normalize_angle(angle)
@@ -148,60 +747,235 @@ def estimate_angle(img):
     return angle
 
 # ---------------------------------------------------------------------------------------------------执行滑动
-def dynamic_adjust_drag(actions, driver, slider_elem, track_sel, canvas_sel, max_steps=20, tolerance=3):
-    actions.click_and_hold(slider_elem).perform()
-    moved = 0
+def frame_hash(img):
+    return hashlib.blake2b(np.ascontiguousarray(img).data, digest_size=16).hexdigest()
+
+class FrameStream:
+    """
+    验证码画面流：每次取图按内容哈希去重，画面未变化时直接复用上一次的角度估计
+
+    :param driver: WebDriver
+    :param canvas_sel: 画布选择器
+    :param service: EstimatorService，指定时画面交给估计进程池，submit 立即返回
+    """
+    def __init__(self, driver, canvas_sel, estimator=None, service=None):
+        self.driver = driver
+        self.canvas_sel = canvas_sel
+        self.estimator = estimator or _captcha_solver.estimate
+        self.service = service
+        self.last_img = None
+        self.last_hash = None
+        self.last_angle = None
+        self.captured = 0
+        self.analysed = 0
+
+    def _finish(self, digest, angle):
+        self.last_angle = angle
+        self.last_hash = digest
+        self.analysed += 1
+        return angle
+
+    def submit(self):
+        """
+        取图并开始估计
+
+        :return: 返回角度的函数；有估计服务且有空闲缓冲区时，调用该函数才等待结果
+        """
+        img = get_image(self.driver, self.canvas_sel)
+        self.captured += 1
+        if img is None:
+            return lambda: None
+        self.last_img = img
+        digest = frame_hash(img)
+        if digest == self.last_hash:
+            Log.info("画面未变化，复用上一次角度估计")
+            angle = self.last_angle
+            return lambda: angle
+
+        # 估计失败时不保留旧哈希，避免同一画面复用过期角度
+        self.last_hash = None
+        future = self.service.submit(img) if self.service is not None else None
+        if future is None:
+            angle = self._finish(digest, self.estimator(img))
+            return lambda: angle
+
+        def result():
+            try:
+                angle = future.result(timeout=5)[0]
+                Log.info(f"估计服务检测角度: {angle}")
+            except Exception as e:
+                Log.waring(f"估计服务出错，改为同步估计: {e}")
+                angle = self.estimator(img)
+            return self._finish(digest, angle)
+        return result
+
+    def capture(self):
+        return self.submit()()
+
+@dataclass
+class DragTelemetry:
+    """
+    单次拖动的遥测数据
+
+    :param track_width: 轨道宽度（px）
+    :param samples: 每次移动的 (移动像素, 移动前角度, 移动后角度)
+    :param angles: 依次估计到的角度
+    :param controller: 步长控制方式
+    :param steps_to_tolerance: 进入阈值前的移动次数，未收敛为 None
+    :param estimator: 角度的来源，"ensemble" 为默认估计器，"reference" 为参考图匹配
+    """
+    track_width: int = 0
+    samples: list = field(default_factory=list)
+    angles: list = field(default_factory=list)
+    controller: str = "legacy"
+    steps_to_tolerance: Optional[int] = None
+    estimator: str = "ensemble"
+
+    def to_dict(self, **extra):
+        # 截图旁的遥测记录（numpy 数值转为内置类型，便于 JSON 序列化）
+        return dict(
+            track_width=int(self.track_width),
+            samples=[[float(v) for v in sample] for sample in self.samples],
+            angles=[float(a) for a in self.angles],
+            controller=self.controller,
+            steps_to_tolerance=self.steps_to_tolerance,
+            estimator=self.estimator,
+            **extra,
+        )
+
+    def record(self, dx, before, after):
+        if after is not None:
+            self.angles.append(after)
+        if dx and before is not None and after is not None:
+            self.samples.append((dx, before, after))
+
+# 使用估计服务时，移动后等待画面重绘的时间（其余停顿与估计重叠）
+SERVICE_SETTLE_DELAY = 0.05
+
+def get_track_width(driver, track_sel):
     track_w = driver.execute_script("var el=document.querySelector(arguments[0]); if(!el) return 0; return el.getBoundingClientRect().width;",track_sel)
-    max_possible_x = int(track_w) if track_w else 300  # 轨道最大宽度
-    correct_direction = 1  # 1:向右为正确方向；-1:向左为正确方向（默认向右）
+    return int(track_w) if track_w else 300  # 轨道最大宽度
 
-    for step in range(max_steps):
-        # 计算当前角度
-        current_angle = None
-        try:
-            img = get_image(driver, canvas_sel)
-            current_angle = estimate_angle(img)
-        except Exception as e:
-            Log.waring(f"角度计算失败：{e}")
+def dynamic_adjust_drag(actions, driver, slider_elem, track_sel, canvas_sel, max_steps=20, tolerance=3,
+                        estimator=None, held=False, moved=0, direction=1, calibration=None, telemetry=None,
+                        controller="legacy", settle=1, service=None):
+    # held/moved/direction: 由其他拖动方式接手时，滑块已按下且已移动 moved 像素
+    if not held:
+        actions.click_and_hold(slider_elem).perform()
+    max_possible_x = get_track_width(driver, track_sel)
+    correct_direction = direction  # 1:向右为正确方向；-1:向左为正确方向（默认向右）
+    # 已标定时：首步按模型直接跳到目标附近，之后只做方向确定的微调
+    gain = calibration.gain(max_possible_x) if calibration is not None else None
+    # 闭环控制器：由实测的 (移动, 角度变化) 估计局部增益计算下一步，替代步长表
+    ctrl = create_controller(controller, tolerance=tolerance, settle=settle, gain=gain)
+    if telemetry is not None:
+        telemetry.track_width = max_possible_x
+        telemetry.controller = controller or "legacy"
+    move_count = 0
 
+    # 每帧只取图、估计一次：移动后的画面即下一步的移动前画面
+    # 估计服务只替代默认的集成估计，调用方指定的估计器（参考图匹配等）照常同步运行
+    stream = FrameStream(driver, canvas_sel, estimator=estimator, service=service if estimator is None else None)
+    current_angle = None
+    try:
+        current_angle = stream.capture()
+    except Exception as e:
+        Log.waring(f"角度计算失败：{e}")
+    if telemetry is not None:
+        telemetry.record(0, None, current_angle)
+
+    for step in range(max_steps):
         # 角度达标则停止
-        if current_angle is not None and abs(current_angle) <= tolerance:
+        if ctrl is not None:
+            done = ctrl.converged(current_angle)
+        else:
+            done = current_angle is not None and abs(current_angle) <= tolerance
+        if current_angle is not None and abs(current_angle) <= tolerance and telemetry is not None \
+                and telemetry.steps_to_tolerance is None:
+            telemetry.steps_to_tolerance = move_count
+        if done:
             Log.info(f"角度已达标（{current_angle:.1f}°），停止拖动")
             break
-        else:
+        elif current_angle is not None:
             Log.info(f"角度未达标（{current_angle:.1f}°），进行拖动")
+        else:
+            Log.info("角度未知，进行拖动")
 
-        if current_angle is not None:
-            abs_angle = abs(current_angle)
-            # 步长基数：角度越大，步长越大
-            if abs_angle > 30:
-                step_base = random.randint(10, 15)
-            elif abs_angle > 20:
-                step_base = random.randint(5, 10)
-            elif abs_angle > 10:
-                step_base = random.randint(2, 5)
-            elif abs_angle > 5:
-                step_base = random.randint(1, 2)
+        step_dx = None
+        if ctrl is not None:
+            step_dx = ctrl.next_step(current_angle)
+        elif current_angle is not None and gain is not None and step == 0:
+            step_dx = calibration.pixels_for(max_possible_x, current_angle)
+            if step_dx is not None:
+                Log.info(f"按标定模型（每像素 {gain:.3f}°）直接拖动 {step_dx}px")
             else:
-                step_base = 1
-            # 步长方向：基于首次滑动判断的正确方向
-            step_dx = correct_direction * step_base
-        else:
-            # 角度未知，按正确方向滑动
-            step_dx = correct_direction * random.randint(5, 10)
+                Log.info("标定模型不可用，按步长表试探")
+        if step_dx is None:
+            if current_angle is not None:
+                abs_angle = abs(current_angle)
+                # 步长基数：角度越大，步长越大
+                if abs_angle > 30:
+                    step_base = random.randint(10, 15)
+                elif abs_angle > 20:
+                    step_base = random.randint(5, 10)
+                elif abs_angle > 10:
+                    step_base = random.randint(2, 5)
+                elif abs_angle > 5:
+                    step_base = random.randint(1, 2)
+                else:
+                    step_base = 1
+                # 步长方向：已标定时由模型决定，否则基于首次滑动判断的正确方向
+                if gain is not None:
+                    correct_direction = -1 if current_angle * gain > 0 else 1
+                step_dx = correct_direction * step_base
+            else:
+                # 角度未知，按正确方向滑动
+                step_dx = correct_direction * random.randint(5, 10)
 
         # 限制步长范围（不超过轨道边界）
         step_dx = max(-moved, min(step_dx, max_possible_x - moved))  # 不超出轨道
-        step_dx = step_dx if abs(step_dx) >= 1 else correct_direction * 1  # 至少1px
+        if ctrl is None:
+            step_dx = step_dx if abs(step_dx) >= 1 else correct_direction * 1  # 至少1px
 
-        # 执行拖动
-        actions.move_by_offset(step_dx, random.uniform(-2, 2)).perform()
-        moved += step_dx
+        # 执行拖动（控制器在阈值内等待确认时不移动）
+        if step_dx:
+            actions.move_by_offset(step_dx, random.uniform(-2, 2)).perform()
+            moved += step_dx
+            move_count += 1
 
-        img = get_image(driver, canvas_sel)
-        new_angle = estimate_angle(img)
-        # 判断方向（基于角度变化）（仅为低角度时判断）
-        if new_angle is not None and current_angle is not None and abs(new_angle) < 10:
+        # 动态调整延迟（角度小则延迟长），等待画面稳定后再取图
+        if current_angle is not None:
+            base_delay = 0.03
+            max_delay = 0.2
+            max_angle = 90
+            normalized_angle = min(abs(current_angle), max_angle)
+            sleep_per_step = base_delay + (max_angle - normalized_angle) / max_angle * (max_delay - base_delay)
+        else:
+            sleep_per_step = 0.05 + random.uniform(0, 0.03)
+        sleep_per_step += random.uniform(-0.01, 0.02)
+        sleep_per_step = max(0.02, sleep_per_step)
+
+        new_angle = None
+        try:
+            if stream.service is not None:
+                # 画面稳定后即取图交给估计进程，剩余的拖动节奏停顿与估计重叠
+                settle_delay = min(sleep_per_step, SERVICE_SETTLE_DELAY)
+                time.sleep(settle_delay)
+                pending = stream.submit()
+                time.sleep(sleep_per_step - settle_delay)
+                new_angle = pending()
+            else:
+                time.sleep(sleep_per_step)
+                new_angle = stream.capture()
+        except Exception as e:
+            Log.waring(f"角度计算失败：{e}")
+        if telemetry is not None:
+            telemetry.record(step_dx, current_angle, new_angle)
+        if ctrl is not None:
+            ctrl.observe(step_dx, current_angle, new_angle)
+
+        # 判断方向（基于角度变化）（仅为低角度且未标定、未使用控制器时判断）
+        if ctrl is None and gain is None and new_angle is not None and current_angle is not None and abs(new_angle) < 10:
             Log.info("进入低角度检测")
             # 计算首次滑动后的角度变化（绝对值）
             angle_change = abs(current_angle) - abs(new_angle)
@@ -214,34 +988,372 @@ def dynamic_adjust_drag(actions, driver, slider_elem, track_sel, canvas_sel, max
                 correct_direction = 1
                 Log.info(f"滑动后角度减小（{abs(current_angle):.1f}°→{abs(new_angle):.1f}°），正确方向为向右")
 
-        # 动态调整延迟（角度小则延迟长）
-        if current_angle is not None:
-            base_delay = 0.03
-            max_delay = 0.2
-            max_angle = 90
-            normalized_angle = min(abs(current_angle), max_angle)
-            sleep_per_step = base_delay + (max_angle - normalized_angle) / max_angle * (max_delay - base_delay)
-        else:
-            sleep_per_step = 0.05 + random.uniform(0, 0.03)
-        sleep_per_step += random.uniform(-0.01, 0.02)
-        sleep_per_step = max(0.02, sleep_per_step)
-        time.sleep(sleep_per_step)
+        current_angle = new_angle
 
+    Log.info(f"取图 {stream.captured} 次，实际分析 {stream.analysed} 帧")
+    if telemetry is not None:
+        Log.info(f"步长控制 {telemetry.controller}: 移动 {move_count} 次，"
+                 f"{'未达标' if telemetry.steps_to_tolerance is None else f'{telemetry.steps_to_tolerance} 步达标'}")
     return moved
 
+def plan_chunks(distance, chunks=3, ratio=0.25):
+    """
+    把到预测目标的距离分块：第一块覆盖大部分距离，之后每块剩余的比例按 ratio 递减，
+    越接近目标反馈越密
+
+    :return: 各块像素数，和严格等于 distance
+    """
+    points = [int(round(distance * (1 - ratio ** i))) for i in range(1, chunks)] + [int(distance)]
+    sizes, last = [], 0
+    for point in points:
+        if point != last:
+            sizes.append(point - last)
+        last = point
+    return sizes
+
+def planned_drag(actions, driver, slider_elem, track_sel, canvas_sel, tolerance=3, calibration=None, telemetry=None,
+                 controller="legacy", service=None, chunks=3, agree_deg=5.0, probe_px=15, max_replans=3, max_steps=20):
+    """
+    整段轨迹拖动：由每像素角度（标定模型给出，否则试探移动一次测得）预测目标位置，把到目标的整段轨迹
+    分成几块提交（配合 TrajectoryActions 每块一次动作请求），每块之后取一帧反馈；反馈与预测一致时继续
+    提交剩余轨迹，不一致时按实测增益重新规划。剩余误差交给 dynamic_adjust_drag 微调
+
+    :param chunks: 每次规划的轨迹分块数
+    :param agree_deg: 反馈角度与预测相差超过该值时重新规划
+    :param probe_px: 没有标定模型时的试探移动像素
+    :param max_replans: 最多重新规划次数
+    :return: 实际拖动距离
+    """
+    actions.click_and_hold(slider_elem).perform()
+    track_width = get_track_width(driver, track_sel)
+    gain = calibration.gain(track_width) if calibration is not None else None
+    stream = FrameStream(driver, canvas_sel, service=service)
+    moved, direction = 0, 1
+    angle = None
+    try:
+        angle = stream.capture()
+    except Exception as e:
+        Log.waring(f"角度计算失败：{e}")
+    if telemetry is not None:
+        telemetry.track_width = track_width
+        telemetry.record(0, None, angle)
+
+    def move(dx, before):
+        nonlocal moved
+        actions.move_by_offset(dx, random.uniform(-2, 2)).perform()
+        moved += dx
+        time.sleep(SERVICE_SETTLE_DELAY)
+        after = None
+        try:
+            after = stream.capture()
+        except Exception as e:
+            Log.waring(f"角度计算失败：{e}")
+        if telemetry is not None:
+            telemetry.record(dx, before, after)
+        return after
+
+    if angle is not None and abs(angle) > tolerance and gain is None:
+        step = min(probe_px, track_width)
+        new_angle = move(step, angle)
+        if new_angle is not None and abs(normalize_angle(new_angle - angle)) >= 0.5:
+            gain = normalize_angle(new_angle - angle) / step
+            Log.info(f"试探移动 {step}px: {angle:.1f}° → {new_angle:.1f}°，每像素 {gain:.3f}°")
+        angle = new_angle
+
+    replans = 0
+    while angle is not None and gain is not None and abs(angle) > tolerance and replans <= max_replans:
+        # 角度以 360° 为周期，取轨道内最近的目标位置
+        targets = [moved + int(round((-angle + turn) / gain)) for turn in (0, 360, -360)]
+        reachable = [t for t in targets if 0 <= t <= track_width]
+        target = min(reachable, key=lambda t: abs(t - moved)) if reachable else max(0, min(targets[0], track_width))
+        sizes = plan_chunks(target - moved, chunks)
+        if not sizes:
+            break
+        direction = 1 if sizes[0] > 0 else -1
+        Log.info(f"规划整段轨迹: {angle:.1f}° → 目标 {target}px，分 {len(sizes)} 块 {sizes}")
+        for size in sizes:
+            predicted = angle + gain * size
+            new_angle = move(size, angle)
+            if new_angle is None:
+                angle = None
+                break
+            change = normalize_angle(new_angle - angle)
+            disagree = abs(normalize_angle(new_angle - predicted)) > agree_deg
+            angle = new_angle
+            if disagree:
+                # 反馈与预测不一致：用这一块实测的增益（方向一致时）重新规划剩余轨迹
+                if abs(change) >= 0.5 and change / size * gain > 0:
+                    gain = change / size
+                replans += 1
+                Log.info(f"反馈 {new_angle:.1f}° 与预测 {predicted:.1f}° 不一致，按每像素 {gain:.3f}° 重新规划")
+                break
+        else:
+            break
+
+    # 校验并微调剩余误差
+    return dynamic_adjust_drag(actions, driver, slider_elem, track_sel, canvas_sel, max_steps=max_steps,
+                               tolerance=tolerance, held=True, moved=moved, direction=direction,
+                               calibration=calibration, telemetry=telemetry, controller=controller, service=service)
+
+def reference_drag(actions, driver, slider_elem, track_sel, canvas_sel, library, tolerance=3,
+                   min_confidence=0.5, probe_px=20, max_steps=10, img=None, calibration=None, telemetry=None,
+                   controller="legacy", ref_index=None):
+    """
+    基于参考图库的一次性拖动：相位相关得到旋转角度，试探移动一小段测出每像素角度变化
+    （已有标定模型时省去试探），随后一次拖到目标位置，剩余误差交给 dynamic_adjust_drag 做少量微调
+
+    :param ref_index: 已知的参考图下标（验证码索引命中时），None 表示与全部参考图匹配
+    :return: 实际拖动距离；匹配置信度不足时返回 None（此时未按下滑块）
+    """
+    if img is None:
+        img = get_image(driver, canvas_sel)
+    if img is None:
+        return None
+    if ref_index is None:
+        angle, confidence, index = library.match(img)
+    else:
+        (angle, confidence), index = library.match_one(img, ref_index), ref_index
+    Log.info(f"参考图匹配: 角度 {angle}, 置信度 {confidence:.3f}")
+    if angle is None or confidence < min_confidence:
+        return None
+
+    def estimator(frame):
+        return library.match_one(frame, index)[0]
+
+    actions.click_and_hold(slider_elem).perform()
+    moved = 0
+    direction = 1
+    try:
+        max_possible_x = get_track_width(driver, track_sel)
+        if telemetry is not None:
+            telemetry.track_width = max_possible_x
+            telemetry.estimator = "reference"
+            telemetry.record(0, None, angle)
+        gain = calibration.gain(max_possible_x) if calibration is not None else None
+        new_angle = angle
+        if abs(angle) > tolerance:
+            if gain is not None:
+                Log.info(f"使用标定模型，每像素 {gain:.3f}°")
+            else:
+                # 试探移动，测量每像素旋转角度
+                probe = min(probe_px, max_possible_x)
+                actions.move_by_offset(probe, random.uniform(-2, 2)).perform()
+                moved += probe
+                time.sleep(0.05)
+                new_angle = estimator(get_image(driver, canvas_sel))
+                gain = normalize_angle(new_angle - angle) / probe
+                if telemetry is not None:
+                    telemetry.record(probe, angle, new_angle)
+                Log.info(f"试探移动 {probe}px: {angle:.1f}° → {new_angle:.1f}°，每像素 {gain:.3f}°")
+
+            if abs(gain) > 0.05:
+                step_dx = int(round(-new_angle / gain))
+                step_dx = max(-moved, min(step_dx, max_possible_x - moved))
+                if step_dx:
+                    actions.move_by_offset(step_dx, random.uniform(-2, 2)).perform()
+                    moved += step_dx
+                    time.sleep(0.05)
+                Log.info(f"一次性拖动 {step_dx}px，累计 {moved}px")
+                direction = -1 if (new_angle + step_dx * gain) * gain > 0 else 1
+    except Exception as e:
+        Log.waring(f"参考图拖动失败，转为逐步调整：{e}")
+        estimator = None
+
+    # 校验并微调剩余误差
+    return dynamic_adjust_drag(actions, driver, slider_elem, track_sel, canvas_sel, max_steps=max_steps,
+                               tolerance=tolerance, estimator=estimator, held=True, moved=moved, direction=direction,
+                               calibration=calibration, telemetry=telemetry, controller=controller)
+
+def inpage_drag(driver, selectors, tolerance=3, img=None, estimator=None, calibration=None, telemetry=None, rounds=2):
+    """
+    浏览器内求解拖动：每轮只有一次 WebDriver 往返，结束后用 OpenCV 估计校验，未达标时按校验角度再求解一轮
+
+    :return: (实际拖动距离, 求解器)；无法在页面内求解时返回 (None, None)，此时滑块未按下
+    """
+    estimator = estimator or estimate_angle
+    if img is None:
+        img = get_image(driver, selectors.canvas)
+    if img is None:
+        return None, None
+    angle = estimator(img)
+    track_width = get_track_width(driver, selectors.track)
+    gain = calibration.gain(track_width) if calibration is not None else None
+    if telemetry is not None:
+        telemetry.track_width = track_width
+        telemetry.controller = "inpage"
+        telemetry.record(0, None, angle)
+
+    solver = InPageSolver(driver, selectors, tolerance=tolerance)
+    moved, steps = 0, 0
+    for _ in range(rounds):
+        result = solver.solve(angle, gain)
+        if result is None:
+            if moved == 0:
+                # 未开始拖动：松开（如已按下）后交给其他拖动方式
+                if solver.pressed:
+                    solver.release()
+                return None, None
+            break
+        step_dx = int(result.get("moved", moved)) - moved
+        moved += step_dx
+        steps += len(result.get("steps", []))
+        gain = solver.gain
+
+        # OpenCV 校验
+        time.sleep(0.05)
+        new_angle = None
+        try:
+            new_angle = estimator(get_image(driver, selectors.canvas))
+        except Exception as e:
+            Log.waring(f"角度计算失败：{e}")
+        if telemetry is not None:
+            telemetry.record(step_dx, angle, new_angle)
+        Log.info(f"页面内求解后校验角度: {new_angle}")
+        if new_angle is None:
+            break
+        if abs(new_angle) <= tolerance:
+            if telemetry is not None:
+                telemetry.steps_to_tolerance = steps
+            break
+        angle = new_angle
+    return moved, solver
+
 # ---------------------------------------------------------------------------------------------------执行验证流程
 @dataclass
 class Selectors:
     canvas: str
     slider: str
     track: str
+    refresh: Optional[str] = None
+    success: Optional[str] = None
+    failure: Optional[str] = None
+
+# 一次完整尝试的耗时（拖动 + 松开后固定等待约 3.6s），本次运行还没有实际尝试时用于估算节省的时间
+DEFAULT_ATTEMPT_SECONDS = 8.0
+
+@dataclass
+class RefreshStats:
+    """
+    低置信度换图统计
+
+    :param refreshes: 换图次数（每次换图跳过一次注定失败的尝试）
+    :param refresh_seconds: 换图累计耗时
+    :param attempt_seconds: 本次运行实际完成的每次尝试耗时
+    :param disabled: 换图失败（找不到按钮或画面未变化）后本次运行不再换图
+    """
+    refreshes: int = 0
+    refresh_seconds: float = 0.0
+    attempt_seconds: list = field(default_factory=list)
+    disabled: bool = False
+
+    def attempt_cost(self):
+        if not self.attempt_seconds:
+            return DEFAULT_ATTEMPT_SECONDS
+        return sum(self.attempt_seconds) / len(self.attempt_seconds)
+
+    def seconds_saved(self):
+        return max(0.0, self.refreshes * self.attempt_cost() - self.refresh_seconds)
+
+    def summary(self):
+        return f"低置信度换图 {self.refreshes} 次，跳过尝试 {self.refreshes} 次，" \
+               f"约节省 {self.seconds_saved():.1f}s（每次尝试约 {self.attempt_cost():.1f}s，换图共 {self.refresh_seconds:.1f}s）"
+
+def refresh_captcha(driver, selectors, img, timeout=3.0, interval=0.1):
+    """
+    点击换图按钮并等待画布内容变化
+
+    :param img: 换图前的画面
+    :return: 新画面；找不到按钮或超时未变化时返回 None
+    """
+    clicked = driver.execute_script(
+        "var el=document.querySelector(arguments[0]); if(!el) return false; el.click(); return true;",
+        selectors.refresh)
+    if not clicked:
+        Log.waring(f"未找到换图按钮: {selectors.refresh}")
+        return None
+    previous = frame_hash(img)
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        time.sleep(interval)
+        new_img = get_image(driver, selectors.canvas)
+        if new_img is not None and frame_hash(new_img) != previous:
+            return new_img
+    Log.waring(f"换图后 {timeout:.1f}s 内画面未变化")
+    return None
 
-def captcha(driver, selectors, max_attempts=3, tolerance=3):
+def refresh_low_confidence(driver, selectors, img, stats, min_confidence, max_refreshes=3):
+    """
+    拖动前评估：角度估计的置信度低于 min_confidence 时换一张验证码，不消耗尝试次数；
+    整个运行最多换图 max_refreshes 次
+
+    :param stats: RefreshStats，跨尝试累计
+    :return: 用于本次尝试的画面
+    """
+    while not stats.disabled and stats.refreshes < max_refreshes:
+        result = _angle_ensemble.estimate(_captcha_solver.frame(img))
+        if result.angle is not None and result.confidence >= min_confidence:
+            break
+        Log.info(f"拖动前评估: {result.source} 角度 {result.angle}，置信度 {result.confidence:.2f} "
+                 f"低于 {min_confidence}，换一张验证码")
+        started = time.perf_counter()
+        new_img = None
+        try:
+            new_img = refresh_captcha(driver, selectors, img)
+        except Exception as e:
+            Log.waring(f"换图失败: {e}")
+        stats.refresh_seconds += time.perf_counter() - started
+        if new_img is None:
+            Log.waring("换图不可用，本次运行不再换图")
+            stats.disabled = True
+            break
+        stats.refreshes += 1
+        img = new_img
+    return img
+
+def captcha(driver, selectors, max_attempts=3, tolerance=3, use_reference=False, use_index=False,
+            use_calibration=False, controller="legacy", trajectory=False, inpage=False, parallel_estimators=False, use_model=False,
+            refresh_confidence=0.0, max_refreshes=3, verify_timeout=5.0, screenshot_format="webp", retention=None,
+            service=None):
     Log.info(f"进入验证流程...")
+    # 接缝半径只在本次验证内沿用（估计服务的工作进程同样在下一帧前清除）
+    reset_ring_layouts()
+    if service is not None:
+        service.reset()
+    # 调试截图存入截图库：按内容去重、压缩编码、按保留策略清理
+    run = datetime.now().strftime('%Y%m%d_%H%M%S')
+    _screenshot_writer.configure(screenshot_format, retention)
+    # 各估计器在线程池中并发运行（可选）
+    _angle_ensemble.parallel = parallel_estimators
+    # 学习的角度模型（可选）：排在圆环估计之后、PCA 之前；模型文件不存在时照常使用其他估计器
+    _angle_ensemble.remove("model")
+    model = AngleModel.load() if use_model else None
+    if model is not None:
+        _angle_ensemble.add(AngleEstimator("model", model.estimate, MODEL_MIN_CONFIDENCE, absolute=True), index=1)
     canvas_sel=selectors.canvas
     slider_sel=selectors.slider
     track_sel=selectors.track
 
+    library = None
+    if use_reference:
+        try:
+            library = ReferenceLibrary().load()
+        except Exception as e:
+            Log.waring(f"参考图库加载失败: {e}")
+
+    index = None
+    if use_index and library is None:
+        # 索引命中后按记录的参考图求角度，没有参考图库时索引没有用处
+        Log.waring("验证码索引需要参考图库，未启用")
+    elif use_index:
+        try:
+            index = CaptchaIndex().load()
+            index.build_from_screenshots()
+            index.save()
+        except Exception as e:
+            Log.waring(f"验证码索引加载失败: {e}")
+
+    calibration = SliderCalibration().load() if use_calibration else None
+
     try:
         wait = WebDriverWait(driver, 20)
         wait.until(lambda d: d.execute_script("return !!document.querySelector(arguments[0])", canvas_sel))
@@ -251,57 +1363,119 @@ def captcha(driver, selectors, max_attempts=3, tolerance=3):
         Log.error(info)
         return False, info
 
+    # 低置信度换图（可选）：需要换图按钮选择器，refresh_confidence 为 0 时关闭
+    refresh = RefreshStats(disabled=not (selectors.refresh and refresh_confidence > 0 and max_refreshes > 0))
+
     for attempt in range(max_attempts):
         Log.info(f"----------------------------[({attempt + 1}/{max_attempts}) 尝试获取验证码图片...]----------------------------")
 
-        # 执行人类样式拖动
-        actions = ActionChains(driver)
+        # 执行人类样式拖动：轨迹模式下每次移动规划为多段带时长的轨迹，整段一次提交
+        actions = TrajectoryActions(driver) if trajectory else ActionChains(driver)
         slider = driver.find_element(By.CSS_SELECTOR, slider_sel)
-        actual_x = dynamic_adjust_drag(
-            actions,
-            driver,
-            slider,
-            track_sel,
-            canvas_sel,
-            max_steps=50,
-            tolerance=tolerance
-        )
+        # 先查已解图片索引，未命中再做实时估计
+        img, key, entry = None, None, None
+        if index is not None or library is not None or not refresh.disabled:
+            img = get_image(driver, canvas_sel)
+        if index is not None and img is not None:
+            key = rotation_invariant_hash(img)
+            entry = index.lookup(key)
+            Log.info(f"验证码索引{'命中' if entry else '未命中'}: {key:016x}")
+        # 索引未命中时先评估画面，估计不可靠则换图，换图后重新查索引
+        if entry is None and img is not None and not refresh.disabled:
+            new_img = refresh_low_confidence(driver, selectors, img, refresh, refresh_confidence, max_refreshes)
+            if new_img is not img:
+                img = new_img
+                if index is not None:
+                    key = rotation_invariant_hash(img)
+                    entry = index.lookup(key)
+                    Log.info(f"换图后验证码索引{'命中' if entry else '未命中'}: {key:016x}")
+        attempt_started = time.perf_counter()
 
+        telemetry = DragTelemetry()
+        actual_x = None
+        solver = None
+        indexed = False
+        if entry is not None and entry.reference in library.names:
+            # 索引命中：只与记录的那张参考图匹配，拖动距离由当前角度换算
+            actual_x = reference_drag(actions, driver, slider, track_sel, canvas_sel, library,
+                                      tolerance=tolerance, img=img, calibration=calibration, telemetry=telemetry,
+                                      controller=controller, ref_index=library.names.index(entry.reference))
+            indexed = actual_x is not None
+        if actual_x is None and inpage:
+            actual_x, solver = inpage_drag(driver, selectors, tolerance=tolerance, img=img,
+                                           calibration=calibration, telemetry=telemetry)
+        if actual_x is None and library is not None and len(library):
+            actual_x = reference_drag(actions, driver, slider, track_sel, canvas_sel, library,
+                                      tolerance=tolerance, img=img, calibration=calibration, telemetry=telemetry,
+                                      controller=controller)
+        if actual_x is None and trajectory:
+            actual_x = planned_drag(actions, driver, slider, track_sel, canvas_sel, tolerance=tolerance,
+                                    calibration=calibration, telemetry=telemetry, controller=controller,
+                                    service=service, max_steps=50)
+        if actual_x is None:
+            actual_x = dynamic_adjust_drag(
+                actions,
+                driver,
+                slider,
+                track_sel,
+                canvas_sel,
+                max_steps=50,
+                tolerance=tolerance,
+                calibration=calibration,
+                telemetry=telemetry,
+                controller=controller,
+                service=service
+            )
+        # 调试截图复用拖动中最后取到的画面，编码与写盘交给后台线程
         screenshot_file_name = f"{datetime.now().strftime('%Y_%m_%d_%H_%M_%S_%f')}_debug_canvas_attempt_{attempt + 1}"
-        screenshot_file_path = f"{AppPath.ScreenshotRoot}/{screenshot_file_name}.png"
-        try:
-            if not os.path.exists(AppPath.ScreenshotRoot):
-                os.makedirs(AppPath.ScreenshotRoot, exist_ok=True)
-            driver.find_element(By.CSS_SELECTOR, canvas_sel).screenshot(screenshot_file_path)
-        except Exception as e:
-            Log.error(f"验证码截图失败: {e}")
+        if not _screenshot_writer.submit(screenshot_file_name, last_frame(), run=run):
+            Log.waring("本次尝试没有可保存的画面")
 
-        # 松开滑块前停顿
-        time.sleep(0.1 + random.random() * 0.15)
-        actions.release().perform()
+        # 松开前注入结果监听，服务器很快返回时也不会错过信号
+        verifier = CaptchaVerifier(driver, WebPath.NeusoftKQPath, success_sel=selectors.success,
+                                   failure_sel=selectors.failure, timeout=verify_timeout)
+        verifier.arm()
 
-        Log.info(f"实际拖动距离：{actual_x}px")
-
-        time.sleep(2)
-        time.sleep(1.2 + random.random()*0.8)
+        # 松开滑块前停顿（停顿与松开在同一次请求中完成）
+        if solver is not None:
+            time.sleep(0.1 + random.random() * 0.15)
+            solver.release()
+        else:
+            actions.pause(0.1 + random.random() * 0.15).release().perform()
+        if trajectory and solver is None:
+            Log.info(f"本次尝试提交动作请求 {actions.payloads} 次，轨迹共 {actions.segments} 段")
+        if calibration is not None and calibration.update(telemetry):
+            calibration.save()
 
-        result = False
-        Log.info(f"当前页面为: {driver.current_url}")
-        if driver.current_url == WebPath.NeusoftKQPath:
-            result = True
+        Log.info(f"实际拖动距离：{actual_x}px")
+        Log.info(f"角度估计器统计: {_angle_ensemble.summary()}")
+        if service is not None:
+            Log.info(f"角度估计服务: {service.summary()}")
 
-        # 自定义检测方法：检查成功 DOM class 或 AJAX 返回（可扩展）
-        # result = driver.execute_script("return (!!document.querySelector('.captcha-state .captcha-state-icon-success') && document.querySelector('.captcha-state .captcha-state-icon-success').offsetParent !== null);")
+        # 等待第一个结果信号（跳转、成功/失败状态元素）或超时，注入失败时退回固定等待
+        result = verifier.wait()
         Log.info(f"检测验证结果: {result}")
+        refresh.attempt_seconds.append(time.perf_counter() - attempt_started)
+        if refresh.refreshes:
+            Log.info(refresh.summary())
+        # 截图旁附带本次尝试的遥测，供 CaptchaCorpus 整理数据集
+        attempt_record = telemetry.to_dict(attempt=attempt + 1, moved=None if actual_x is None else float(actual_x),
+                                           tolerance=tolerance, verify_signal=verifier.signal,
+                                           verify_seconds=verifier.elapsed)
         if result:
             Log.info(f"----------------------------[({attempt + 1}/{max_attempts}) 验证码通过，继续后续流程]----------------------------")
-            if os.path.exists(screenshot_file_path):
-                os.rename(screenshot_file_path, f"{AppPath.ScreenshotRoot}/{screenshot_file_name + 'success'}.png")
+            _screenshot_writer.label(screenshot_file_name, "success", attempt_record)
+            if index is not None and key is not None:
+                index.insert(key, reference=f"{screenshot_file_name}success.png")
+                index.save()
             return True, None
         else:
             Log.info(f"----------------------------[({attempt + 1}/{max_attempts}) 此次尝试未通过，保存截图供分析并重试]----------------------------")
-            if os.path.exists(screenshot_file_path):
-                os.rename(screenshot_file_path, f"{AppPath.ScreenshotRoot}/{screenshot_file_name + 'failed'}.png")
+            _screenshot_writer.label(screenshot_file_name, "failed", attempt_record)
+            if indexed:
+                index.invalidate(key)
+                index.save()
+            verifier.wait_reset()
 
     Log.error("重试结束，未通过验证码。请查看保存的截图与后端日志。")
     return False, "重试结束，未通过验证码。请查看保存的截图与后端日志。"
\ No newline at end of file
@@ -0,0 +1,129 @@
+import os
+import json
+import math
+
+from src.utils.log import Log
+from src.utils.const import AppPath
+
+CALIBRATION_VERSION = 1
+# 每像素角度低于该值视为模型无效（按它换算的像素数没有意义）
+MIN_GAIN = 1e-3
+
+class SliderCalibration:
+    """
+    滑块标定模型：按轨道宽度分别拟合 每像素旋转角度（过原点的最小二乘 angle_change = gain * dx），
+    只保存累加量，每次运行后增量重拟合；旧样本按 decay 指数衰减，以适应页面改版
+
+    :param path: 模型文件，默认 AppPath.DataRoot/captcha_calibration.json
+    :param min_samples: 至少多少个样本才使用模型
+    :param max_gain: 每像素角度变化的合理上限，超出视为估计跳变的异常样本
+    :param decay: 每个新样本对旧累加量的衰减系数
+    :param min_spread: 样本移动像素的均方根下限，移动过小时拟合不可靠
+    :param sources: 采纳哪些角度来源（DragTelemetry.estimator）的遥测；各来源的角度约定与误差特性不同，
+        混在一起拟合会污染模型，默认只采纳默认估计器
+    """
+    def __init__(self, path=None, min_samples=3, max_gain=5.0, decay=0.99, min_spread=2.0, sources=("ensemble",)):
+        self.path = path or os.path.join(AppPath.DataRoot, "captcha_calibration.json")
+        self.min_samples = min_samples
+        self.max_gain = max_gain
+        self.decay = decay
+        self.min_spread = min_spread
+        self.sources = tuple(sources)
+        self.tracks = {}
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return self
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") == CALIBRATION_VERSION:
+                self.tracks = data.get("tracks", {})
+        except Exception as e:
+            Log.waring(f"滑块标定模型读取失败: {e}")
+        return self
+
+    def save(self):
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(self.path, "w", encoding="utf-8") as f:
+                json.dump({"version": CALIBRATION_VERSION, "tracks": self.tracks}, f, ensure_ascii=False, indent=4)
+        except Exception as e:
+            Log.waring(f"滑块标定模型写入失败: {e}")
+
+    @staticmethod
+    def _key(track_width):
+        return str(int(round(track_width)))
+
+    def add_sample(self, track_width, dx, angle_change):
+        # 角度没有变化的样本多为画面去重复用了上一帧的估计，会把增益拉向 0
+        if not dx or angle_change is None or not angle_change:
+            return False
+        if abs(angle_change) > self.max_gain * abs(dx):
+            return False
+        # 已有可靠模型时，剔除残差过大的样本（通常是估计器在两帧间跳变）
+        gain, error = self.gain(track_width), self.fit_error(track_width)
+        if gain is not None and error is not None and abs(angle_change - gain * dx) > max(3 * error, 3.0):
+            return False
+
+        track = self.tracks.setdefault(self._key(track_width), {"count": 0, "n": 0.0, "sxx": 0.0, "sxy": 0.0, "syy": 0.0})
+        for k in ("n", "sxx", "sxy", "syy"):
+            track[k] *= self.decay
+        track["count"] += 1
+        track["n"] += 1
+        track["sxx"] += dx * dx
+        track["sxy"] += dx * angle_change
+        track["syy"] += angle_change * angle_change
+        return True
+
+    def update(self, telemetry):
+        """
+        用一次拖动的遥测数据重拟合
+
+        :return: 被采纳的样本数
+        """
+        if telemetry is None or not telemetry.track_width:
+            return 0
+        if telemetry.estimator not in self.sources:
+            Log.info(f"滑块标定模型不采纳 {telemetry.estimator} 来源的遥测")
+            return 0
+        accepted = 0
+        for dx, before, after in telemetry.samples:
+            change = ((after - before + 180) % 360) - 180
+            if self.add_sample(telemetry.track_width, dx, change):
+                accepted += 1
+        if accepted:
+            Log.info(f"滑块标定模型更新: 轨道 {telemetry.track_width}px 采纳 {accepted} 个样本，"
+                     f"每像素 {self.gain(telemetry.track_width)}°，拟合误差 {self.fit_error(telemetry.track_width)}°")
+        return accepted
+
+    def gain(self, track_width):
+        """
+        每像素旋转角度；样本不足、移动幅度过小或增益接近 0 时返回 None
+        """
+        track = self.tracks.get(self._key(track_width))
+        if not track or track["count"] < self.min_samples or track["sxx"] <= 0 or track["n"] <= 0:
+            return None
+        if math.sqrt(track["sxx"] / track["n"]) < self.min_spread:
+            return None
+        gain = track["sxy"] / track["sxx"]
+        return gain if abs(gain) >= MIN_GAIN else None
+
+    def fit_error(self, track_width):
+        """
+        拟合误差：单步角度变化预测的均方根残差（度）
+        """
+        track = self.tracks.get(self._key(track_width))
+        if not track or track["n"] <= 0 or track["sxx"] <= 0:
+            return None
+        sse = track["syy"] - track["sxy"] ** 2 / track["sxx"]
+        return math.sqrt(max(sse, 0.0) / track["n"])
+
+    def pixels_for(self, track_width, angle):
+        """
+        把当前角度转到 0° 需要移动的像素数；模型不可用时返回 None
+        """
+        gain = self.gain(track_width)
+        if gain is None:
+            return None
+        return int(round(-angle / gain))
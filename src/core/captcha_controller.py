@@ -0,0 +1,142 @@
+import math
+
+# 每像素角度低于该值视为增益未知，先做试探移动
+MIN_GAIN = 1e-3
+
+def normalize_angle(angle):
+    return ((angle + 180) % 360) - 180
+
+def known_gain(gain):
+    return gain if gain is not None and abs(gain) >= MIN_GAIN else None
+
+class StepController:
+    """
+    闭环步长控制器基类：根据每次移动的 (像素, 角度变化) 估计局部增益（每像素角度），
+    由子类给出下一步的移动像素
+
+    :param tolerance: 收敛阈值（度）
+    :param settle: 连续多少帧在阈值内才算收敛
+    :param gain: 初始增益（如标定模型给出），None 或接近 0 时先做一次试探移动
+    :param probe_px: 无增益信息时的试探步长
+    :param max_step: 单步最大移动像素
+    :param max_overshoot: 允许越过目标的最大比例，限制单步不超过 (1 + max_overshoot) 倍的预测距离
+    :param smoothing: 新测得增益的权重，1 表示只用最近一次
+    """
+    name = "base"
+
+    def __init__(self, tolerance=3, settle=1, gain=None, probe_px=8, max_step=60, max_overshoot=0.2, smoothing=0.5):
+        self.tolerance = tolerance
+        self.settle = settle
+        self.gain = known_gain(gain)
+        self.probe_px = probe_px
+        self.max_step = max_step
+        self.max_overshoot = max_overshoot
+        self.smoothing = smoothing
+        self.in_tolerance = 0
+        self.steps = 0
+
+    def converged(self, angle):
+        if angle is not None and abs(angle) <= self.tolerance:
+            self.in_tolerance += 1
+        else:
+            self.in_tolerance = 0
+        return self.in_tolerance >= self.settle
+
+    def observe(self, dx, before, after):
+        if not dx or before is None or after is None:
+            return
+        change = normalize_angle(after - before)
+        gain = change / dx
+        # 忽略角度几乎不变或符号与已知增益相反的样本（多为估计跳变）
+        if abs(gain) < MIN_GAIN or (self.gain is not None and gain * self.gain < 0):
+            return
+        self.gain = gain if self.gain is None else (1 - self.smoothing) * self.gain + self.smoothing * gain
+
+    def command(self, angle):
+        raise NotImplementedError
+
+    def next_step(self, angle):
+        """
+        :return: 下一步移动像素；0 表示已在阈值内等待确认
+        """
+        if angle is None:
+            dx = self.probe_px
+        elif abs(angle) <= self.tolerance:
+            return 0
+        elif known_gain(self.gain) is None:
+            dx = self.probe_px
+        else:
+            target = -angle / self.gain
+            dx = self.command(angle)
+            # 限制越过目标的幅度
+            limit = abs(target) * (1 + self.max_overshoot)
+            dx = max(-limit, min(dx, limit))
+        dx = max(-self.max_step, min(dx, self.max_step))
+        dx = int(round(dx)) or int(math.copysign(1, dx or 1))
+        self.steps += 1
+        return dx
+
+class SecantController(StepController):
+    """
+    割线法：用最近两次 (位置, 角度) 的割线斜率作为局部增益，直接求零点；
+    发现越过目标（角度变号）时减小阻尼，防止来回震荡
+
+    :param damping: 每步按预测距离的比例移动
+    """
+    name = "secant"
+
+    def __init__(self, damping=0.9, **kwargs):
+        kwargs.setdefault("smoothing", 1.0)
+        super().__init__(**kwargs)
+        self.damping = damping
+        self.last_angle = None
+
+    def command(self, angle):
+        if self.last_angle is not None and self.last_angle * angle < 0:
+            self.damping = max(0.3, self.damping * 0.7)
+        self.last_angle = angle
+        return -angle / self.gain * self.damping
+
+class PIDController(StepController):
+    """
+    PID：误差为当前角度，输出按估计增益换算成像素，积分项限幅防止饱和
+
+    :param kp: 比例系数
+    :param ki: 积分系数
+    :param kd: 微分系数
+    :param integral_limit: 积分项上限（度）
+    """
+    name = "pid"
+
+    def __init__(self, kp=0.8, ki=0.1, kd=0.1, integral_limit=30, **kwargs):
+        super().__init__(**kwargs)
+        self.kp = kp
+        self.ki = ki
+        self.kd = kd
+        self.integral_limit = integral_limit
+        self.integral = 0.0
+        self.last_angle = None
+
+    def command(self, angle):
+        self.integral = max(-self.integral_limit, min(self.integral + angle, self.integral_limit))
+        derivative = 0.0 if self.last_angle is None else angle - self.last_angle
+        self.last_angle = angle
+        u = self.kp * angle + self.ki * self.integral + self.kd * derivative
+        return -u / self.gain
+
+CONTROLLERS = {
+    SecantController.name: SecantController,
+    PIDController.name: PIDController,
+}
+
+def create_controller(name, **kwargs):
+    """
+    :param name: "secant" / "pid"；"legacy" 或 None 返回 None，沿用原有步长表
+    """
+    if not name or name == "legacy":
+        return None
+    if name not in CONTROLLERS:
+        raise ValueError(f"Unknown captcha controller: {name}")
+    if "gain" in kwargs:
+        kwargs["gain"] = known_gain(kwargs["gain"])
+    return CONTROLLERS[name](**kwargs)
@@ -0,0 +1,206 @@
+import os
+import glob
+import json
+
+import cv2
+import numpy as np
+
+from collections import OrderedDict
+
+from src.utils.log import Log
+from src.utils.const import AppPath
+from src.core.captcha_screenshot import ScreenshotStore, SCREENSHOT_PATTERN, content_hash, read_sidecar
+
+CORPUS_VERSION = 1
+
+class CaptchaCorpus:
+    """
+    由生产截图整理的验证码数据集：按像素内容去重，附带该次尝试的遥测（每步角度、拖动距离、结果），
+    图片按尺寸分组存入 npz 分片，manifest.json 记录每个样本所在的分片与行号；
+    增量构建，只处理上次构建之后新增的截图，已写满的分片不再改写
+
+    通过的截图是松开滑块前的最终画面，角度已在容差内，标注为 0°；未通过的截图没有可信标注
+
+    :param root: 数据集目录，默认 AppPath.DataRoot/captcha_corpus
+    :param shard_size: 每个分片最多的样本数
+    """
+    def __init__(self, root=None, shard_size=500):
+        self.root = root or os.path.join(AppPath.DataRoot, "captcha_corpus")
+        self.shard_size = shard_size
+        self.built_until = 0.0
+        self.records = OrderedDict()
+        self.shards = OrderedDict()
+        self.duplicates = 0
+        self._pending = []
+        self._cache = OrderedDict()
+
+    @property
+    def manifest_path(self):
+        return os.path.join(self.root, "manifest.json")
+
+    def __len__(self):
+        return len(self.records) + len(self._pending)
+
+    def load(self):
+        if not os.path.exists(self.manifest_path):
+            return self
+        try:
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") != CORPUS_VERSION:
+                Log.waring(f"验证码数据集版本不匹配，重新建立: {data.get('version')}")
+                return self
+            self.built_until = data.get("built_until", 0.0)
+            self.duplicates = data.get("duplicates", 0)
+            self.shards = OrderedDict((name, shard) for name, shard in data.get("shards", {}).items())
+            self.records = OrderedDict((r["hash"], r) for r in data.get("samples", []))
+            Log.info(f"验证码数据集加载完成: {len(self.records)} 张，{len(self.shards)} 个分片")
+        except Exception as e:
+            Log.waring(f"验证码数据集读取失败: {e}")
+        return self
+
+    def _candidates(self, screenshot_root):
+        # (时间, 来源名, 尝试序号, 结果, 内容哈希或 None, 读取 (图片, 遥测) 的函数)
+        candidates = []
+        for path in glob.glob(os.path.join(screenshot_root, "*_debug_canvas_attempt_*.png")):
+            match = SCREENSHOT_PATTERN.search(os.path.basename(path))
+            mtime = os.path.getmtime(path)
+            if match is not None and mtime > self.built_until:
+                candidates.append((mtime, os.path.basename(path), int(match.group(1)), match.group(2), None,
+                                   lambda p=path: (cv2.imread(p, cv2.IMREAD_COLOR), read_sidecar(p))))
+        # 截图库中的条目已按内容哈希存放，重复的截图无需解码
+        store = ScreenshotStore(screenshot_root).load()
+        for entry in store.query(since=self.built_until):
+            if entry["outcome"] in ("success", "failed"):
+                candidates.append((entry["time"], f"{entry['name']}{entry['outcome']}.png", entry["attempt"],
+                                   entry["outcome"], entry["blob"],
+                                   lambda e=entry: (store.read(e), e.get("telemetry"))))
+        return sorted(candidates, key=lambda c: c[0])
+
+    def build(self, screenshot_root=None):
+        """
+        增量导入截图：处理上次构建之后新增的截图，包括截图库（ScreenshotStore）中已标注结果的条目
+        与旧版直接保存的 *_debug_canvas_attempt_N{success|failed}.png，内容重复的截图只记录来源
+
+        :return: 新增样本数
+        """
+        screenshot_root = screenshot_root or AppPath.ScreenshotRoot
+        added = 0
+        pending_hashes = {r["hash"]: r for r, _ in self._pending}
+        for mtime, source, attempt, outcome, digest, read in self._candidates(screenshot_root):
+            self.built_until = max(self.built_until, mtime)
+            existing = (self.records.get(digest) or pending_hashes.get(digest)) if digest is not None else None
+            img = telemetry = None
+            if existing is None:
+                img, telemetry = read()
+                if img is None:
+                    continue
+                digest = content_hash(img)
+                existing = self.records.get(digest) or pending_hashes.get(digest)
+            if existing is not None:
+                existing.setdefault("duplicates", []).append(source)
+                self.duplicates += 1
+                continue
+            record = {
+                "hash": digest,
+                "source": source,
+                "time": mtime,
+                "attempt": attempt,
+                "outcome": outcome,
+                "label": 0.0 if outcome == "success" else None,
+                "telemetry": telemetry,
+            }
+            self._pending.append((record, img))
+            pending_hashes[digest] = record
+            added += 1
+        if added:
+            Log.info(f"验证码数据集新增 {added} 张，跳过重复 {self.duplicates} 张")
+        return added
+
+    def _shard_path(self, name):
+        return os.path.join(self.root, name)
+
+    def _write_shard(self, name, images, hashes):
+        tmp_path = self._shard_path(name) + ".tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez_compressed(f, images=images, hashes=np.array(hashes))
+        os.replace(tmp_path, self._shard_path(name))
+        self._cache.pop(name, None)
+
+    def _flush(self):
+        # 按尺寸分组，先补满同尺寸的最后一个未满分片，再开新分片
+        groups = OrderedDict()
+        for record, img in self._pending:
+            groups.setdefault(img.shape, []).append((record, img))
+        for shape, items in groups.items():
+            open_shard = next((name for name, shard in reversed(self.shards.items())
+                               if tuple(shard["shape"]) == shape and shard["count"] < self.shard_size), None)
+            while items:
+                if open_shard is not None:
+                    name = open_shard
+                    images, hashes = self._read_shard(name)
+                    images, hashes = list(images), list(hashes)
+                    open_shard = None
+                else:
+                    name = f"shard_{len(self.shards):05d}.npz"
+                    images, hashes = [], []
+                take, items = items[:self.shard_size - len(images)], items[self.shard_size - len(images):]
+                for record, img in take:
+                    record["shard"], record["row"] = name, len(images)
+                    images.append(img)
+                    hashes.append(record["hash"])
+                self._write_shard(name, np.stack(images), hashes)
+                self.shards[name] = {"shape": list(shape), "count": len(images)}
+                for record, _ in take:
+                    self.records[record["hash"]] = record
+        self._pending = []
+
+    def save(self):
+        try:
+            os.makedirs(self.root, exist_ok=True)
+            self._flush()
+            data = {
+                "version": CORPUS_VERSION,
+                "built_until": self.built_until,
+                "duplicates": self.duplicates,
+                "shards": self.shards,
+                "samples": list(self.records.values()),
+            }
+            tmp_path = self.manifest_path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp_path, self.manifest_path)
+        except Exception as e:
+            Log.waring(f"验证码数据集写入失败: {e}")
+
+    def _read_shard(self, name):
+        cached = self._cache.get(name)
+        if cached is None:
+            with np.load(self._shard_path(name)) as data:
+                cached = (data["images"], data["hashes"])
+            self._cache[name] = cached
+            while len(self._cache) > 2:
+                self._cache.popitem(last=False)
+        return cached
+
+    def image(self, record):
+        images, _ = self._read_shard(record["shard"])
+        return images[record["row"]]
+
+    def select(self, outcome=None, labelled=False):
+        """
+        按分片顺序筛选样本记录（不读取图片）
+
+        :param outcome: 只返回 "success" 或 "failed"，None 表示全部
+        :param labelled: 只返回有角度标注的样本
+        """
+        return [record for record in sorted(self.records.values(), key=lambda r: (r["shard"], r["row"]))
+                if (outcome is None or record["outcome"] == outcome)
+                and not (labelled and record.get("label") is None)]
+
+    def samples(self, outcome=None, labelled=False):
+        """
+        :return: (记录, 图片) 迭代器，参数同 select
+        """
+        for record in self.select(outcome, labelled):
+            yield record, self.image(record)
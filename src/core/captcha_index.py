@@ -0,0 +1,210 @@
+import os
+import glob
+import json
+import time
+
+import cv2
+import numpy as np
+
+from typing import Optional
+from dataclasses import dataclass
+from collections import OrderedDict
+
+from src.utils.log import Log
+from src.utils.const import AppPath
+from src.core.captcha_screenshot import ScreenshotStore
+
+INDEX_VERSION = 2
+HASH_BITS = 64
+
+def rotation_invariant_hash(img):
+    """
+    旋转不变的 64 位感知哈希：
+    极坐标展开后旋转只是角度轴上的循环平移，沿角度轴 FFT 的幅值与环带均值都与旋转无关。
+    前 8 位为环带均值的 dHash，后 56 位为 7 个角频率 x 8 个环带的对数幅值（去行列均值后取符号）
+    """
+    gray = img if img.ndim == 2 else cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    gray = gray.astype(np.float32)
+    h, w = gray.shape
+    polar = cv2.warpPolar(gray, (64, 256), (w / 2, h / 2), min(h, w) / 2 * 0.95, cv2.INTER_LINEAR)
+    polar = cv2.resize(polar, (8, 256), interpolation=cv2.INTER_AREA)
+    spectrum = np.abs(np.fft.rfft(polar, axis=0))
+
+    profile = spectrum[0]
+    d_bits = np.diff(np.append(profile, profile[0])) > 0
+    mag = np.log1p(spectrum[1:8])
+    mag = mag - mag.mean(axis=0, keepdims=True) - mag.mean(axis=1, keepdims=True) + mag.mean()
+    p_bits = (mag > 0).flatten()
+
+    value = 0
+    for bit in np.concatenate([d_bits, p_bits]):
+        value = (value << 1) | int(bit)
+    return value
+
+def hamming(a, b):
+    return bin(a ^ b).count("1")
+
+@dataclass
+class IndexEntry:
+    key: int
+    reference: Optional[str] = None
+    hits: int = 0
+    last_used: float = 0.0
+
+class CaptchaIndex:
+    """
+    已解验证码图片索引：旋转不变哈希 -> 同一图片的通过截图（参考图库中的名称）。
+    不记录拖动距离：哈希与旋转无关，同一图片换了初始角度时距离并不相同，命中后只需与这一张参考图做相位相关
+    按最近使用顺序保存，超过 max_entries 时淘汰最久未用的条目；
+    哈希按 max_distance + 1 段分桶，海明距离不超过 max_distance 的条目至少有一段完全相同，查找只比较同桶候选
+
+    :param path: 索引文件，默认 AppPath.DataRoot/captcha_index.json
+    :param max_entries: 最大条目数
+    :param max_distance: 视为同一图片的最大海明距离
+    """
+    def __init__(self, path=None, max_entries=50000, max_distance=4):
+        self.path = path or os.path.join(AppPath.DataRoot, "captcha_index.json")
+        self.max_entries = max_entries
+        self.max_distance = max_distance
+        self.built_until = 0.0
+        self.entries = OrderedDict()
+        self.dirty = False
+
+        bands = max_distance + 1
+        bounds = np.linspace(0, HASH_BITS, bands + 1).astype(int)
+        self._bands = [(int(lo), int(hi)) for lo, hi in zip(bounds[:-1], bounds[1:])]
+        self._buckets = [dict() for _ in self._bands]
+
+    def __len__(self):
+        return len(self.entries)
+
+    def _band_values(self, key):
+        for lo, hi in self._bands:
+            yield (key >> lo) & ((1 << (hi - lo)) - 1)
+
+    def _link(self, key):
+        for bucket, value in zip(self._buckets, self._band_values(key)):
+            bucket.setdefault(value, set()).add(key)
+
+    def _unlink(self, key):
+        for bucket, value in zip(self._buckets, self._band_values(key)):
+            keys = bucket.get(value)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del bucket[value]
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return self
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") != INDEX_VERSION:
+                Log.waring(f"验证码索引版本不匹配，重新建立: {data.get('version')}")
+                return self
+            self.built_until = data.get("built_until", 0.0)
+            for key, reference, hits, last_used in data.get("entries", []):
+                entry = IndexEntry(int(key, 16), reference, hits, last_used)
+                self.entries[entry.key] = entry
+                self._link(entry.key)
+            Log.info(f"验证码索引加载完成: {len(self.entries)} 条")
+        except Exception as e:
+            Log.waring(f"验证码索引读取失败: {e}")
+        return self
+
+    def save(self):
+        if not self.dirty:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            data = {
+                "version": INDEX_VERSION,
+                "built_until": self.built_until,
+                "entries": [[f"{e.key:016x}", e.reference, e.hits, e.last_used] for e in self.entries.values()],
+            }
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+            self.dirty = False
+        except Exception as e:
+            Log.waring(f"验证码索引写入失败: {e}")
+
+    def _find(self, key):
+        entry = self.entries.get(key)
+        if entry is not None:
+            return entry
+        candidates = set()
+        for bucket, value in zip(self._buckets, self._band_values(key)):
+            candidates |= bucket.get(value, set())
+        best = min(candidates, key=lambda k: hamming(k, key), default=None)
+        if best is not None and hamming(best, key) <= self.max_distance:
+            return self.entries[best]
+        return None
+
+    def lookup(self, key):
+        entry = self._find(key)
+        if entry is None:
+            return None
+        entry.hits += 1
+        entry.last_used = time.time()
+        self.entries.move_to_end(entry.key)
+        self.dirty = True
+        return entry
+
+    def insert(self, key, reference=None):
+        # 近似重复的图片合并到已有条目
+        entry = self._find(key)
+        if entry is None:
+            entry = IndexEntry(key)
+            self.entries[key] = entry
+            self._link(key)
+        if reference is not None:
+            entry.reference = reference
+        entry.last_used = time.time()
+        self.entries.move_to_end(entry.key)
+        self.dirty = True
+
+        while len(self.entries) > self.max_entries:
+            old_key, _ = self.entries.popitem(last=False)
+            self._unlink(old_key)
+        return entry
+
+    def invalidate(self, key):
+        # 按记录的参考图拖动未能通过验证（多为哈希碰撞到了另一张图）：保留条目，清除参考图
+        entry = self._find(key)
+        if entry is not None and entry.reference is not None:
+            entry.reference = None
+            self.dirty = True
+
+    def build_from_screenshots(self, root=None):
+        """
+        增量导入历史通过截图：只处理上次导入之后新增的截图库通过条目与旧版 *success.png，
+        以截图名称作为参考图
+        """
+        root = root or AppPath.ScreenshotRoot
+        added = 0
+        newest = self.built_until
+        store = ScreenshotStore(root).load()
+        # 已迁入截图库的旧版文件只从截图库读取，避免同一张图解码两次
+        sources = [(os.path.getmtime(path), os.path.basename(path), lambda p=path: cv2.imread(p))
+                   for path in glob.glob(os.path.join(root, "*success.png"))
+                   if os.path.basename(path) not in store.legacy]
+        sources += [(entry["time"], f"{entry['name']}success.png", lambda e=entry: store.read(e))
+                    for entry in store.query(outcome="success", since=self.built_until)]
+        for mtime, name, read in sources:
+            if mtime <= self.built_until:
+                continue
+            img = read()
+            if img is None:
+                continue
+            self.insert(rotation_invariant_hash(img), reference=name)
+            newest = max(newest, mtime)
+            added += 1
+        if newest != self.built_until:
+            self.built_until = newest
+            self.dirty = True
+        if added:
+            Log.info(f"验证码索引导入历史截图 {added} 张")
+        return added
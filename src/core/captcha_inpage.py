@@ -0,0 +1,201 @@
+from src.utils.log import Log
+from src.core.captcha_verify import script_timeout
+
+# 注入页面的求解循环：在浏览器内读取画布像素、计算结构张量主方向、直接向滑块派发指针事件，
+# 只把最终的遥测数据返回给 Python。结构张量方向与 estimate_angle 同为图像坐标系（y 向下），
+# 画面旋转时两者变化量一致（方向以 180° 为周期，按预测值展开）
+INPAGE_SOLVER_JS = r"""
+var canvasSel = arguments[0], sliderSel = arguments[1], trackSel = arguments[2], opts = arguments[3];
+var done = arguments[arguments.length - 1];
+var S = window.__autoClockSolver = window.__autoClockSolver || {pressed: false, moved: 0};
+var started = performance.now();
+
+function wrap180(a) { a = ((a + 90) % 180 + 180) % 180 - 90; return a; }
+
+function orientation() {
+    var c = document.querySelector(canvasSel);
+    var w = c.width, h = c.height;
+    var step = Math.max(1, Math.floor(Math.min(w, h) / opts.size));
+    var d = c.getContext('2d').getImageData(0, 0, w, h).data;
+    var gw = Math.floor(w / step), gh = Math.floor(h / step);
+    var g = new Float32Array(gw * gh);
+    for (var y = 0; y < gh; y++) {
+        for (var x = 0; x < gw; x++) {
+            var i = ((y * step) * w + x * step) * 4;
+            g[y * gw + x] = 0.299 * d[i] + 0.587 * d[i + 1] + 0.114 * d[i + 2];
+        }
+    }
+    var cx = gw / 2, cy = gh / 2, r = Math.min(gw, gh) / 2 * 0.9 - 1;
+    var jxx = 0, jxy = 0, jyy = 0;
+    for (var y = 1; y < gh - 1; y++) {
+        for (var x = 1; x < gw - 1; x++) {
+            if ((x - cx) * (x - cx) + (y - cy) * (y - cy) > r * r) continue;
+            var k = y * gw + x;
+            var gx = g[k + 1] - g[k - 1], gy = g[k + gw] - g[k - gw];
+            jxx += gx * gx; jxy += gx * gy; jyy += gy * gy;
+        }
+    }
+    var theta = 0.5 * Math.atan2(2 * jxy, jxx - jyy) * 180 / Math.PI;
+    var coherence = Math.sqrt((jxx - jyy) * (jxx - jyy) + 4 * jxy * jxy) / Math.max(jxx + jyy, 1e-6);
+    return [theta, coherence];
+}
+
+function fire(target, type, x, y, buttons) {
+    var init = {bubbles: true, cancelable: true, view: window, clientX: x, clientY: y,
+                screenX: x, screenY: y, button: 0, buttons: buttons};
+    var pointer = type.replace('mouse', 'pointer');
+    if (window.PointerEvent) {
+        target.dispatchEvent(new PointerEvent(pointer, Object.assign({pointerId: 1, pointerType: 'mouse', isPrimary: true}, init)));
+    }
+    target.dispatchEvent(new MouseEvent(type, init));
+}
+
+function moveTo(moved) {
+    S.moved = moved;
+    fire(document, 'mousemove', S.x + moved, S.y + (Math.random() * 2 - 1), 1);
+}
+
+function nextFrame(cb) {
+    requestAnimationFrame(function () { requestAnimationFrame(cb); });
+}
+
+try {
+    var first = orientation();
+    if (first[1] < opts.min_coherence) {
+        done({error: 'low coherence', coherence: first[1], pressed: S.pressed});
+        return;
+    }
+    var track = document.querySelector(trackSel);
+    var maxX = track ? track.getBoundingClientRect().width : 300;
+    if (!S.pressed) {
+        var slider = document.querySelector(sliderSel);
+        var rect = slider.getBoundingClientRect();
+        S.x = rect.left + rect.width / 2;
+        S.y = rect.top + rect.height / 2;
+        S.moved = 0;
+        fire(slider, 'mousedown', S.x, S.y, 1);
+        S.pressed = true;
+    }
+    // 需要的方向变化量：把当前角度转回 0°
+    var needed = -opts.angle, change = 0, theta = first[0];
+    var gain = opts.gain, steps = [];
+
+    // 目标超出轨道时改为多转（或少转）一圈
+    function fitTrack() {
+        var target = S.moved + (needed - change) / gain;
+        if (target >= 0 && target <= maxX) return;
+        [360, -360].some(function (k) {
+            var t = S.moved + (needed + k - change) / gain;
+            if (t >= 0 && t <= maxX) { needed += k; return true; }
+            return false;
+        });
+    }
+
+    function loop() {
+        if (gain) fitTrack();
+        var error = needed - change;
+        if (Math.abs(error) <= opts.tolerance || steps.length >= opts.max_steps) {
+            done({moved: S.moved, steps: steps, change: change, gain: gain,
+                  elapsed_ms: performance.now() - started, pressed: S.pressed});
+            return;
+        }
+        var dx = gain ? error / gain : opts.probe_px;
+        dx = Math.max(-opts.max_step, Math.min(opts.max_step, dx));
+        dx = Math.round(dx) || (dx < 0 ? -1 : 1);
+        dx = Math.max(-S.moved, Math.min(dx, maxX - S.moved));
+        if (!dx) {
+            done({moved: S.moved, steps: steps, change: change, gain: gain,
+                  elapsed_ms: performance.now() - started, pressed: S.pressed, error: 'track end'});
+            return;
+        }
+        moveTo(S.moved + dx);
+        nextFrame(function () {
+            var now = orientation();
+            var predicted = gain ? gain * dx : 0;
+            var delta = predicted + wrap180(now[0] - theta - predicted);
+            theta = now[0];
+            change += delta;
+            steps.push([dx, delta, now[1]]);
+            var observed = delta / dx;
+            if (Math.abs(observed) > 1e-3 && (!gain || observed * gain > 0)) gain = observed;
+            loop();
+        });
+    }
+    loop();
+} catch (e) {
+    done({error: String(e), pressed: S.pressed, moved: S.moved});
+}
+"""
+
+INPAGE_RELEASE_JS = r"""
+var S = window.__autoClockSolver;
+if (!S || !S.pressed) return false;
+var init = {bubbles: true, cancelable: true, view: window, clientX: S.x + S.moved, clientY: S.y, button: 0, buttons: 0};
+if (window.PointerEvent) document.dispatchEvent(new PointerEvent('pointerup', Object.assign({pointerId: 1, pointerType: 'mouse', isPrimary: true}, init)));
+document.dispatchEvent(new MouseEvent('mouseup', init));
+S.pressed = false;
+return true;
+"""
+
+class InPageSolver:
+    """
+    浏览器内求解：整个 估计-拖动 循环在页面中完成，每轮只有一次 WebDriver 往返
+
+    :param driver: WebDriver
+    :param selectors: 验证码选择器
+    :param tolerance: 收敛阈值（度）
+    :param max_steps: 单轮最多移动次数
+    :param min_coherence: 结构张量方向一致性下限，低于此值认为画面无明显方向，不在页面内求解
+    :param timeout: 脚本超时时间（秒）
+    """
+    def __init__(self, driver, selectors, tolerance=3, max_steps=20, min_coherence=0.05, probe_px=15,
+                 max_step=120, size=96, timeout=15):
+        self.driver = driver
+        self.selectors = selectors
+        self.options = {
+            "tolerance": tolerance,
+            "max_steps": max_steps,
+            "min_coherence": min_coherence,
+            "probe_px": probe_px,
+            "max_step": max_step,
+            "size": size,
+        }
+        self.timeout = timeout
+        self.gain = None
+        self.pressed = False
+
+    def solve(self, angle, gain=None):
+        """
+        :param angle: 当前角度（由 OpenCV 估计）
+        :param gain: 每像素角度，None 时由页面内试探得到
+        :return: 页面返回的遥测；出错时为 None
+        """
+        options = dict(self.options, angle=angle, gain=gain if gain is not None else self.gain)
+        try:
+            with script_timeout(self.driver, self.timeout):
+                result = self.driver.execute_async_script(
+                    INPAGE_SOLVER_JS, self.selectors.canvas, self.selectors.slider, self.selectors.track, options)
+        except Exception as e:
+            Log.waring(f"页面内求解执行失败: {e}")
+            return None
+        if not isinstance(result, dict):
+            return None
+        self.pressed = bool(result.get("pressed"))
+        if result.get("error"):
+            Log.waring(f"页面内求解中断: {result['error']}")
+            if "moved" not in result or not result.get("steps"):
+                return None
+        if result.get("gain"):
+            self.gain = result["gain"]
+        Log.info(f"页面内求解: 移动 {len(result.get('steps', []))} 次，累计 {result.get('moved')}px，"
+                 f"方向变化 {result.get('change', 0):.1f}°，耗时 {result.get('elapsed_ms', 0):.0f}ms")
+        return result
+
+    def release(self):
+        try:
+            released = self.driver.execute_script(INPAGE_RELEASE_JS)
+        except Exception as e:
+            Log.waring(f"页面内松开滑块失败: {e}")
+            return False
+        self.pressed = False
+        return bool(released)
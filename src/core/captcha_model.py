@@ -0,0 +1,195 @@
+import os
+import json
+import math
+import time
+
+import cv2
+import numpy as np
+
+from datetime import datetime
+from functools import lru_cache
+
+from src.utils.log import Log
+from src.utils.const import AppPath
+from src.core.captcha_synthetic import SyntheticCaptcha, angle_error
+
+MODEL_FORMAT = "auto-clock-angle-mlp"
+MODEL_VERSION = 1
+INPUT_SIZE = 32
+MODEL_MIN_CONFIDENCE = 0.8
+
+@lru_cache(maxsize=4)
+def input_mask(size, ratio=0.9):
+    yy, xx = np.mgrid[:size, :size]
+    c = (size - 1) / 2
+    return (((xx - c) ** 2 + (yy - c) ** 2) <= (size / 2 * ratio) ** 2).ravel()
+
+def model_features(img, size=INPUT_SIZE):
+    """
+    模型输入：缩小到 size x size 的灰度图，圆形 ROI 内标准化、ROI 外置 0，展平为一维
+
+    :param img: BGR/灰度图，或 FrameAnalysis（直接使用其工作分辨率灰度图）
+    """
+    gray = getattr(img, "gray", None)
+    if gray is None:
+        gray = img if img.ndim == 2 else cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    small = cv2.resize(gray, (size, size), interpolation=cv2.INTER_AREA).astype(np.float32).ravel()
+    mask = input_mask(size)
+    inside = small[mask]
+    small -= inside.mean()
+    small /= inside.std() + 1e-6
+    small[~mask] = 0
+    return small
+
+class AngleModel:
+    """
+    CPU 上训练、纯 numpy 推理的角度回归模型：单隐层 MLP，输出 (cos, sin)，角度取 atan2，
+    输出向量的模长作为置信度（训练目标为单位向量，画面方向不明确时模长变小）
+
+    :param w1, b1, w2, b2: 网络参数
+    :param meta: 模型信息（格式、版本、输入尺寸、训练样本数、验证误差等）
+    """
+    def __init__(self, w1, b1, w2, b2, meta=None):
+        self.w1, self.b1, self.w2, self.b2 = (np.asarray(p, dtype=np.float32) for p in (w1, b1, w2, b2))
+        self.meta = dict(meta or {})
+        self.input_size = int(self.meta.get("input_size", INPUT_SIZE))
+
+    @staticmethod
+    def default_path():
+        return os.path.join(AppPath.DataRoot, "captcha_model.npz")
+
+    @classmethod
+    def load(cls, path=None):
+        path = path or cls.default_path()
+        if not os.path.exists(path):
+            Log.waring(f"角度模型不存在: {path}")
+            return None
+        try:
+            with np.load(path) as data:
+                meta = json.loads(str(data["meta"]))
+                if meta.get("format") != MODEL_FORMAT or meta.get("version") != MODEL_VERSION:
+                    Log.waring(f"角度模型格式或版本不匹配: {meta.get('format')} v{meta.get('version')}")
+                    return None
+                model = cls(data["w1"], data["b1"], data["w2"], data["b2"], meta)
+            Log.info(f"角度模型加载完成: {path}，训练于 {meta.get('trained')}，验证误差 {meta.get('val_mae', 0):.1f}°")
+            return model
+        except Exception as e:
+            Log.waring(f"角度模型读取失败: {e}")
+            return None
+
+    def save(self, path=None):
+        path = path or self.default_path()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        meta = dict(self.meta, format=MODEL_FORMAT, version=MODEL_VERSION, input_size=self.input_size)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez(f, w1=self.w1, b1=self.b1, w2=self.w2, b2=self.b2, meta=np.array(json.dumps(meta)))
+        os.replace(tmp_path, path)
+        return path
+
+    def forward(self, x):
+        hidden = np.maximum(x @ self.w1 + self.b1, 0)
+        return hidden @ self.w2 + self.b2
+
+    def predict(self, x):
+        """
+        :param x: (n, 特征数) 的特征矩阵
+        :return: (角度数组, 置信度数组)，角度与 estimate_angle 同一约定
+        """
+        out = self.forward(x)
+        return np.degrees(np.arctan2(out[:, 1], out[:, 0])), np.minimum(np.hypot(out[:, 0], out[:, 1]), 1.0)
+
+    def estimate(self, img):
+        # 估计器接口：输入 FrameAnalysis 或图像，返回 (角度, 置信度)
+        out = self.forward(model_features(img, self.input_size))
+        return math.degrees(math.atan2(out[1], out[0])), min(1.0, math.hypot(out[0], out[1]))
+
+def synthetic_dataset(generator, count, seed, size=INPUT_SIZE):
+    features = np.empty((count, size * size), dtype=np.float32)
+    angles = np.empty(count, dtype=np.float32)
+    for i, sample in enumerate(generator.samples(count, seed)):
+        features[i] = model_features(sample.img, size)
+        angles[i] = sample.angle
+    return features, angles
+
+def train_model(images, samples=20000, epochs=30, hidden=128, lr=1e-3, batch=128, val_samples=1000, seed=0,
+                canvas=128, disc_prob=0.3, log=None):
+    """
+    从正立的验证码图片训练角度模型：用 SyntheticCaptcha 生成已知角度的旋转样本（整图/内圆盘、噪声、JPEG），
+    小批量 Adam 最小化 (cos, sin) 的均方误差，只用 CPU
+
+    :param images: 正立的 BGR 图片列表（如 CaptchaCorpus 中通过的截图），为空时使用程序化种子
+    :param samples: 训练样本数
+    :param epochs: 训练轮数
+    :param hidden: 隐层宽度
+    :param val_samples: 验证样本数（同一图片池、不同旋转与噪声）
+    :param canvas: 合成画布边长，只影响生成速度
+    :param log: 进度输出函数，默认 Log.info
+    :return: (模型, 验证报告)
+    """
+    log = log or Log.info
+    rng = np.random.default_rng(seed)
+    generator = SyntheticCaptcha(images, size=canvas, disc_prob=disc_prob)
+    started = time.perf_counter()
+    x, angles = synthetic_dataset(generator, samples, seed)
+    x_val, angles_val = synthetic_dataset(generator, val_samples, seed + 1)
+    y = np.stack([np.cos(np.radians(angles)), np.sin(np.radians(angles))], axis=1)
+    log(f"合成训练样本 {samples} 张、验证样本 {val_samples} 张，耗时 {time.perf_counter() - started:.1f}s")
+
+    n_in = x.shape[1]
+    params = [
+        (rng.standard_normal((n_in, hidden)) * np.sqrt(2 / n_in)).astype(np.float32),
+        np.zeros(hidden, dtype=np.float32),
+        (rng.standard_normal((hidden, 2)) * np.sqrt(1 / hidden)).astype(np.float32),
+        np.zeros(2, dtype=np.float32),
+    ]
+    model = AngleModel(*params)
+    params = [model.w1, model.b1, model.w2, model.b2]
+    moments = [np.zeros_like(p) for p in params]
+    velocities = [np.zeros_like(p) for p in params]
+    step = 0
+    best = (float("inf"), None)
+
+    def evaluate():
+        predicted, confidence = model.predict(x_val)
+        errors = np.array([angle_error(p, t) for p, t in zip(predicted, angles_val)])
+        return errors, confidence
+
+    for epoch in range(epochs):
+        order = rng.permutation(samples)
+        for start in range(0, samples, batch):
+            idx = order[start:start + batch]
+            xb, yb = x[idx], y[idx]
+            h = xb @ model.w1 + model.b1
+            a = np.maximum(h, 0)
+            grad_out = 2 * (a @ model.w2 + model.b2 - yb) / len(idx)
+            grad_h = (grad_out @ model.w2.T) * (h > 0)
+            grads = [xb.T @ grad_h, grad_h.sum(axis=0), a.T @ grad_out, grad_out.sum(axis=0)]
+            step += 1
+            for p, g, m, v in zip(params, grads, moments, velocities):
+                m *= 0.9
+                m += 0.1 * g
+                v *= 0.999
+                v += 0.001 * g * g
+                p -= lr * (m / (1 - 0.9 ** step)) / (np.sqrt(v / (1 - 0.999 ** step)) + 1e-8)
+
+        errors, _ = evaluate()
+        mae = float(errors.mean())
+        # Adam 偶有震荡，保留验证误差最小的一轮
+        if mae < best[0]:
+            best = (mae, [p.copy() for p in params])
+        log(f"第 {epoch + 1}/{epochs} 轮: 验证平均误差 {mae:.2f}°，误差 > 10° 占 {(errors > 10).mean():.1%}")
+
+    for p, saved in zip(params, best[1]):
+        p[...] = saved
+    errors, confidence = evaluate()
+    report = {
+        "val_mae": float(errors.mean()),
+        "val_p50": float(np.median(errors)),
+        "val_fail": float((errors > 10).mean()),
+        "val_confidence_p50": float(np.median(confidence)),
+        "train_seconds": round(time.perf_counter() - started, 1),
+    }
+    model.meta.update(report, trained=datetime.now().isoformat(timespec="seconds"), samples=samples,
+                      epochs=epochs, hidden=hidden, images=len(generator.seeds), input_size=INPUT_SIZE)
+    return model, report
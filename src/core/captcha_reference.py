@@ -0,0 +1,159 @@
+import os
+import glob
+
+import cv2
+import numpy as np
+
+from src.utils.log import Log
+from src.utils.const import AppPath
+from src.core.captcha_screenshot import ScreenshotStore
+
+ANGLE_BINS = 360
+RADIAL_BINS = 48
+
+def polar_signature(img, angle_bins=ANGLE_BINS, radial_bins=RADIAL_BINS):
+    """
+    对数极坐标签名：旋转在对数极坐标下变为角度轴上的循环平移，
+    返回沿角度轴的 rfft 结果，形状为 (angle_bins // 2 + 1, 径向列数)
+    """
+    gray = img if img.ndim == 2 else cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    gray = gray.astype(np.float32)
+    h, w = gray.shape
+    polar = cv2.warpPolar(gray, (radial_bins, angle_bins), (w / 2, h / 2), min(h, w) / 2 * 0.95,
+                          cv2.WARP_POLAR_LOG | cv2.INTER_LINEAR)
+    # 去掉圆心附近采样过密的部分，并逐列去均值
+    polar = polar[:, radial_bins // 4:]
+    polar = polar - polar.mean(axis=0)
+    return np.fft.rfft(polar, axis=0).astype(np.complex64)
+
+def phase_correlate(signature, refs):
+    """
+    沿角度轴做相位相关，refs 可为单个签名或 (n, ...) 的签名堆叠
+
+    :return: (每个参考的峰值位置(可为小数), 每个参考的峰值响应)
+    """
+    refs = np.asarray(refs)
+    single = refs.ndim == 2
+    if single:
+        refs = refs[None]
+    # 部分白化的相位相关：纯相位相关对插值带来的高频噪声过于敏感，保留幅值的平方根更稳健；
+    # 以 sum(|cross|) 归一化，峰值响应落在 [0, 1]
+    cross = signature[None] * np.conj(refs)
+    magnitude = np.sqrt(np.abs(cross)) + 1e-9
+    cross /= magnitude
+    weights = np.where(np.arange(cross.shape[1]) % (ANGLE_BINS // 2) == 0, 1.0, 2.0)[None, :]
+    norm = (magnitude * weights[..., None]).sum(axis=(1, 2)) / ANGLE_BINS
+    curves = np.fft.irfft(cross.sum(axis=2), n=ANGLE_BINS, axis=1) / norm[:, None]
+    peaks = np.argmax(curves, axis=1)
+    idx = np.arange(len(curves))
+    responses = curves[idx, peaks]
+
+    # 抛物线插值得到亚像素峰值
+    left = curves[idx, (peaks - 1) % ANGLE_BINS]
+    right = curves[idx, (peaks + 1) % ANGLE_BINS]
+    denom = left - 2 * responses + right
+    delta = np.where(np.abs(denom) > 1e-9, 0.5 * (left - right) / np.where(denom == 0, 1, denom), 0.0)
+    shifts = peaks + np.clip(delta, -0.5, 0.5)
+    if single:
+        return shifts[0], responses[0]
+    return shifts, responses
+
+def shift_to_angle(shift):
+    # 峰值位置 k 对应当前画面相对参考图逆时针旋转了 -k 个角度单位，转回正立需要 k 个单位，
+    # 与 estimate_angle 等估计器同一约定
+    angle = shift * 360.0 / ANGLE_BINS
+    return ((angle + 180) % 360) - 180
+
+class ReferenceLibrary:
+    """
+    正向参考图库：收集历史验证通过的截图（截图库通过条目与旧版 *success.png），缓存其对数极坐标签名，
+    对新画面做一次相位相关即可得到相对正向的旋转角度
+
+    :param root: 截图目录，默认 AppPath.ScreenshotRoot
+    :param cache_path: 签名缓存文件，默认 AppPath.DataRoot/reference_library.npz
+    :param max_refs: 最多使用的参考图数量（取最新的）
+    """
+    def __init__(self, root=None, cache_path=None, max_refs=300):
+        self.root = root or AppPath.ScreenshotRoot
+        self.cache_path = cache_path or os.path.join(AppPath.DataRoot, "reference_library.npz")
+        self.max_refs = max_refs
+        self.names = []
+        self.signatures = None
+
+    def __len__(self):
+        return len(self.names)
+
+    def reference_files(self):
+        """
+        :return: 最新的 max_refs 张通过截图 [(名称, 文件路径)]，内容相同或名称相同的截图只取一张
+        """
+        store = ScreenshotStore(self.root).load()
+        # 已迁入截图库的旧版文件（保留原文件时）只从截图库读取
+        files = [(os.path.getmtime(path), os.path.basename(path), path)
+                 for path in glob.glob(os.path.join(self.root, "*success.png"))
+                 if os.path.basename(path) not in store.legacy]
+        files += [(entry["time"], f"{entry['name']}success.png", store.blob_path(entry))
+                  for entry in store.query(outcome="success")]
+        files.sort(reverse=True)
+        refs, seen = [], set()
+        for _, name, path in files:
+            if path not in seen and name not in seen:
+                seen.update((path, name))
+                refs.append((name, path))
+        return refs[:self.max_refs]
+
+    def _load_cache(self):
+        if not os.path.exists(self.cache_path):
+            return {}
+        try:
+            with np.load(self.cache_path) as data:
+                return dict(zip(data["names"].tolist(), data["signatures"]))
+        except Exception as e:
+            Log.waring(f"参考图签名缓存读取失败: {e}")
+            return {}
+
+    def _save_cache(self):
+        try:
+            os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+            np.savez(self.cache_path, names=np.array(self.names), signatures=self.signatures)
+        except Exception as e:
+            Log.waring(f"参考图签名缓存写入失败: {e}")
+
+    def load(self):
+        # 增量加载：已缓存的签名直接复用，只解码新增截图
+        cached = self._load_cache()
+        names, signatures = [], []
+        added = 0
+        for name, path in self.reference_files():
+            signature = cached.get(name)
+            if signature is None:
+                img = cv2.imread(path)
+                if img is None:
+                    continue
+                signature = polar_signature(img)
+                added += 1
+            names.append(name)
+            signatures.append(signature)
+
+        self.names = names
+        self.signatures = np.stack(signatures) if signatures else None
+        if added or len(cached) != len(names):
+            self._save_cache()
+        Log.info(f"参考图库加载完成: {len(names)} 张（新增 {added} 张）")
+        return self
+
+    def match(self, img):
+        """
+        与全部参考图匹配
+
+        :return: (角度, 置信度, 参考图索引)，图库为空时返回 (None, 0.0, None)
+        """
+        if self.signatures is None:
+            return None, 0.0, None
+        shifts, responses = phase_correlate(polar_signature(img), self.signatures)
+        best = int(np.argmax(responses))
+        return float(shift_to_angle(shifts[best])), float(responses[best]), best
+
+    def match_one(self, img, index):
+        shift, response = phase_correlate(polar_signature(img), self.signatures[index])
+        return float(shift_to_angle(shift)), float(response)
@@ -0,0 +1,495 @@
+import os
+import re
+import glob
+import json
+import time
+import queue
+import atexit
+import hashlib
+import threading
+
+import cv2
+import numpy as np
+
+from typing import Optional
+from datetime import datetime
+from contextlib import contextmanager
+from dataclasses import dataclass
+from collections import OrderedDict, Counter
+
+from src.utils.log import Log
+from src.utils.const import AppPath
+
+STORE_VERSION = 1
+SIDECAR_VERSION = 1
+SCREENSHOT_PATTERN = re.compile(r"_debug_canvas_attempt_(\d+)(success|failed)\.png$")
+ATTEMPT_PATTERN = re.compile(r"_debug_canvas_attempt_(\d+)$")
+DATE_PATTERN = re.compile(r"^(\d{4})_(\d{2})_(\d{2})_")
+LOCK_TIMEOUT = 10
+LOCK_STALE = 60
+
+def content_hash(img):
+    # 按解码后的像素计算，同一画面重新编码保存也视为重复
+    h = hashlib.blake2b(digest_size=16)
+    h.update(str(img.shape).encode("ascii"))
+    h.update(np.ascontiguousarray(img).data)
+    return h.hexdigest()
+
+def sidecar_path(png_path):
+    return os.path.splitext(png_path)[0] + ".json"
+
+def write_sidecar(png_path, record):
+    """
+    在截图旁写入同名 .json，记录该次尝试的遥测数据
+
+    :param record: 可 JSON 序列化的字典
+    """
+    try:
+        with open(sidecar_path(png_path), "w", encoding="utf-8") as f:
+            json.dump(dict(record, version=SIDECAR_VERSION), f, ensure_ascii=False)
+    except Exception as e:
+        Log.waring(f"验证码遥测写入失败: {e}")
+
+def read_sidecar(png_path):
+    path = sidecar_path(png_path)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except Exception as e:
+        Log.waring(f"验证码遥测读取失败: {path}, {e}")
+        return None
+
+@contextmanager
+def file_lock(path, timeout=LOCK_TIMEOUT, stale=LOCK_STALE):
+    """
+    以独占创建 path 作为跨进程锁；超过 stale 秒未释放的锁视为持有者已退出，直接接管
+
+    :raise TimeoutError: timeout 秒内未取得锁
+    """
+    deadline = time.time() + timeout
+    while True:
+        try:
+            fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            break
+        except FileExistsError:
+            try:
+                if time.time() - os.path.getmtime(path) > stale:
+                    Log.waring(f"锁文件超时未释放，接管: {path}")
+                    os.remove(path)
+                    continue
+            except FileNotFoundError:
+                continue
+            if time.time() > deadline:
+                raise TimeoutError(f"等待锁超时: {path}")
+            time.sleep(0.05)
+    try:
+        os.write(fd, str(os.getpid()).encode("ascii"))
+        os.close(fd)
+        yield
+    finally:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+@dataclass
+class RetentionPolicy:
+    """
+    截图保留策略，任一条件超出即从最旧的截图开始清理，None 表示不限制；
+    从旧版目录迁入的截图按迁入时间计算新旧，迁入后至少保留 max_age_days
+
+    :param max_age_days: 最长保留天数
+    :param max_count: 最多保留的截图条数
+    :param max_bytes: 图片文件总大小上限
+    :param remove_legacy: 旧版截图迁入后是否删除原文件，默认保留
+    """
+    max_age_days: Optional[float] = 30
+    max_count: Optional[int] = 3000
+    max_bytes: Optional[int] = 500 * 1024 * 1024
+    remove_legacy: bool = False
+
+class ScreenshotStore:
+    """
+    按内容寻址的调试截图库：图片按像素哈希存为 blobs/xx/<哈希>.<格式>，内容相同的截图共用一个文件；
+    store.json 记录每张截图的名称、日期、运行、尝试序号、结果、遥测与所用文件，查询只读索引、不列目录。
+    保留策略按天数、条数与总大小增量清理，每次最多删除 budget 条，清理不会集中占用一次运行的时间。
+    多个进程可同时打开同一截图库：保存时在锁内重新读取磁盘上的索引并合并，不覆盖其他进程写入的条目
+
+    :param root: 截图目录，默认 AppPath.ScreenshotRoot
+    :param fmt: 新图片的编码格式，"webp"（无损）或 "png"
+    :param png_level: PNG 压缩级别 0~9
+    :param policy: RetentionPolicy，默认 30 天 / 3000 条 / 500MB
+    """
+    def __init__(self, root=None, fmt="webp", png_level=3, policy=None):
+        self.root = root or AppPath.ScreenshotRoot
+        self.fmt = fmt
+        self.png_level = png_level
+        self.policy = policy or RetentionPolicy()
+        self.entries = OrderedDict()
+        self.blobs = {}
+        self.legacy = set()
+        self.total_bytes = 0
+        self._removed = set()
+        self._lock = threading.RLock()
+
+    @property
+    def index_path(self):
+        return os.path.join(self.root, "store.json")
+
+    def __len__(self):
+        return len(self.entries)
+
+    def _read_index(self):
+        if not os.path.exists(self.index_path):
+            return None
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") != STORE_VERSION:
+                Log.waring(f"截图索引版本不匹配，忽略: {data.get('version')}")
+                return None
+            return data
+        except Exception as e:
+            Log.waring(f"截图索引读取失败: {e}")
+            return None
+
+    def load(self):
+        data = self._read_index()
+        if data is None:
+            return self
+        self.entries = OrderedDict((e["name"], e) for e in data.get("entries", []))
+        self.blobs = data.get("blobs", {})
+        self.legacy = set(data.get("legacy", []))
+        self.total_bytes = sum(blob["bytes"] for blob in self.blobs.values())
+        return self
+
+    def _merge(self, data):
+        # 并入其他进程写入的条目：本进程已删除的不恢复，同名条目保留 time 较新的一方
+        blobs = data.get("blobs", {})
+        for entry in data.get("entries", []):
+            name, digest = entry["name"], entry["blob"]
+            ours = self.entries.get(name)
+            if name in self._removed or (ours is not None and ours["time"] >= entry["time"]):
+                continue
+            if digest not in self.blobs:
+                if digest not in blobs or not os.path.exists(
+                        os.path.join(self.root, "blobs", digest[:2], blobs[digest]["file"])):
+                    continue
+                self.blobs[digest] = dict(blobs[digest])
+            self.entries[name] = entry
+        self.legacy |= set(data.get("legacy", []))
+        # 引用计数按合并后的条目重新统计，无人引用的文件记录移出索引
+        refs = Counter(entry["blob"] for entry in self.entries.values())
+        for digest in list(self.blobs):
+            if refs[digest]:
+                self.blobs[digest]["refs"] = refs[digest]
+            else:
+                del self.blobs[digest]
+        self.total_bytes = sum(blob["bytes"] for blob in self.blobs.values())
+
+    def save(self):
+        with self._lock:
+            try:
+                os.makedirs(self.root, exist_ok=True)
+                with file_lock(self.index_path + ".lock"):
+                    data = self._read_index()
+                    if data is not None:
+                        self._merge(data)
+                    data = {"version": STORE_VERSION, "entries": list(self.entries.values()), "blobs": self.blobs,
+                            "legacy": sorted(self.legacy)}
+                    tmp_path = self.index_path + ".tmp"
+                    with open(tmp_path, "w", encoding="utf-8") as f:
+                        json.dump(data, f, ensure_ascii=False)
+                    os.replace(tmp_path, self.index_path)
+                self._removed.clear()
+            except Exception as e:
+                Log.waring(f"截图索引写入失败: {e}")
+
+    def blob_path(self, entry):
+        blob = self.blobs[entry["blob"]]
+        return os.path.join(self.root, "blobs", entry["blob"][:2], blob["file"])
+
+    def _encode(self, img):
+        if self.fmt == "webp":
+            # 质量大于 100 时 OpenCV 使用无损 WebP
+            return ".webp", cv2.imencode(".webp", img, [cv2.IMWRITE_WEBP_QUALITY, 101])
+        return ".png", cv2.imencode(".png", img, [cv2.IMWRITE_PNG_COMPRESSION, self.png_level])
+
+    def _add_blob(self, img):
+        digest = content_hash(img)
+        blob = self.blobs.get(digest)
+        if blob is not None:
+            blob["refs"] += 1
+            return digest
+        ext, (ok, buf) = self._encode(img)
+        if not ok:
+            raise IOError(f"图片编码失败: {self.fmt}")
+        folder = os.path.join(self.root, "blobs", digest[:2])
+        os.makedirs(folder, exist_ok=True)
+        tmp_path = os.path.join(folder, digest + ext + ".tmp")
+        with open(tmp_path, "wb") as f:
+            f.write(buf.tobytes())
+        os.replace(tmp_path, os.path.join(folder, digest + ext))
+        self.blobs[digest] = {"file": digest + ext, "bytes": int(buf.size), "refs": 1}
+        self.total_bytes += int(buf.size)
+        return digest
+
+    def _release_blob(self, digest):
+        blob = self.blobs.get(digest)
+        if blob is None:
+            return
+        blob["refs"] -= 1
+        if blob["refs"] > 0:
+            return
+        try:
+            os.remove(os.path.join(self.root, "blobs", digest[:2], blob["file"]))
+        except FileNotFoundError:
+            pass
+        self.total_bytes -= blob["bytes"]
+        del self.blobs[digest]
+
+    def put(self, name, img, run=None, outcome=None, telemetry=None, timestamp=None):
+        """
+        :param name: 截图名称，形如 {时间}_debug_canvas_attempt_{N}（不含结果后缀）
+        :param run: 所属运行的标识
+        :param outcome: "success"/"failed"，结果未知时为 None
+        :return: 索引条目
+        """
+        with self._lock:
+            timestamp = time.time() if timestamp is None else timestamp
+            old = self.entries.pop(name, None)
+            self._removed.discard(name)
+            if old is not None:
+                self._release_blob(old["blob"])
+            date = DATE_PATTERN.match(name)
+            attempt = ATTEMPT_PATTERN.search(name)
+            entry = {
+                "name": name,
+                "blob": self._add_blob(img),
+                "date": "-".join(date.groups()) if date else datetime.fromtimestamp(timestamp).strftime("%Y-%m-%d"),
+                "attempt": int(attempt.group(1)) if attempt else None,
+                "run": run,
+                "outcome": outcome,
+                "time": timestamp,
+                "telemetry": telemetry,
+            }
+            self.entries[name] = entry
+            return entry
+
+    def label(self, name, outcome, telemetry=None):
+        # 结果确定后补记结果与遥测，time 更新为标注时间，增量导入按它判断新旧
+        with self._lock:
+            entry = self.entries.get(name)
+            if entry is None:
+                return None
+            entry["outcome"] = outcome
+            if telemetry is not None:
+                entry["telemetry"] = telemetry
+            entry["time"] = time.time()
+            self.entries.move_to_end(name)
+            return entry
+
+    def query(self, outcome=None, date=None, run=None, since=None, until=None):
+        """
+        :param outcome: "success"/"failed"，None 表示全部
+        :param date: "YYYY-MM-DD"
+        :param run: 运行标识
+        :param since: 只返回 time 大于此值的条目
+        :param until: 只返回 time 不大于此值的条目
+        :return: 按 time 排序的条目列表
+        """
+        with self._lock:
+            entries = [e for e in self.entries.values()
+                       if (outcome is None or e["outcome"] == outcome)
+                       and (date is None or e["date"] == date)
+                       and (run is None or e["run"] == run)
+                       and (since is None or e["time"] > since)
+                       and (until is None or e["time"] <= until)]
+        return sorted(entries, key=lambda e: e["time"])
+
+    def read(self, entry):
+        return cv2.imread(self.blob_path(entry), cv2.IMREAD_COLOR)
+
+    @staticmethod
+    def _retention_time(entry):
+        # 迁入的旧版截图从迁入时开始计算保留时间
+        return max(entry["time"], entry.get("imported") or 0)
+
+    def _over_limit(self, oldest, now):
+        policy = self.policy
+        return (policy.max_count is not None and len(self.entries) > policy.max_count) \
+            or (policy.max_bytes is not None and self.total_bytes > policy.max_bytes) \
+            or (policy.max_age_days is not None and now - self._retention_time(oldest) > policy.max_age_days * 86400)
+
+    def sweep(self, budget=50):
+        """
+        按保留策略从最旧的截图开始清理，最多删除 budget 条
+
+        :return: 删除的条数
+        """
+        removed = 0
+        now = time.time()
+        with self._lock:
+            for oldest in sorted(self.entries.values(), key=self._retention_time)[:budget]:
+                if not self._over_limit(oldest, now):
+                    break
+                del self.entries[oldest["name"]]
+                self._removed.add(oldest["name"])
+                self._release_blob(oldest["blob"])
+                removed += 1
+        if removed:
+            Log.info(f"截图库按保留策略清理 {removed} 条，剩余 {len(self.entries)} 条，"
+                     f"{self.total_bytes / 1024 / 1024:.1f}MB")
+        return removed
+
+    def import_legacy(self, limit=200, remove=None):
+        """
+        把旧版直接保存在截图目录下的 *_debug_canvas_attempt_N{success|failed}.png（及遥测 .json）
+        复制进截图库，每次最多迁移 limit 张；已迁移过的文件名记录在索引中，不会重复迁移。
+        条目保留原文件的时间，另记迁入时间，保留策略按迁入时间计算
+
+        :param remove: 迁移后是否删除原文件，None 表示按保留策略的 remove_legacy
+        :return: 迁移的张数
+        """
+        remove = self.policy.remove_legacy if remove is None else remove
+        paths = []
+        for path in glob.glob(os.path.join(self.root, "*_debug_canvas_attempt_*.png")):
+            match = SCREENSHOT_PATTERN.search(os.path.basename(path))
+            if match is not None and os.path.basename(path) not in self.legacy:
+                paths.append((os.path.getmtime(path), path, match))
+        moved = 0
+        now = time.time()
+        for mtime, path, match in sorted(paths)[:limit]:
+            img = cv2.imread(path, cv2.IMREAD_COLOR)
+            if img is None:
+                continue
+            name = os.path.basename(path)[:match.start(2)]
+            with self._lock:
+                entry = self.put(name, img, outcome=match.group(2), telemetry=read_sidecar(path), timestamp=mtime)
+                entry["imported"] = now
+                self.legacy.add(os.path.basename(path))
+            if remove:
+                os.remove(path)
+                if os.path.exists(sidecar_path(path)):
+                    os.remove(sidecar_path(path))
+            moved += 1
+        if moved:
+            self.save()
+            Log.info(f"旧版截图迁入截图库 {moved} 张")
+        return moved
+
+class ScreenshotWriter:
+    """
+    后台写调试截图：拖动线程只把内存中的画面放入有界队列，编码、写盘、结果标注与清理都在写入线程完成，
+    松开滑块前不再有任何 I/O。队列满时丢弃截图而不阻塞验证流程
+
+    :param store: ScreenshotStore，默认在首次写入时加载 AppPath.ScreenshotRoot 下的截图库
+    :param max_queue: 队列上限（截图与标注任务合计）
+    :param sweep_budget: 每次标注后按保留策略最多清理的条数
+    """
+    def __init__(self, store=None, max_queue=16, sweep_budget=20):
+        self.store = store
+        self.fmt = "webp"
+        self.policy = None
+        self.max_queue = max_queue
+        self.sweep_budget = sweep_budget
+        self.written = 0
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._thread = None
+        self._lock = threading.Lock()
+        self._registered = False
+
+    def _ensure_thread(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="screenshot-writer", daemon=True)
+                self._thread.start()
+                if not self._registered:
+                    # 进程退出前写完队列中剩余的截图
+                    atexit.register(self.close)
+                    self._registered = True
+
+    def _put(self, job):
+        self._ensure_thread()
+        try:
+            self._queue.put_nowait(job)
+            return True
+        except queue.Full:
+            self.dropped += 1
+            Log.waring(f"截图写入队列已满（{self.max_queue}），丢弃: {job[1]}")
+            return False
+
+    def submit(self, name, img, run=None):
+        """
+        :param name: 不含结果后缀与扩展名的文件名
+        :param img: BGR 画面，提交后不应再修改
+        :param run: 所属运行的标识
+        :return: 是否已放入队列
+        """
+        if img is None:
+            return False
+        return self._put(("write", name, (img, run)))
+
+    def label(self, name, outcome, record=None):
+        """
+        结果确定后在截图库中标注结果与遥测
+
+        :param record: 遥测字典，None 表示不写
+        """
+        return self._put(("label", name, (outcome, record)))
+
+    def configure(self, fmt="webp", policy=None):
+        """
+        :param fmt: 新截图的编码格式
+        :param policy: RetentionPolicy，None 表示默认策略
+        """
+        self.fmt = fmt
+        self.policy = policy
+        if self.store is not None:
+            self.store.fmt = fmt
+            self.store.policy = policy or RetentionPolicy()
+
+    def _open_store(self):
+        if self.store is None:
+            self.store = ScreenshotStore(fmt=self.fmt, policy=self.policy).load()
+            # 首次打开时顺带迁移一批旧版截图
+            self.store.import_legacy()
+        return self.store
+
+    def _run(self):
+        while True:
+            job = self._queue.get()
+            try:
+                if job is None:
+                    return
+                kind, name, payload = job
+                store = self._open_store()
+                if kind == "write":
+                    img, run = payload
+                    store.put(name, img, run=run)
+                    self.written += 1
+                else:
+                    outcome, record = payload
+                    store.label(name, outcome, record)
+                    store.sweep(self.sweep_budget)
+                store.save()
+            except Exception as e:
+                Log.error(f"验证码截图保存失败: {e}")
+            finally:
+                self._queue.task_done()
+
+    def flush(self):
+        # 等待已提交的任务全部完成（测试与退出前使用）
+        if self._thread is not None and self._thread.is_alive():
+            self._queue.join()
+
+    def close(self):
+        if self._thread is None or not self._thread.is_alive():
+            return
+        self.flush()
+        self._queue.put(None)
+        self._thread.join(timeout=5)
+        self._thread = None
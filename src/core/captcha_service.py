@@ -0,0 +1,233 @@
+import time
+import types
+import threading
+import multiprocessing
+
+import numpy as np
+
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+from src.utils.log import Log
+
+# ---------------------------------------------------------------------------------------------------工作进程
+_worker_solver = None
+_worker_segments = {}
+_worker_generation = 0
+
+def _init_worker(use_model, warm_shape):
+    """
+    工作进程初始化：导入 cv2/numpy 与估计器，按常见尺寸预热一帧（缓冲区、掩膜、FFT 计划），
+    之后每帧只做估计本身
+    """
+    global _worker_solver
+    from src.core import captcha
+    from src.core.captcha_model import AngleModel, MODEL_MIN_CONFIDENCE
+    # 逐帧日志由主进程统一输出
+    captcha.Log = types.SimpleNamespace(info=lambda *a: None, waring=lambda *a: None, error=lambda *a: None)
+    if use_model:
+        model = AngleModel.load()
+        if model is not None:
+            captcha._angle_ensemble.add(captcha.AngleEstimator("model", model.estimate, MODEL_MIN_CONFIDENCE,
+                                                               absolute=True), index=1)
+    _worker_solver = captcha.CaptchaSolver()
+    rng = np.random.default_rng(0)
+    _worker_solver.estimate((rng.random(warm_shape) * 255).astype(np.uint8))
+    captcha.reset_ring_layouts()
+
+def _evict(live):
+    # 主进程重新分配缓冲区后，旧共享内存已不再使用，关闭映射
+    for name in [n for n in _worker_segments if n not in live]:
+        try:
+            _worker_segments[name].close()
+        except BufferError:
+            # 仍有数组引用该缓冲区，下次再关
+            continue
+        del _worker_segments[name]
+
+def _attach(name):
+    segment = _worker_segments.get(name)
+    if segment is None:
+        # 共享内存由主进程创建与释放，工作进程只借用；spawn 的工作进程与主进程共用同一个资源跟踪器，
+        # 重复登记不影响主进程 unlink 时的注销
+        segment = shared_memory.SharedMemory(name=name)
+        _worker_segments[name] = segment
+    return segment
+
+def _estimate_in_worker(name, shape, dtype, generation=0, live=()):
+    """
+    :param generation: 主进程的验证码代数，变化时先清除上一次验证沿用的接缝半径
+    :param live: 主进程当前全部缓冲区的名称，其余已映射的共享内存会被关闭
+    """
+    global _worker_generation
+    started = time.perf_counter()
+    if generation != _worker_generation:
+        from src.core import captcha
+        captcha.reset_ring_layouts()
+        _worker_generation = generation
+    _evict(set(live) | {name})
+    segment = _attach(name)
+    img = np.ndarray(shape, dtype=dtype, buffer=segment.buf)
+    angle = _worker_solver.estimate(img)
+    return angle, (time.perf_counter() - started) * 1000
+
+def _ping():
+    return True
+
+# ---------------------------------------------------------------------------------------------------主进程
+class FrameSlot:
+    """共享内存中的一帧缓冲区，尺寸不足时重新分配"""
+    def __init__(self):
+        self.segment = None
+
+    def write(self, img):
+        if self.segment is None or self.segment.size < img.nbytes:
+            self.release()
+            self.segment = shared_memory.SharedMemory(create=True, size=max(img.nbytes, 1))
+        np.ndarray(img.shape, dtype=img.dtype, buffer=self.segment.buf)[...] = img
+        return self.segment.name
+
+    def release(self):
+        if self.segment is not None:
+            self.segment.close()
+            try:
+                self.segment.unlink()
+            except FileNotFoundError:
+                pass
+            self.segment = None
+
+class EstimatorService:
+    """
+    角度估计服务：预热的进程池在 WebDriver 线程之外估计画面角度，帧通过共享内存传递，不经过 pickle。
+    拖动循环提交帧后继续等待画面稳定，估计与等待重叠；所有缓冲区都在估计中时 submit 返回 None，由调用方同步估计
+
+    :param workers: 工作进程数
+    :param slots: 共享内存缓冲区数量（同时在估计中的帧数上限），默认 workers * 2
+    :param use_model: 工作进程是否加载学习的角度模型
+    :param warm_shape: 预热用的画面尺寸
+    :param window: 延迟统计保留的最近样本数
+    """
+    def __init__(self, workers=1, slots=None, use_model=False, warm_shape=(280, 280, 3), window=200):
+        self.workers = workers
+        self.use_model = use_model
+        self.warm_shape = warm_shape
+        self._slots = [FrameSlot() for _ in range(slots or workers * 2)]
+        self._free = list(self._slots)
+        self._lock = threading.Lock()
+        self._executor = None
+        self.generation = 0
+        self.submitted = 0
+        self.completed = 0
+        self.rejected = 0
+        self.max_depth = 0
+        self._latency = deque(maxlen=window)
+        self._compute = deque(maxlen=window)
+
+    def start(self, wait=False):
+        """
+        启动进程池并开始预热（工作进程导入与预热在后台进行）
+
+        :param wait: 是否等待全部工作进程预热完成
+        """
+        if self._executor is None:
+            # spawn：Windows 与打包后的程序只能 spawn，各平台行为一致；也避免 fork 时复制其他线程的锁
+            self._executor = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"),
+                                                 initializer=_init_worker, initargs=(self.use_model, self.warm_shape))
+            started = time.perf_counter()
+            pings = [self._executor.submit(_ping) for _ in range(self.workers)]
+            if wait:
+                for ping in pings:
+                    ping.result()
+                Log.info(f"角度估计服务预热完成: {self.workers} 个进程，耗时 {time.perf_counter() - started:.1f}s")
+        return self
+
+    def reset(self):
+        """
+        开始新的验证码：各工作进程在处理下一帧前清除上一次验证沿用的状态（接缝半径）
+        """
+        self.generation += 1
+
+    @property
+    def depth(self):
+        # 已提交、尚未完成的帧数
+        with self._lock:
+            return len(self._slots) - len(self._free)
+
+    def submit(self, img):
+        """
+        :param img: BGR 画面（可为非连续视图，写入共享内存时整理）
+        :return: concurrent.futures.Future，结果为 (角度或 None, 估计耗时 ms)；服务不可用或缓冲区已满时返回 None
+        """
+        if self._executor is None or img is None:
+            return None
+        with self._lock:
+            if not self._free:
+                self.rejected += 1
+                return None
+            slot = self._free.pop()
+            depth = len(self._slots) - len(self._free)
+            self.max_depth = max(self.max_depth, depth)
+        submitted = time.perf_counter()
+        try:
+            name = slot.write(img)
+            live = tuple(s.segment.name for s in self._slots if s.segment is not None)
+            future = self._executor.submit(_estimate_in_worker, name, img.shape, img.dtype.str,
+                                           self.generation, live)
+        except Exception as e:
+            Log.waring(f"角度估计服务提交失败: {e}")
+            with self._lock:
+                self._free.append(slot)
+            return None
+        self.submitted += 1
+
+        def done(f):
+            with self._lock:
+                self._free.append(slot)
+                self.completed += 1
+                self._latency.append((time.perf_counter() - submitted) * 1000)
+                if not f.cancelled() and f.exception() is None:
+                    self._compute.append(f.result()[1])
+
+        future.add_done_callback(done)
+        return future
+
+    def estimate(self, img, timeout=5.0):
+        """
+        同步接口：提交并等待结果，与 estimate_angle 相同的返回值
+
+        :raise RuntimeError: 服务不可用或缓冲区已满
+        """
+        future = self.submit(img)
+        if future is None:
+            raise RuntimeError("角度估计服务不可用")
+        return future.result(timeout)[0]
+
+    def metrics(self):
+        def percentile(values, q):
+            return float(np.percentile(values, q)) if values else 0.0
+        latency, compute = list(self._latency), list(self._compute)
+        return {
+            "workers": self.workers,
+            "depth": self.depth,
+            "max_depth": self.max_depth,
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "latency_p50_ms": percentile(latency, 50),
+            "latency_p95_ms": percentile(latency, 95),
+            "compute_p50_ms": percentile(compute, 50),
+        }
+
+    def summary(self):
+        m = self.metrics()
+        return f"提交 {m['submitted']} 帧，完成 {m['completed']}，缓冲区满 {m['rejected']} 次，" \
+               f"当前队列 {m['depth']}（最大 {m['max_depth']}），延迟 p50 {m['latency_p50_ms']:.1f}ms / " \
+               f"p95 {m['latency_p95_ms']:.1f}ms，其中估计 p50 {m['compute_p50_ms']:.1f}ms"
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+        for slot in self._slots:
+            slot.release()
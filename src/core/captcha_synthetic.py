@@ -0,0 +1,148 @@
+import cv2
+import numpy as np
+
+from dataclasses import dataclass
+from typing import Optional
+
+from src.core.captcha_controller import normalize_angle
+
+def procedural_seed(size=280, seed=0):
+    """
+    程序化生成的种子图片：上亮下暗的天空/地面（与 correct_angle_with_semantics 的假设一致）、
+    平滑纹理与几个几何形状，正立方向即 0°
+    """
+    rng = np.random.default_rng(seed)
+    sky = np.array(rng.uniform([170, 150, 110], [250, 230, 190]), dtype=np.float32)
+    ground = np.array(rng.uniform([20, 50, 30], [90, 130, 90]), dtype=np.float32)
+    horizon = int(size * rng.uniform(0.45, 0.6))
+    t = np.clip((np.arange(size, dtype=np.float32) - horizon) / (size * 0.05) + 0.5, 0, 1)[:, None, None]
+    img = (sky * (1 - t) + ground * t) * np.ones((1, size, 1), dtype=np.float32)
+
+    noise = rng.random((size // 10, size // 10, 3)).astype(np.float32)
+    img += (cv2.resize(noise, (size, size), interpolation=cv2.INTER_CUBIC) - 0.5) * 60
+    img = np.clip(img, 0, 255).astype(np.uint8)
+    for _ in range(int(rng.integers(2, 5))):
+        color = tuple(int(c) for c in rng.integers(0, 256, 3))
+        x, y = int(rng.integers(size // 6, size * 5 // 6)), int(rng.integers(horizon, size * 5 // 6))
+        if rng.random() < 0.5:
+            w, h = int(rng.integers(size // 12, size // 4)), int(rng.integers(size // 12, size // 3))
+            cv2.rectangle(img, (x - w // 2, y - h), (x + w // 2, y), color, -1)
+        else:
+            cv2.circle(img, (x, y), int(rng.integers(size // 20, size // 8)), color, -1)
+    return img
+
+def load_seeds(paths, size=280):
+    """
+    读取种子图片：中心裁剪为正方形后缩放到画布尺寸，无法读取的文件跳过
+
+    :param paths: 图片路径列表
+    """
+    seeds = []
+    for path in paths:
+        img = cv2.imread(str(path), cv2.IMREAD_COLOR)
+        if img is None:
+            continue
+        h, w = img.shape[:2]
+        side = min(h, w)
+        top, left = (h - side) // 2, (w - side) // 2
+        seeds.append(cv2.resize(img[top:top + side, left:left + side], (size, size), interpolation=cv2.INTER_AREA))
+    return seeds
+
+@dataclass
+class SyntheticSample:
+    """
+    :param img: 合成的验证码画面 (BGR)
+    :param angle: 真实角度，与 estimate_angle 的返回值同一约定（把画面转回正立需要的角度）
+    :param layout: "full" 整图旋转，"disc" 内圆盘旋转、外圈不动
+    :param seed_index: 使用的种子图片下标
+    """
+    img: np.ndarray
+    angle: float
+    layout: str
+    seed_index: int
+
+class SyntheticCaptcha:
+    """
+    离线旋转验证码生成器：把种子图片按已知角度旋转，裁成圆形画布，叠加噪声与 JPEG 压缩痕迹；
+    同一 (seed, index) 总是生成同一张画面，多进程下各进程可独立生成
+
+    :param seeds: 种子图片列表 (BGR，正立)，为空时使用程序化种子
+    :param size: 画布边长
+    :param noise: 高斯噪声标准差上限
+    :param jpeg_quality: JPEG 质量范围 (最低, 最高)，None 表示不压缩
+    :param disc_prob: 内外圆盘布局的比例
+    :param disc_ratio: 内圆盘半径与画布半径之比
+    :param procedural: 未提供种子时生成的程序化种子数量
+    """
+    BACKGROUND = (245, 245, 245)
+
+    def __init__(self, seeds=None, size=280, noise=6.0, jpeg_quality=(40, 95), disc_prob=0.3, disc_ratio=0.6,
+                 procedural=16):
+        self.size = size
+        self.seeds = [cv2.resize(s, (size, size), interpolation=cv2.INTER_AREA) if s.shape[:2] != (size, size)
+                      else s for s in (seeds or [])]
+        if not self.seeds:
+            self.seeds = [procedural_seed(size, seed=i) for i in range(procedural)]
+        self.noise = noise
+        self.jpeg_quality = jpeg_quality
+        self.disc_prob = disc_prob
+        self.disc_ratio = disc_ratio
+        self._outside = self._circle(1.0) == 0
+
+    def _circle(self, ratio):
+        mask = np.zeros((self.size, self.size), dtype=np.uint8)
+        cv2.circle(mask, (self.size // 2, self.size // 2), int(self.size / 2 * ratio), 255, -1)
+        return mask
+
+    def rotate(self, img, angle):
+        M = cv2.getRotationMatrix2D((self.size / 2, self.size / 2), angle, 1.0)
+        return cv2.warpAffine(img, M, (self.size, self.size), flags=cv2.INTER_LINEAR,
+                              borderMode=cv2.BORDER_REFLECT)
+
+    def sample(self, index, seed=0, angle=None, layout=None):
+        """
+        :param index: 样本序号
+        :param seed: 随机种子，与 index 一起决定样本内容
+        :param angle: 指定旋转角度（cv2 约定，逆时针为正），None 时随机
+        :param layout: 指定布局，None 时按 disc_prob 随机
+        """
+        rng = np.random.default_rng((seed, index))
+        seed_index = int(rng.integers(len(self.seeds)))
+        base = self.seeds[seed_index]
+        rotation = float(rng.uniform(0, 360)) if angle is None else float(angle)
+        if layout is None:
+            layout = "disc" if rng.random() < self.disc_prob else "full"
+
+        if layout == "disc":
+            # 外圈保持正立，只有内圆盘旋转
+            img = base.copy()
+            inner = self._circle(self.disc_ratio) > 0
+            img[inner] = self.rotate(base, rotation)[inner]
+        else:
+            img = self.rotate(base, rotation)
+        img[self._outside] = self.BACKGROUND
+
+        if self.noise:
+            sigma = rng.uniform(0, self.noise)
+            img = np.clip(img + rng.normal(0, sigma, img.shape), 0, 255).astype(np.uint8)
+        if self.jpeg_quality:
+            quality = int(rng.integers(self.jpeg_quality[0], self.jpeg_quality[1] + 1))
+            ok, buf = cv2.imencode('.jpg', img, [cv2.IMWRITE_JPEG_QUALITY, quality])
+            if ok:
+                img = cv2.imdecode(buf, cv2.IMREAD_COLOR)
+        # 画面逆时针转了 rotation，估计器应给出 -rotation
+        return SyntheticSample(img, normalize_angle(-rotation), layout, seed_index)
+
+    def samples(self, count, seed=0, start=0):
+        for index in range(start, start + count):
+            yield self.sample(index, seed)
+
+def angle_error(estimated: Optional[float], truth, period=360):
+    """
+    :param period: 估计器的方向周期，主方向类估计器（PCA/Hough）为 180
+    :return: 按周期折算后的绝对误差，estimated 为 None 时返回 None
+    """
+    if estimated is None:
+        return None
+    diff = (estimated - truth) % period
+    return float(min(diff, period - diff))
@@ -0,0 +1,90 @@
+import math
+import random
+
+from selenium.webdriver.common.actions.action_builder import ActionBuilder
+from selenium.webdriver.common.actions.mouse_button import MouseButton
+
+def minimum_jerk(t):
+    # 最小加加速度曲线：起止速度、加速度均为 0，速度呈钟形，接近人手拖动
+    return t * t * t * (10 - 15 * t + 6 * t * t)
+
+def plan_path(dx, dy=0, rng=None, segment_px=15, max_segments=10, px_per_ms=0.6, min_segment_ms=15):
+    """
+    规划一次拖动的多段轨迹
+
+    :param dx: 水平移动像素
+    :param dy: 垂直移动像素
+    :param segment_px: 每段大约移动的像素
+    :param max_segments: 最多分段数
+    :param px_per_ms: 平均移动速度
+    :param min_segment_ms: 每段最短时长
+    :return: [(段内 dx, 段内 dy, 时长 ms)]，各段位移之和严格等于 (dx, dy)
+    """
+    rng = rng or random
+    dx, dy = int(round(dx)), int(round(dy))
+    n = max(1, min(max_segments, math.ceil(abs(dx) / segment_px)))
+    total_ms = max(min_segment_ms * n, abs(dx) / px_per_ms) * rng.uniform(0.85, 1.2)
+    wobble = rng.uniform(-1.5, 1.5)
+
+    path = []
+    last_x, last_y = 0, 0
+    for i in range(1, n + 1):
+        t = i / n
+        s = minimum_jerk(t)
+        x = int(round(dx * s))
+        y = int(round(dy * s + wobble * math.sin(math.pi * t)))
+        duration = max(1, int(total_ms / n * rng.uniform(0.8, 1.25)))
+        path.append((x - last_x, y - last_y, duration))
+        last_x, last_y = x, y
+    return path
+
+class TrajectoryActions:
+    """
+    ActionChains 的替代（只实现拖动验证码用到的接口）：
+    每次 move_by_offset 按最小加加速度曲线拆成多段带时长的 pointerMove，抖动体现在各段时长与垂直偏移上；
+    按下动作推迟到下一次移动时一起提交，一次 perform 只发送一个 W3C actions 请求
+
+    :param driver: WebDriver
+    :param rng: 随机数发生器
+    :param defer_press: 是否把按下与第一段移动合并提交
+    :param plan_kwargs: 传给 plan_path 的参数
+    """
+    def __init__(self, driver, rng=None, defer_press=True, **plan_kwargs):
+        self.builder = ActionBuilder(driver)
+        self.mouse = self.builder.pointer_inputs[0]
+        self.rng = rng or random
+        self.defer_press = defer_press
+        self.plan_kwargs = plan_kwargs
+        self.payloads = 0
+        self.segments = 0
+        self._press_pending = False
+
+    def click_and_hold(self, element):
+        self.mouse.create_pointer_move(duration=int(self.rng.uniform(80, 200)), origin=element)
+        self.mouse.create_pointer_down(button=MouseButton.LEFT)
+        self._press_pending = self.defer_press
+        return self
+
+    def move_by_offset(self, xoffset, yoffset):
+        path = plan_path(xoffset, yoffset, rng=self.rng, **self.plan_kwargs)
+        for dx, dy, duration in path:
+            self.mouse.create_pointer_move(duration=duration, x=dx, y=dy, origin="pointer")
+        self.segments += len(path)
+        return self
+
+    def pause(self, seconds):
+        self.mouse.create_pause(seconds)
+        return self
+
+    def release(self):
+        self.mouse.create_pointer_up(MouseButton.LEFT)
+        return self
+
+    def perform(self):
+        if self._press_pending:
+            # 按下先留在队列中，与下一段移动一起提交
+            self._press_pending = False
+            return
+        if self.mouse.actions:
+            self.builder.perform()
+            self.payloads += 1
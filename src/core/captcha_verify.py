@@ -0,0 +1,195 @@
+import time
+import random
+
+from contextlib import contextmanager
+
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.common.exceptions import JavascriptException, NoSuchWindowException, \
+    StaleElementReferenceException, TimeoutException
+
+from src.utils.log import Log
+
+# 松开滑块前注入：记录验证结果信号（成功/失败状态元素出现、地址变化、页面开始跳转），
+# 服务器很快返回时信号可能早于等待脚本开始执行，先记下来由等待脚本直接读取
+VERIFY_ARM_JS = r"""
+var successSel = arguments[0], failureSel = arguments[1];
+var V = window.__autoClockVerify;
+if (V && V.observer) V.observer.disconnect();
+V = window.__autoClockVerify = {state: null, url: location.href, listeners: [], started: performance.now()};
+
+function visible(sel) {
+    if (!sel) return false;
+    var el = document.querySelector(sel);
+    return !!el && el.offsetParent !== null;
+}
+
+V.signal = function (state, url) {
+    if (V.state) return;
+    V.state = state;
+    V.detail = {state: state, url: url || location.href, elapsed_ms: performance.now() - V.started};
+    V.listeners.forEach(function (cb) { cb(V.detail); });
+};
+
+V.check = function () {
+    if (location.href !== V.url) V.signal('url', location.href);
+    else if (visible(successSel)) V.signal('success');
+    else if (visible(failureSel)) V.signal('failure');
+};
+
+V.observer = new MutationObserver(V.check);
+V.observer.observe(document.documentElement, {subtree: true, childList: true, attributes: true,
+                                              attributeFilter: ['class', 'style', 'hidden']});
+if (window.navigation && navigation.addEventListener) {
+    navigation.addEventListener('navigate', function (e) { V.signal('navigate', e.destination.url); });
+}
+window.addEventListener('pagehide', function () { V.signal('unload'); });
+return true;
+"""
+
+# 异步等待：第一个信号到达或超时时返回
+VERIFY_WAIT_JS = r"""
+var timeoutMs = arguments[0];
+var done = arguments[arguments.length - 1];
+var V = window.__autoClockVerify;
+if (!V) { done({state: 'unarmed'}); return; }
+V.check();
+if (V.state) { done(V.detail); return; }
+var timer = null, poll = null;
+function finish(detail) {
+    clearTimeout(timer);
+    clearInterval(poll);
+    done(detail);
+}
+V.listeners.push(finish);
+// pushState 之类的地址变化不触发 DOM 变动，低频轮询兜底
+poll = setInterval(V.check, 50);
+timer = setTimeout(function () {
+    V.listeners = [];
+    clearInterval(poll);
+    done({state: 'timeout', url: location.href, elapsed_ms: performance.now() - V.started});
+}, timeoutMs);
+"""
+
+# 页面跳转卸载文档时等待脚本抛出的异常；其余异常不代表跳转
+UNLOAD_ERRORS = (JavascriptException, NoSuchWindowException, StaleElementReferenceException)
+# 读取不到原脚本超时时按 W3C 默认值恢复（秒）
+DEFAULT_SCRIPT_TIMEOUT = 30
+
+@contextmanager
+def script_timeout(driver, seconds):
+    """
+    临时调整异步脚本超时，结束后（包括抛出异常时）恢复原值，不影响同一 driver 上后续的异步脚本
+    """
+    try:
+        previous = driver.timeouts.script
+    except Exception as e:
+        Log.waring(f"读取脚本超时失败，结束后按默认值恢复: {e}")
+        previous = DEFAULT_SCRIPT_TIMEOUT
+    driver.set_script_timeout(seconds)
+    try:
+        yield
+    finally:
+        try:
+            driver.set_script_timeout(previous)
+        except Exception as e:
+            Log.waring(f"恢复脚本超时失败: {e}")
+
+VISIBLE_STATE_JS = r"""
+return [arguments[0], arguments[1]].some(function (sel) {
+    if (!sel) return false;
+    var el = document.querySelector(sel);
+    return !!el && el.offsetParent !== null;
+});
+"""
+
+class CaptchaVerifier:
+    """
+    事件驱动的验证结果检测：松开滑块前注入 MutationObserver 与导航监听，松开后用 execute_async_script
+    等待第一个信号（跳转到 success_url、成功/失败状态元素出现）或超时，替代固定的 3~4s 等待
+
+    :param driver: WebDriver
+    :param success_url: 验证通过后跳转的地址
+    :param success_sel: 成功状态元素选择器，None 表示不检测
+    :param failure_sel: 失败状态元素选择器，None 表示不检测
+    :param timeout: 等待信号的最长时间（秒）
+    :param navigate_timeout: 收到成功或跳转信号后，等待地址变为 success_url 的最长时间（秒）
+    """
+    def __init__(self, driver, success_url, success_sel=None, failure_sel=None, timeout=5.0, navigate_timeout=10.0):
+        self.driver = driver
+        self.success_url = success_url
+        self.success_sel = success_sel
+        self.failure_sel = failure_sel
+        self.timeout = timeout
+        self.navigate_timeout = navigate_timeout
+        self.armed = False
+        self.signal = None
+        self.elapsed = None
+
+    def arm(self):
+        # 在松开滑块之前调用
+        try:
+            self.armed = bool(self.driver.execute_script(VERIFY_ARM_JS, self.success_sel, self.failure_sel))
+        except Exception as e:
+            Log.waring(f"验证结果监听注入失败，改为固定等待: {e}")
+            self.armed = False
+        return self.armed
+
+    def _on_url(self, timeout):
+        try:
+            WebDriverWait(self.driver, timeout, poll_frequency=0.05).until(
+                lambda d: d.current_url == self.success_url)
+            return True
+        except Exception:
+            return False
+
+    def _wait_script(self):
+        with script_timeout(self.driver, self.timeout + 1):
+            return self.driver.execute_async_script(VERIFY_WAIT_JS, int(self.timeout * 1000))
+
+    def wait(self):
+        """
+        :return: 是否通过验证（以最终地址为准）；等待脚本出现与跳转无关的错误时视为未通过
+        """
+        started = time.perf_counter()
+        if not self.armed:
+            time.sleep(2)
+            time.sleep(1.2 + random.random() * 0.8)
+            self.signal = "sleep"
+        else:
+            detail = None
+            try:
+                detail = self._wait_script()
+            except UNLOAD_ERRORS as e:
+                # 页面跳转会卸载文档，等待中的脚本随之中断，跳转本身就是信号
+                Log.info(f"验证等待脚本被中断（页面可能已跳转）: {type(e).__name__}")
+                detail = {"state": "unload"}
+            except TimeoutException:
+                Log.waring(f"验证等待脚本超时（{self.timeout + 1:.1f}s）")
+                detail = {"state": "timeout"}
+            except Exception as e:
+                Log.error(f"验证等待脚本执行失败: {type(e).__name__}: {e}")
+                detail = {"state": "error"}
+            detail = detail if isinstance(detail, dict) else {}
+            self.signal = detail.get("state") or "unknown"
+            if self.signal in ("success", "unload") or \
+                    (self.signal in ("url", "navigate") and detail.get("url") == self.success_url):
+                # 成功状态出现或页面开始跳转：等地址真正变为目标页，后续流程依赖当前地址
+                self._on_url(self.navigate_timeout)
+        self.elapsed = time.perf_counter() - started
+        try:
+            current_url = self.driver.current_url
+        except Exception as e:
+            Log.waring(f"读取当前地址失败: {e}")
+            current_url = None
+        Log.info(f"验证结果信号: {self.signal}，耗时 {self.elapsed:.2f}s，当前页面为: {current_url}")
+        return self.signal != "error" and current_url == self.success_url
+
+    def wait_reset(self, timeout=3.0):
+        # 失败后等待状态提示消失（验证码重置为新图片）再开始下一次尝试
+        if not self.armed or self.signal != "failure":
+            return
+        try:
+            WebDriverWait(self.driver, timeout, poll_frequency=0.05).until_not(
+                lambda d: d.execute_script(VISIBLE_STATE_JS, self.success_sel, self.failure_sel))
+        except Exception:
+            Log.waring(f"失败提示 {timeout:.1f}s 内未消失，继续下一次尝试")
@@ -28,7 +28,27 @@ class ClockManager:
                 self.always_retry = data.get(Key.AlwaysRetry, False)
                 self.captcha_retry_times = int(data.get(Key.CaptchaRetryTimes, 5))
                 self.captcha_tolerance_angle = int(data.get(Key.CaptchaToleranceAngle, 5))
+                self.captcha_controller = data.get(Key.CaptchaController, "legacy")
+                self.captcha_trajectory = data.get(Key.CaptchaTrajectory, False)
+                self.captcha_reference = data.get(Key.CaptchaReference, False)
+                self.captcha_index = data.get(Key.CaptchaIndex, False)
+                self.captcha_calibration = data.get(Key.CaptchaCalibration, False)
+                self.captcha_inpage = data.get(Key.CaptchaInPage, False)
+                self.captcha_parallel_estimators = data.get(Key.CaptchaParallelEstimators, False)
+                self.captcha_model = data.get(Key.CaptchaModel, False)
+                self.captcha_refresh_confidence = float(data.get(Key.CaptchaRefreshConfidence, 0.0))
+                self.captcha_max_refreshes = int(data.get(Key.CaptchaMaxRefreshes, 3))
+                self.captcha_solver_processes = int(data.get(Key.CaptchaSolverProcesses, 0))
+                self.screenshot_format = data.get(Key.ScreenshotFormat, "webp")
+                self.screenshot_keep_days = data.get(Key.ScreenshotKeepDays, 30)
+                self.screenshot_keep_count = data.get(Key.ScreenshotKeepCount, 3000)
+                self.screenshot_keep_mb = data.get(Key.ScreenshotKeepMB, 500)
+                self.screenshot_remove_legacy = data.get(Key.ScreenshotRemoveLegacy, False)
                 self.show_web_page = data.get(Key.ShowWebPage, False)
+                self.session_reuse = data.get(Key.SessionReuse, False)
+                self.browser_host = data.get(Key.BrowserHost, False)
+                self.browser_host_idle_minutes = data.get(Key.BrowserHostIdleMinutes)
+                self.browser_host_max_age_minutes = data.get(Key.BrowserHostMaxAgeMinutes)
 
                 self.status = True
         except Exception as e:
@@ -45,7 +65,27 @@ class ClockManager:
             always_retry=self.always_retry,
             captcha_attempts=self.captcha_retry_times,
             tolerance=self.captcha_tolerance_angle,
+            captcha_controller=self.captcha_controller,
+            captcha_trajectory=self.captcha_trajectory,
+            captcha_reference=self.captcha_reference,
+            captcha_index=self.captcha_index,
+            captcha_calibration=self.captcha_calibration,
+            captcha_inpage=self.captcha_inpage,
+            captcha_parallel_estimators=self.captcha_parallel_estimators,
+            captcha_model=self.captcha_model,
+            captcha_refresh_confidence=self.captcha_refresh_confidence,
+            captcha_max_refreshes=self.captcha_max_refreshes,
+            captcha_solver_processes=self.captcha_solver_processes,
+            screenshot_format=self.screenshot_format,
+            screenshot_keep_days=self.screenshot_keep_days,
+            screenshot_keep_count=self.screenshot_keep_count,
+            screenshot_keep_mb=self.screenshot_keep_mb,
+            screenshot_remove_legacy=self.screenshot_remove_legacy,
             show_web_page=self.show_web_page,
+            session_reuse=self.session_reuse,
+            browser_host=self.browser_host,
+            browser_host_idle_minutes=self.browser_host_idle_minutes,
+            browser_host_max_age_minutes=self.browser_host_max_age_minutes,
             wait_time=2,
         )
 
@@ -0,0 +1,286 @@
+import os
+import hmac
+import json
+import time
+import ctypes
+import hashlib
+import secrets
+import platform
+
+from selenium.webdriver.common.by import By
+
+from src.utils.log import Log
+from src.utils.const import AppPath
+from src.core.browser_host import load_key_file
+
+SESSION_VERSION = 1
+SESSION_MAGIC = b"ACS1"
+SESSION_ROOT = os.path.join(AppPath.DataRoot, "sessions")
+SESSION_KEY_FILE = os.path.join(AppPath.DataRoot, "session.key")
+NONCE_SIZE = 16
+TAG_SIZE = 32
+KEY_SIZE = 32
+# Windows 上密钥文件保存 DPAPI 加密后的密钥
+DPAPI_MAGIC = b"DPK1"
+DPAPI_ENTROPY = b"auto-clock-session"
+KEYRING_SERVICE = "auto-clock"
+KEYRING_USER = "session-key"
+
+# ---------------------------------------------------------------------------------------------------主密钥
+class _DataBlob(ctypes.Structure):
+    _fields_ = [("cbData", ctypes.c_uint32), ("pbData", ctypes.POINTER(ctypes.c_char))]
+
+def _blob(data):
+    buf = ctypes.create_string_buffer(data, len(data))
+    return _DataBlob(len(data), ctypes.cast(buf, ctypes.POINTER(ctypes.c_char))), buf
+
+def _dpapi(data, protect):
+    """
+    用当前 Windows 用户的登录凭据加密/解密（CryptProtectData），其他用户或其他机器无法解密
+
+    :raise OSError: 调用失败
+    """
+    blob_in, buf_in = _blob(data)
+    entropy, buf_entropy = _blob(DPAPI_ENTROPY)
+    blob_out = _DataBlob()
+    crypt32 = ctypes.windll.crypt32
+    func = crypt32.CryptProtectData if protect else crypt32.CryptUnprotectData
+    # CRYPTPROTECT_UI_FORBIDDEN：计划任务中运行时不弹出提示
+    if not func(ctypes.byref(blob_in), None, ctypes.byref(entropy), None, None, 0x1, ctypes.byref(blob_out)):
+        raise ctypes.WinError()
+    try:
+        return ctypes.string_at(blob_out.pbData, blob_out.cbData)
+    finally:
+        ctypes.windll.kernel32.LocalFree(blob_out.pbData)
+
+def _write_private(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+def _load_dpapi_key(path):
+    data = None
+    if os.path.exists(path):
+        with open(path, "rb") as f:
+            data = f.read()
+    if data and data.startswith(DPAPI_MAGIC):
+        return _dpapi(data[len(DPAPI_MAGIC):], protect=False)
+    # 旧版明文密钥文件：沿用其中的密钥，改为 DPAPI 加密保存
+    key = data if data and len(data) >= KEY_SIZE else secrets.token_bytes(KEY_SIZE)
+    _write_private(path, DPAPI_MAGIC + _dpapi(key, protect=True))
+    return key
+
+def _load_keyring_key():
+    import keyring
+    stored = keyring.get_password(KEYRING_SERVICE, KEYRING_USER)
+    if stored:
+        return bytes.fromhex(stored)
+    key = secrets.token_bytes(KEY_SIZE)
+    keyring.set_password(KEYRING_SERVICE, KEYRING_USER, key.hex())
+    return key
+
+def load_session_key(path=None):
+    """
+    读取（首次生成）会话主密钥，由操作系统保护：Windows 上用 DPAPI 加密后存入 path，
+    其他系统存入系统密钥环（需安装 keyring）；都不可用时退回只有当前用户可读的明文密钥文件
+
+    :param path: 密钥文件，默认 AppPath.DataRoot/session.key
+    """
+    path = path or SESSION_KEY_FILE
+    if platform.system() == "Windows":
+        try:
+            return _load_dpapi_key(path)
+        except OSError as e:
+            Log.waring(f"DPAPI 保护会话密钥失败: {e}")
+    else:
+        try:
+            return _load_keyring_key()
+        except ImportError:
+            pass
+        except Exception as e:
+            Log.waring(f"系统密钥环不可用: {e}")
+    Log.waring("会话密钥以明文保存在数据目录中，只能防止无意间查看，能读取会话文件的人也能读取密钥")
+    return load_key_file(path, KEY_SIZE)
+
+# ---------------------------------------------------------------------------------------------------加密
+def _derive(master, label):
+    return hmac.new(master, label, hashlib.sha256).digest()
+
+def _keystream_xor(key, nonce, data):
+    # HMAC-SHA256 计数器模式生成密钥流，与数据按块异或
+    out = bytearray()
+    for counter, offset in enumerate(range(0, len(data), 32)):
+        block = hmac.new(key, nonce + counter.to_bytes(8, "big"), hashlib.sha256).digest()
+        chunk = data[offset:offset + 32]
+        out += (int.from_bytes(chunk, "big") ^ int.from_bytes(block[:len(chunk)], "big")).to_bytes(len(chunk), "big")
+    return bytes(out)
+
+def encrypt(master, plaintext, associated=b""):
+    """
+    先加密后认证：HMAC-SHA256 计数器模式加密，HMAC-SHA256 校验（覆盖头部、随机数、关联数据与密文）
+
+    :param master: 主密钥
+    :param associated: 关联数据（不加密，但参与校验），用于把密文绑定到账号
+    """
+    nonce = secrets.token_bytes(NONCE_SIZE)
+    ciphertext = _keystream_xor(_derive(master, b"session-enc"), nonce, plaintext)
+    tag = hmac.new(_derive(master, b"session-mac"), SESSION_MAGIC + nonce + associated + ciphertext,
+                   hashlib.sha256).digest()
+    return SESSION_MAGIC + nonce + ciphertext + tag
+
+def decrypt(master, blob, associated=b""):
+    """
+    :raise ValueError: 格式错误、密钥不匹配或内容被篡改
+    """
+    header = len(SESSION_MAGIC) + NONCE_SIZE
+    if len(blob) < header + TAG_SIZE or not blob.startswith(SESSION_MAGIC):
+        raise ValueError("会话文件格式错误")
+    nonce, ciphertext, tag = blob[len(SESSION_MAGIC):header], blob[header:-TAG_SIZE], blob[-TAG_SIZE:]
+    expected = hmac.new(_derive(master, b"session-mac"), SESSION_MAGIC + nonce + associated + ciphertext,
+                        hashlib.sha256).digest()
+    if not hmac.compare_digest(tag, expected):
+        raise ValueError("会话文件校验失败")
+    return _keystream_xor(_derive(master, b"session-enc"), nonce, ciphertext)
+
+# ---------------------------------------------------------------------------------------------------会话
+class SessionStore:
+    """
+    按账号加密保存登录后的 Cookie 与 localStorage，下次运行时先尝试复用，跳过登录与验证码；
+    同时记录该账号的复用命中率、完整流程耗时（指数平均）与累计节省的时间
+
+    威胁模型：会话文件与密钥都在当前用户的数据目录中。主密钥由操作系统保护（Windows DPAPI 或系统密钥环），
+    防止的是会话文件被复制走（备份、同步盘、其他账号或离线读取磁盘）后被还原出 Cookie；
+    不防以当前用户身份运行的程序，它们可以像本程序一样解密。只有明文密钥文件可用时，加密只能防止无意间查看
+
+    :param user_name: 账号
+    :param root: 会话文件目录，默认 AppPath.DataRoot/sessions
+    :param key: 主密钥，默认由 load_session_key 读取（首次生成）
+    :param decay: 完整流程耗时的指数平均系数
+    """
+    def __init__(self, user_name, root=None, key=None, decay=0.3):
+        self.user_name = user_name
+        self.root = root or SESSION_ROOT
+        self.key = key or load_session_key()
+        self.decay = decay
+        # 文件名不暴露账号
+        self.account = hmac.new(self.key, user_name.encode("utf-8"), hashlib.sha256).hexdigest()[:16]
+        self.path = os.path.join(self.root, f"{self.account}.session")
+        self.session = None
+        self.stats = {"runs": 0, "hits": 0, "full_seconds": None, "saved_seconds": 0.0}
+        self.last_hit = None
+        self.last_saved = None
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return self
+        try:
+            with open(self.path, "rb") as f:
+                data = json.loads(decrypt(self.key, f.read(), self.account.encode()).decode("utf-8"))
+            if data.get("version") == SESSION_VERSION and data.get("user") == self.user_name:
+                self.session = data.get("session")
+                self.stats.update(data.get("stats", {}))
+        except Exception as e:
+            Log.waring(f"会话文件读取失败，忽略: {e}")
+        return self
+
+    def save(self):
+        data = {"version": SESSION_VERSION, "user": self.user_name, "session": self.session, "stats": self.stats}
+        try:
+            os.makedirs(self.root, exist_ok=True)
+            blob = encrypt(self.key, json.dumps(data, ensure_ascii=False).encode("utf-8"), self.account.encode())
+            tmp = f"{self.path}.tmp"
+            fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, "wb") as f:
+                f.write(blob)
+            os.replace(tmp, self.path)
+        except Exception as e:
+            Log.waring(f"会话文件写入失败: {e}")
+
+    def put(self, cookies, local_storage, url):
+        self.session = {"saved": time.time(), "url": url, "cookies": cookies, "local_storage": local_storage}
+
+    def discard(self):
+        self.session = None
+
+    def valid_cookies(self, now=None):
+        # 去掉已过期的 Cookie；没有过期时间的是会话 Cookie，保留
+        now = now or time.time()
+        return [c for c in (self.session or {}).get("cookies", []) if not c.get("expiry") or c["expiry"] > now]
+
+    def record_full(self, seconds):
+        # 完整登录 + 验证码流程的耗时，作为节省时间的基准
+        previous = self.stats["full_seconds"]
+        self.stats["full_seconds"] = seconds if previous is None else previous + self.decay * (seconds - previous)
+
+    def record_run(self, hit, seconds=None):
+        """
+        :param hit: 本次是否复用成功
+        :param seconds: 复用成功时恢复会话所用时间
+        :return: 本次节省的时间（秒），没有基准时为 None
+        """
+        self.stats["runs"] += 1
+        self.last_hit = hit
+        self.last_saved = None
+        if hit:
+            self.stats["hits"] += 1
+            if self.stats["full_seconds"] is not None and seconds is not None:
+                self.last_saved = max(0.0, self.stats["full_seconds"] - seconds)
+                self.stats["saved_seconds"] += self.last_saved
+        return self.last_saved
+
+    @property
+    def hit_rate(self):
+        return self.stats["hits"] / self.stats["runs"] if self.stats["runs"] else 0.0
+
+    def summary(self):
+        saved = "无基准" if self.last_saved is None else f"{self.last_saved:.1f}s"
+        return f"会话复用: 本次{'命中' if self.last_hit else '未命中'}，节省 {saved}；" \
+               f"累计命中 {self.stats['hits']}/{self.stats['runs']}（{self.hit_rate:.0%}），" \
+               f"累计节省 {self.stats['saved_seconds']:.1f}s"
+
+def capture_session(driver):
+    """
+    :return: (当前站点的 Cookie 列表, localStorage 字典)
+    """
+    cookies = driver.get_cookies()
+    local_storage = driver.execute_script(
+        "var items = {}; for (var i = 0; i < localStorage.length; i++) {"
+        " var k = localStorage.key(i); items[k] = localStorage.getItem(k); } return items;")
+    return cookies, local_storage or {}
+
+def restore_session(driver, store, probe_url, origin_url):
+    """
+    在 origin_url 所在站点写入保存的 Cookie 与 localStorage，再打开 probe_url 检查是否仍处于登录状态
+
+    :param store: SessionStore
+    :param probe_url: 登录后才能停留的页面（过期时会被重定向到登录页）
+    :param origin_url: 写入 Cookie 前打开的同站页面（通常是登录页，过期时后续流程本来就要打开它）
+    :return: 会话是否有效
+    """
+    cookies = store.valid_cookies()
+    if not cookies:
+        # 全部过期，不必访问页面
+        return False
+    driver.get(origin_url)
+    for cookie in cookies:
+        try:
+            driver.add_cookie(cookie)
+        except Exception as e:
+            Log.waring(f"写入 Cookie {cookie.get('name')} 失败: {e}")
+    local_storage = store.session.get("local_storage")
+    if local_storage:
+        driver.execute_script("var items = arguments[0]; for (var k in items) localStorage.setItem(k, items[k]);",
+                              local_storage)
+    driver.get(probe_url)
+    return driver.current_url == probe_url and not driver.find_elements(By.CSS_SELECTOR, "#loginButton")
+
+def clear_session(driver):
+    # 复用失败后清除写入的 Cookie 与 localStorage，按正常流程重新登录
+    try:
+        driver.delete_all_cookies()
+        driver.execute_script("localStorage.clear();")
+    except Exception as e:
+        Log.waring(f"清除会话失败: {e}")
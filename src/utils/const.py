@@ -46,6 +46,26 @@ class Key:
     DriverPath: str = "driver_path"
     CaptchaRetryTimes: str = "captcha_retry_times"
     CaptchaToleranceAngle: str = "captcha_tolerance_angle"
+    CaptchaController: str = "captcha_controller"
+    CaptchaTrajectory: str = "captcha_trajectory"
+    CaptchaReference: str = "captcha_reference"
+    CaptchaIndex: str = "captcha_index"
+    CaptchaCalibration: str = "captcha_calibration"
+    CaptchaInPage: str = "captcha_inpage"
+    CaptchaParallelEstimators: str = "captcha_parallel_estimators"
+    CaptchaModel: str = "captcha_model"
+    CaptchaRefreshConfidence: str = "captcha_refresh_confidence"
+    CaptchaMaxRefreshes: str = "captcha_max_refreshes"
+    CaptchaSolverProcesses: str = "captcha_solver_processes"
+    ScreenshotFormat: str = "screenshot_format"
+    ScreenshotKeepDays: str = "screenshot_keep_days"
+    ScreenshotKeepCount: str = "screenshot_keep_count"
+    ScreenshotKeepMB: str = "screenshot_keep_mb"
+    ScreenshotRemoveLegacy: str = "screenshot_remove_legacy"
+    SessionReuse: str = "session_reuse"
+    BrowserHost: str = "browser_host"
+    BrowserHostIdleMinutes: str = "browser_host_idle_minutes"
+    BrowserHostMaxAgeMinutes: str = "browser_host_max_age_minutes"
     AlwaysRetry: str = "always_retry"
     ShowWebPage: str = "show_web_page"
 
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+旋转角度搜索基准
+对比固定 10° 网格搜索 (RotationEngine.best_angle) 与由粗到细多分辨率搜索 (RotationEngine.search)
+的开销与精度；精度以原图上 0.25° 密集网格的最优角度为基准（同一锐度得分）
+
+使用方法:
+    python tests/demo/angle_search_demo/angle_search_benchmark.py
+    python tests/demo/angle_search_demo/angle_search_benchmark.py --images ~/.local/share/auto-clock/screenshot/*.png
+"""
+
+import sys
+import os
+import time
+import argparse
+
+import cv2
+import numpy as np
+
+# 添加项目根目录到sys.path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, '..', '..', '..'))
+sys.path.insert(0, project_root)
+
+from src.core.captcha import RotationEngine
+
+def make_canvas(size=280, seed=0):
+    """生成类似验证码的测试画面（平滑纹理 + 几何形状），并随机旋转"""
+    rng = np.random.default_rng(seed)
+    noise = (rng.random((size // 8, size // 8, 3)) * 255).astype(np.uint8)
+    img = cv2.resize(noise, (size, size), interpolation=cv2.INTER_CUBIC)
+    cv2.rectangle(img, (size // 5, size // 3), (size * 4 // 5, size // 2), (40, 90, 160), -1)
+    cv2.circle(img, (size // 2, size * 2 // 3), size // 8, (220, 220, 220), -1)
+    M = cv2.getRotationMatrix2D((size / 2, size / 2), float(rng.uniform(0, 360)), 1.0)
+    return cv2.warpAffine(img, M, (size, size), borderMode=cv2.BORDER_REPLICATE)
+
+def angle_error(angle, optima):
+    return float(np.min(np.abs((optima - angle + 180) % 360 - 180)))
+
+def timed(fn, repeat):
+    fn()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    return result, (time.perf_counter() - start) / repeat * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description="旋转角度搜索基准")
+    parser.add_argument("--images", nargs="*", help="验证码截图路径，不指定时使用合成画面")
+    parser.add_argument("--count", type=int, default=20, help="合成画面数量")
+    parser.add_argument("--repeat", type=int, default=5, help="每张图计时重复次数")
+    args = parser.parse_args()
+
+    if args.images:
+        grays = [cv2.imread(p, cv2.IMREAD_GRAYSCALE) for p in args.images]
+        grays = [g for g in grays if g is not None]
+    else:
+        grays = [cv2.cvtColor(make_canvas(seed=i), cv2.COLOR_BGR2GRAY) for i in range(args.count)]
+
+    engine = RotationEngine()
+    dense = np.arange(0, 360, 0.25)
+    rows = {"grid": [], "search": []}
+    for gray in grays:
+        scores = np.array([engine.score_one(gray, a) for a in dense])
+        best = scores.max()
+        # 多个角度得分几乎相同（如 0°/90°/180°/270°）时都视为最优
+        optima = dense[scores >= best * 0.999]
+
+        angle, ms = timed(lambda: engine.best_angle(gray), args.repeat)
+        rows["grid"].append((angle_error(angle, optima), 1 - engine.score_one(gray, angle) / best, ms,
+                             len(engine.angles())))
+        angle, ms = timed(lambda: engine.search(gray), args.repeat)
+        rows["search"].append((angle_error(angle, optima), 1 - engine.score_one(gray, angle) / best, ms,
+                               engine.last_cost))
+
+    print(f"图片数: {len(grays)}，尺寸: {grays[0].shape[1]}x{grays[0].shape[0]}")
+    print(f"{'方式':<8} {'平均误差(°)':>12} {'最大误差(°)':>12} {'得分损失':>10} {'每张耗时(ms)':>14} {'原图旋转次数':>14}")
+    for name, data in rows.items():
+        data = np.array(data)
+        print(f"{name:<8} {data[:, 0].mean():>12.2f} {data[:, 0].max():>12.2f} {data[:, 1].mean():>10.4f} "
+              f"{data[:, 2].mean():>14.2f} {data[:, 3].mean():>14.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+验证码画布取图方式微基准
+对比 PNG dataURL 与原始像素 (getImageData) 两种传输方式的传输字节数与每帧耗时
+
+使用方法:
+    python tests/demo/captcha_capture_demo/capture_benchmark.py
+    python tests/demo/captcha_capture_demo/capture_benchmark.py --image some_canvas.png --frames 200
+    python tests/demo/captcha_capture_demo/capture_benchmark.py --driver /path/to/msedgedriver
+"""
+
+import sys
+import os
+import time
+import base64
+import argparse
+
+import cv2
+import numpy as np
+
+# 添加项目根目录到sys.path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, '..', '..', '..'))
+sys.path.insert(0, project_root)
+
+from src.core.captcha import dataurl_to_cv2, raw_to_cv2, get_canvas_dataurl, get_canvas_raw
+
+def make_canvas(size=280, seed=0):
+    """生成类似验证码的测试画面（平滑纹理 + 几何形状）"""
+    rng = np.random.default_rng(seed)
+    noise = (rng.random((size // 8, size // 8, 3)) * 255).astype(np.uint8)
+    img = cv2.resize(noise, (size, size), interpolation=cv2.INTER_CUBIC)
+    cv2.rectangle(img, (size // 5, size // 3), (size * 4 // 5, size // 2), (40, 90, 160), -1)
+    cv2.circle(img, (size // 2, size * 2 // 3), size // 8, (220, 220, 220), -1)
+    return img
+
+def encode_dataurl(img):
+    ok, png = cv2.imencode('.png', img)
+    return "data:image/png;base64," + base64.b64encode(png.tobytes()).decode('ascii')
+
+def encode_raw(img):
+    h, w = img.shape[:2]
+    rgb = np.ascontiguousarray(img[:, :, ::-1])
+    return [w, h, base64.b64encode(rgb.tobytes()).decode('ascii')]
+
+def timeit(fn, frames):
+    fn()
+    start = time.perf_counter()
+    for _ in range(frames):
+        fn()
+    return (time.perf_counter() - start) / frames * 1000
+
+def report(name, payload_bytes, ms):
+    print(f"{name:<12} 传输字节: {payload_bytes:>10,d}    每帧耗时: {ms:8.3f} ms")
+
+def bench_offline(img, frames):
+    print("\n[离线] 仅测 Python 端解码（不含浏览器编码与 WebDriver 往返）")
+    dataurl = encode_dataurl(img)
+    raw = encode_raw(img)
+    assert np.array_equal(dataurl_to_cv2(dataurl), raw_to_cv2(raw))
+    report("dataURL", len(dataurl), timeit(lambda: dataurl_to_cv2(dataurl), frames))
+    report("raw", len(raw[2]), timeit(lambda: raw_to_cv2(raw), frames))
+
+def bench_live(img, frames, driver_path):
+    print("\n[在线] 无头 Edge 中绘制同一画面，测完整取图链路（浏览器编码 + 传输 + 解码）")
+    from selenium import webdriver
+    from selenium.webdriver.edge.options import Options
+    from selenium.webdriver.edge.service import Service
+
+    opts = Options()
+    opts.add_argument("--headless=new")
+    opts.add_argument("--no-sandbox")
+    driver = webdriver.Edge(service=Service(executable_path=driver_path), options=opts)
+    try:
+        h, w = img.shape[:2]
+        driver.get("about:blank")
+        driver.execute_script("""
+        var c = document.createElement('canvas'); c.id = 'bench'; c.width = arguments[0]; c.height = arguments[1];
+        document.body.appendChild(c);
+        var im = new Image();
+        im.onload = function() { c.getContext('2d').drawImage(im, 0, 0); window.__ready = true; };
+        im.src = arguments[2];
+        """, w, h, encode_dataurl(img))
+        while not driver.execute_script("return !!window.__ready"):
+            time.sleep(0.05)
+
+        dataurl = get_canvas_dataurl(driver, '#bench')
+        raw = get_canvas_raw(driver, '#bench')
+        report("dataURL", len(dataurl), timeit(lambda: dataurl_to_cv2(get_canvas_dataurl(driver, '#bench')), frames))
+        report("raw", len(raw[2]), timeit(lambda: raw_to_cv2(get_canvas_raw(driver, '#bench')), frames))
+    finally:
+        driver.quit()
+
+def main():
+    parser = argparse.ArgumentParser(description='验证码画布取图方式微基准')
+    parser.add_argument('--image', help='画布图片路径，默认生成测试画面')
+    parser.add_argument('--frames', type=int, default=100, help='每种方式测量的帧数')
+    parser.add_argument('--driver', help='msedgedriver 路径，提供时额外测量浏览器内完整链路')
+    args = parser.parse_args()
+
+    img = cv2.imread(args.image) if args.image else make_canvas()
+    if img is None:
+        print(f"无法读取图片: {args.image}")
+        return 1
+    print(f"画面尺寸: {img.shape[1]}x{img.shape[0]}    帧数: {args.frames}")
+
+    bench_offline(img, args.frames)
+    if args.driver:
+        bench_live(img, max(1, args.frames // 10), args.driver)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+验证码数据集构建
+把 captcha() 保存的 *_debug_canvas_attempt_N{success|failed}.png 及同名遥测 .json 增量整理为
+CaptchaCorpus（按内容去重的 npz 分片 + manifest.json），可每天运行一次
+
+使用方法:
+    python tests/demo/captcha_corpus_demo/build_corpus.py
+    python tests/demo/captcha_corpus_demo/build_corpus.py --screenshots /path/to/screenshot --root /path/to/corpus
+"""
+
+import sys
+import os
+import argparse
+from collections import Counter
+
+# 添加项目根目录到sys.path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, '..', '..', '..'))
+sys.path.insert(0, project_root)
+
+from src.core.captcha_corpus import CaptchaCorpus
+
+def main():
+    parser = argparse.ArgumentParser(description="验证码数据集构建")
+    parser.add_argument("--screenshots", help="截图目录，默认 AppPath.ScreenshotRoot")
+    parser.add_argument("--root", help="数据集目录，默认 AppPath.DataRoot/captcha_corpus")
+    parser.add_argument("--shard-size", type=int, default=500, help="每个分片最多的样本数")
+    args = parser.parse_args()
+
+    corpus = CaptchaCorpus(args.root, shard_size=args.shard_size).load()
+    added = corpus.build(args.screenshots)
+    corpus.save()
+
+    outcomes = Counter(r["outcome"] for r in corpus.records.values())
+    with_telemetry = sum(1 for r in corpus.records.values() if r.get("telemetry"))
+    print(f"数据集: {corpus.root}")
+    print(f"本次新增 {added} 张；共 {len(corpus)} 张（通过 {outcomes['success']}，未通过 {outcomes['failed']}），"
+          f"带遥测 {with_telemetry} 张，累计跳过重复 {corpus.duplicates} 张，分片 {len(corpus.shards)} 个")
+
+if __name__ == "__main__":
+    main()
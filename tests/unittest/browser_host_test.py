@@ -0,0 +1,181 @@
+import unittest
+from unittest.mock import patch
+import sys
+import os
+import json
+import time
+import tempfile
+import threading
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from multiprocessing.connection import Client
+from src.core.browser_host import BrowserHost, lease_browser, load_authkey, origin_of
+
+AUTHKEY = b"browser-host-test"
+KQ_URL = "https://kq.example.com/login"
+
+class FakeBrowser:
+    """模拟常驻的浏览器实例，记录清理与关闭"""
+    created_count = 0
+
+    def __init__(self, driver_path, headless):
+        FakeBrowser.created_count += 1
+        self.driver_path = driver_path
+        self.headless = headless
+        self.created = time.time()
+        self.session_id = f"session-{FakeBrowser.created_count}"
+        self.executor_url = "http://127.0.0.1:9515"
+        self.capabilities = {"browserName": "MicrosoftEdge"}
+        self.pid = None
+        self.exe = "msedgedriver"
+        self.alive = True
+        self.cleaned = []
+        self.closed = False
+
+    def healthy(self):
+        return self.alive
+
+    def clean(self, origins=()):
+        if not self.alive:
+            raise RuntimeError("browser crashed")
+        self.cleaned.append(list(origins))
+
+    def close(self):
+        self.closed = True
+
+class TestBrowserHost(unittest.TestCase):
+    def setUp(self):
+        self.log_patcher = patch('src.core.browser_host.Log')
+        self.log_patcher.start()
+        FakeBrowser.created_count = 0
+        self.browsers = []
+
+    def tearDown(self):
+        self.host.stop()
+        self.thread.join(5)
+        self.log_patcher.stop()
+
+    def start_host(self, **kwargs):
+        def factory(driver_path, headless):
+            browser = FakeBrowser(driver_path, headless)
+            self.browsers.append(browser)
+            return browser
+        kwargs.setdefault("health_interval", 60)
+        self.host = BrowserHost(address=("127.0.0.1", 0), authkey=AUTHKEY, factory=factory, **kwargs).start()
+        self.thread = threading.Thread(target=self.host.serve, daemon=True)
+        self.thread.start()
+        return self.host
+
+    def lease(self):
+        return lease_browser("msedgedriver", False, address=self.host.address, authkey=AUTHKEY, autostart=False)
+
+    def wait_idle(self, count=1):
+        deadline = time.time() + 5
+        while self.host.status()["idle"] != count and time.time() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(self.host.status()["idle"], count)
+
+    def test_warm_reuse_after_release(self):
+        """测试归还的会话清理后再次租用，不再启动新浏览器"""
+        self.start_host()
+        first = self.lease()
+        self.assertFalse(first.warm)
+        first.release(origins=[origin_of(KQ_URL)])
+        self.wait_idle()
+        second = self.lease()
+        self.assertTrue(second.warm)
+        self.assertEqual(second.session_id, first.session_id)
+        self.assertEqual(self.browsers[0].cleaned, [["https://kq.example.com"]])
+        second.release()
+        self.wait_idle()
+        status = self.host.status()
+        self.assertEqual((status["leases"], status["warm_leases"], FakeBrowser.created_count), (2, 1, 1))
+
+    def test_disconnect_reclaims_lease(self):
+        """测试租用方未归还即断开（进程崩溃）时，常驻进程回收并清理浏览器"""
+        self.start_host()
+        lease = self.lease()
+        lease.conn.close()
+        self.wait_idle()
+        self.assertEqual(self.host.status()["leased"], 0)
+        self.assertEqual(len(self.browsers[0].cleaned), 1)
+
+    def test_crashed_browser_replaced(self):
+        """测试空闲实例崩溃后，健康检查关闭它并重新启动一个预热实例"""
+        self.start_host()
+        self.lease().release()
+        self.wait_idle()
+        self.browsers[0].alive = False
+        self.host.check_idle()
+        self.assertTrue(self.browsers[0].closed)
+        self.assertEqual((len(self.browsers), self.host.recovered), (2, 1))
+        lease = self.lease()
+        self.assertTrue(lease.warm)
+        self.assertEqual(lease.session_id, self.browsers[1].session_id)
+        lease.release()
+
+    def test_max_age_retires_on_release(self):
+        """测试超过最长使用时间的实例归还时关闭，并补充新实例"""
+        self.start_host(max_age=60)
+        lease = self.lease()
+        self.browsers[0].created -= 120
+        lease.release()
+        self.wait_idle()
+        self.assertTrue(self.browsers[0].closed)
+        self.assertEqual((len(self.browsers), self.host.retired), (2, 1))
+
+    def test_idle_timeout_exits(self):
+        """测试长时间没有租用时常驻进程退出并关闭所有浏览器"""
+        self.start_host(idle_timeout=0.05, health_interval=0.05)
+        self.lease().release()
+        self.thread.join(5)
+        self.assertFalse(self.thread.is_alive())
+        self.assertTrue(all(b.closed for b in self.browsers))
+
+    def test_stop_and_ping(self):
+        """测试 ping 返回状态，stop 请求使常驻进程退出"""
+        self.start_host()
+        conn = Client(self.host.address, authkey=AUTHKEY)
+        conn.send({"op": "ping"})
+        reply = conn.recv()
+        self.assertTrue(reply["ok"])
+        self.assertEqual(reply["leased"], 0)
+        conn.send({"op": "stop"})
+        self.assertTrue(conn.recv()["ok"])
+        conn.close()
+        self.thread.join(5)
+        self.assertFalse(self.thread.is_alive())
+
+class TestBrowserHostState(unittest.TestCase):
+    def setUp(self):
+        self.log_patcher = patch('src.core.browser_host.Log')
+        self.log_patcher.start()
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+        self.log_patcher.stop()
+
+    def test_authkey_created_once(self):
+        """测试连接密钥首次使用时生成，之后读取同一个密钥"""
+        path = os.path.join(self.tmp.name, "browser_host.key")
+        key = load_authkey(path)
+        self.assertEqual(len(key), 32)
+        self.assertEqual(load_authkey(path), key)
+
+    def test_recover_stale_drivers(self):
+        """测试启动时只清理上次残留且仍是驱动的进程"""
+        path = os.path.join(self.tmp.name, "browser_host.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"version": 1, "pid": -1, "drivers": [{"pid": 101, "exe": "msedgedriver"},
+                                                            {"pid": 102, "exe": "msedgedriver"}]}, f)
+        host = BrowserHost(address=("127.0.0.1", 0), authkey=AUTHKEY, state_path=path)
+        with patch('src.core.browser_host._is_process', side_effect=lambda pid, exe: pid == 101), \
+                patch('src.core.browser_host._kill_tree') as kill:
+            self.assertEqual(host.recover_stale(), 1)
+        kill.assert_called_once_with(101)
+
+if __name__ == '__main__':
+    unittest.main()
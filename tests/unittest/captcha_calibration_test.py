@@ -0,0 +1,144 @@
+import unittest
+from unittest.mock import patch, MagicMock
+import sys
+import os
+import base64
+import tempfile
+
+import numpy as np
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.core.captcha import dynamic_adjust_drag, normalize_angle, DragTelemetry
+from src.core.captcha_calibration import SliderCalibration
+
+class TestSliderCalibration(unittest.TestCase):
+    def setUp(self):
+        self.log_patcher = patch('src.core.captcha_calibration.Log')
+        self.log_patcher.start()
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "data", "captcha_calibration.json")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+        self.log_patcher.stop()
+
+    def test_fit_gain_and_error(self):
+        """测试由遥测样本拟合每像素角度与拟合误差"""
+        calibration = SliderCalibration(path=self.path)
+        self.assertIsNone(calibration.gain(300))
+        telemetry = DragTelemetry(track_width=300)
+        angle = 60.0
+        for dx, noise in [(10, 0.5), (5, -0.3), (12, 0.2), (3, -0.4), (8, 0.1)]:
+            new_angle = angle - 1.2 * dx + noise
+            telemetry.record(dx, angle, new_angle)
+            angle = new_angle
+        self.assertEqual(calibration.update(telemetry), 5)
+        self.assertAlmostEqual(calibration.gain(300), -1.2, delta=0.05)
+        self.assertLess(calibration.fit_error(300), 0.5)
+        self.assertEqual(calibration.pixels_for(300, 36), 30)
+        self.assertIsNone(calibration.gain(250))
+
+    def test_outliers_rejected(self):
+        """测试估计跳变产生的异常样本不会进入模型"""
+        calibration = SliderCalibration(path=self.path)
+        for _ in range(5):
+            calibration.add_sample(300, 10, -12.0)
+        self.assertFalse(calibration.add_sample(300, 10, 90.0))
+        self.assertFalse(calibration.add_sample(300, 2, 30.0))
+        self.assertAlmostEqual(calibration.gain(300), -1.2)
+
+    def test_degenerate_model_unusable(self):
+        """测试角度不变的样本被丢弃，增益接近 0 或移动幅度过小时模型不可用"""
+        calibration = SliderCalibration(path=self.path)
+        self.assertFalse(calibration.add_sample(300, 10, 0.0))
+        calibration.tracks["300"] = {"count": 5, "n": 5.0, "sxx": 1000.0, "sxy": 0.5, "syy": 1.0}
+        self.assertIsNone(calibration.gain(300))
+        self.assertIsNone(calibration.pixels_for(300, 40))
+        calibration.tracks["300"] = {"count": 5, "n": 5.0, "sxx": 5.0, "sxy": -6.0, "syy": 7.2}
+        self.assertIsNone(calibration.gain(300))
+
+    def test_other_sources_ignored(self):
+        """测试参考图等其他来源的遥测不进入模型，与默认估计器的遥测混合时增益不受影响"""
+        calibration = SliderCalibration(path=self.path)
+        for run in range(4):
+            planned = DragTelemetry(track_width=300)
+            reference = DragTelemetry(track_width=300, estimator="reference")
+            angle = 60.0
+            for dx in (20, 10, 5):
+                planned.record(dx, angle, angle - 1.2 * dx)
+                reference.record(dx, -angle, -angle + 1.2 * dx)
+                angle -= 1.2 * dx
+            self.assertEqual(calibration.update(reference), 0)
+            self.assertEqual(calibration.update(planned), 3)
+        self.assertAlmostEqual(calibration.gain(300), -1.2)
+        self.assertEqual(SliderCalibration(path=self.path, sources=("ensemble", "reference")).update(reference), 3)
+
+    def test_persistence(self):
+        """测试模型保存后可重新加载"""
+        calibration = SliderCalibration(path=self.path)
+        for dx in (4, 8, 12):
+            calibration.add_sample(280, dx, dx * 1.3)
+        calibration.save()
+        loaded = SliderCalibration(path=self.path).load()
+        self.assertAlmostEqual(loaded.gain(280), 1.3)
+
+    def test_calibrated_drag_jumps_to_target(self):
+        """测试已标定时首步直接跳到目标附近，只需极少的微调"""
+        calibration = SliderCalibration(path=self.path)
+        for dx in (4, 8, 12):
+            calibration.add_sample(300, dx, dx * -1.2)
+        state = {"moved": 0, "moves": 0}
+
+        def move(dx, dy):
+            state["moved"] += dx
+            state["moves"] += 1
+            return actions
+
+        def execute_script(script, *args):
+            if 'getBoundingClientRect' in script:
+                return 300
+            rgb = np.full((4, 4, 3), state["moved"] % 256, dtype=np.uint8)
+            return [4, 4, base64.b64encode(rgb.tobytes()).decode('ascii')]
+
+        actions = MagicMock()
+        actions.move_by_offset.side_effect = move
+        driver = MagicMock()
+        driver.execute_script.side_effect = execute_script
+        telemetry = DragTelemetry()
+        # 真实每像素 -1.25°，与模型略有偏差
+        estimator = lambda img: normalize_angle(75 - 1.25 * state["moved"])
+        with patch('src.core.captcha.Log'), patch('src.core.captcha.time.sleep'), \
+                patch('src.core.captcha.estimate_angle', side_effect=estimator):
+            dynamic_adjust_drag(actions, driver, MagicMock(), '.track', '#c', max_steps=50, tolerance=3,
+                                calibration=calibration, telemetry=telemetry)
+        self.assertLessEqual(abs(estimator(None)), 3)
+        self.assertLessEqual(state["moves"], 3)
+        self.assertEqual(telemetry.track_width, 300)
+        self.assertAlmostEqual(telemetry.samples[0][0], 62.5, delta=1)
+
+    def test_degenerate_model_falls_back(self):
+        """测试标定模型不可用时按步长表拖动，不因像素数为 None 中断"""
+        calibration = SliderCalibration(path=self.path)
+        calibration.tracks["300"] = {"count": 5, "n": 5.0, "sxx": 1000.0, "sxy": 0.5, "syy": 1.0}
+        state = {"moved": 0}
+
+        def move(dx, dy):
+            state["moved"] += dx
+            return actions
+
+        actions = MagicMock()
+        actions.move_by_offset.side_effect = move
+        driver = MagicMock()
+        driver.execute_script.side_effect = lambda script, *args: 300 if 'getBoundingClientRect' in script else \
+            [4, 4, base64.b64encode(np.full((4, 4, 3), state["moved"] % 256, dtype=np.uint8).tobytes()).decode('ascii')]
+        estimator = lambda img: normalize_angle(-40 + 1.25 * state["moved"])
+        with patch('src.core.captcha.Log'), patch('src.core.captcha.time.sleep'), \
+                patch('src.core.captcha.estimate_angle', side_effect=estimator):
+            dynamic_adjust_drag(actions, driver, MagicMock(), '.track', '#c', max_steps=50, tolerance=3,
+                                calibration=calibration)
+        self.assertLessEqual(abs(estimator(None)), 3)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,125 @@
+import unittest
+from unittest.mock import patch, MagicMock
+import sys
+import os
+import base64
+
+import numpy as np
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.core.captcha import dynamic_adjust_drag, normalize_angle, DragTelemetry
+from src.core.captcha_controller import SecantController, PIDController, create_controller
+
+def simulate(controller, start_angle, gain, max_steps=30):
+    """
+    在线性的 角度-位移 模型上运行控制器
+
+    :return: (移动次数, 最终角度, 过程中越过 0° 的最大幅度)
+    """
+    moved, moves, overshoot = 0, 0, 0.0
+    angle = start_angle
+    for _ in range(max_steps):
+        if controller.converged(angle):
+            break
+        dx = controller.next_step(angle)
+        if not dx:
+            continue
+        moved += dx
+        moves += 1
+        new_angle = normalize_angle(start_angle + gain * moved)
+        if new_angle * start_angle < 0:
+            overshoot = max(overshoot, abs(new_angle))
+        controller.observe(dx, angle, new_angle)
+        angle = new_angle
+    return moves, angle, overshoot
+
+class TestStepController(unittest.TestCase):
+    def test_secant_converges(self):
+        """测试割线法在未知增益下经过试探后快速收敛"""
+        for start, gain in [(80, -1.2), (-60, -0.8), (45, 1.5)]:
+            moves, angle, overshoot = simulate(SecantController(tolerance=3), start, gain)
+            self.assertLessEqual(abs(angle), 3)
+            self.assertLessEqual(moves, 4)
+            self.assertLessEqual(overshoot, abs(start) * 0.2)
+
+    def test_pid_converges(self):
+        """测试 PID 在增益已知时收敛且越过目标的幅度受限"""
+        moves, angle, overshoot = simulate(PIDController(tolerance=3, gain=-1.2), 90, -1.2)
+        self.assertLessEqual(abs(angle), 3)
+        self.assertLessEqual(moves, 8)
+        self.assertLessEqual(overshoot, 90 * 0.2)
+
+    def test_settle_requires_consecutive_frames(self):
+        """测试 settle 帧内角度连续达标才算收敛"""
+        controller = SecantController(tolerance=3, settle=2)
+        self.assertFalse(controller.converged(2))
+        self.assertEqual(controller.next_step(2), 0)
+        self.assertTrue(controller.converged(1))
+        self.assertFalse(controller.converged(10))
+
+    def test_observe_rejects_jumps(self):
+        """测试符号与已知增益相反的样本被忽略"""
+        controller = SecantController(gain=-1.0)
+        controller.observe(10, 50, 70)
+        self.assertEqual(controller.gain, -1.0)
+        controller.observe(10, 50, 38)
+        self.assertAlmostEqual(controller.gain, -1.2)
+
+    def test_zero_gain_probes(self):
+        """测试标定给出的增益为 0 时视为未知，先试探移动并能收敛"""
+        for name in ("secant", "pid"):
+            controller = create_controller(name, tolerance=3, gain=0.0)
+            self.assertIsNone(controller.gain)
+            self.assertEqual(controller.next_step(60), controller.probe_px)
+            moves, angle, _ = simulate(create_controller(name, tolerance=3, gain=0.0), 60, -1.2)
+            self.assertLessEqual(abs(angle), 3)
+
+    def test_create_controller(self):
+        """测试按名称创建控制器"""
+        self.assertIsNone(create_controller("legacy"))
+        self.assertIsNone(create_controller(None))
+        self.assertIsInstance(create_controller("pid", tolerance=5), PIDController)
+        with self.assertRaises(ValueError):
+            create_controller("bang-bang")
+
+class TestControllerDrag(unittest.TestCase):
+    def run_drag(self, controller, start_angle=75, gain=-1.25):
+        state = {"moved": 0}
+
+        def move(dx, dy):
+            state["moved"] += dx
+            return actions
+
+        def execute_script(script, *args):
+            if 'getBoundingClientRect' in script:
+                return 300
+            rgb = np.full((4, 4, 3), state["moved"] % 256, dtype=np.uint8)
+            return [4, 4, base64.b64encode(rgb.tobytes()).decode('ascii')]
+
+        actions = MagicMock()
+        actions.move_by_offset.side_effect = move
+        driver = MagicMock()
+        driver.execute_script.side_effect = execute_script
+        telemetry = DragTelemetry()
+        estimator = lambda img: normalize_angle(start_angle + gain * state["moved"])
+        with patch('src.core.captcha.Log'), patch('src.core.captcha.time.sleep'):
+            dynamic_adjust_drag(actions, driver, MagicMock(), '.track', '#c', max_steps=50, tolerance=3,
+                                estimator=estimator, telemetry=telemetry, controller=controller)
+        return estimator(None), telemetry
+
+    def test_controller_reports_steps(self):
+        """测试控制器模式收敛并记录达标步数，步数不多于原有步长表"""
+        legacy_angle, legacy = self.run_drag("legacy")
+        self.assertEqual(legacy.controller, "legacy")
+        for name in ("secant", "pid"):
+            angle, telemetry = self.run_drag(name)
+            self.assertLessEqual(abs(angle), 3)
+            self.assertEqual(telemetry.controller, name)
+            self.assertIsNotNone(telemetry.steps_to_tolerance)
+            if legacy.steps_to_tolerance is not None:
+                self.assertLessEqual(telemetry.steps_to_tolerance, legacy.steps_to_tolerance)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,136 @@
+import unittest
+from unittest.mock import patch
+import sys
+import os
+import json
+import tempfile
+
+import cv2
+import numpy as np
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.core.captcha import DragTelemetry
+from src.core.captcha_corpus import CaptchaCorpus
+from src.core.captcha_screenshot import ScreenshotStore, write_sidecar, read_sidecar, content_hash
+
+def make_canvas(seed, size=40):
+    rng = np.random.default_rng(seed)
+    return (rng.random((size, size, 3)) * 255).astype(np.uint8)
+
+class TestCaptchaCorpus(unittest.TestCase):
+    def setUp(self):
+        self.log_patcher = patch('src.core.captcha_corpus.Log')
+        self.log_patcher.start()
+        self.store_log_patcher = patch('src.core.captcha_screenshot.Log')
+        self.store_log_patcher.start()
+        self.tmp = tempfile.TemporaryDirectory()
+        self.shots = os.path.join(self.tmp.name, "screenshot")
+        self.root = os.path.join(self.tmp.name, "corpus")
+        os.makedirs(self.shots)
+        self.clock = 1_700_000_000
+
+    def tearDown(self):
+        self.tmp.cleanup()
+        self.store_log_patcher.stop()
+        self.log_patcher.stop()
+
+    def shot(self, name, img, telemetry=None):
+        path = os.path.join(self.shots, name)
+        cv2.imwrite(path, img)
+        if telemetry is not None:
+            write_sidecar(path, telemetry)
+        self.clock += 10
+        os.utime(path, (self.clock, self.clock))
+        return path
+
+    def test_build_dedupe_and_reload(self):
+        """测试按内容去重、附带遥测、未改名的截图跳过，保存后可重新加载"""
+        a, b = make_canvas(1), make_canvas(2)
+        self.shot("2025_01_01_debug_canvas_attempt_1failed.png", a, {"angles": [40.0, 3.0], "moved": 32.0})
+        self.shot("2025_01_01_debug_canvas_attempt_2success.png", b, {"angles": [12.0, 1.0], "moved": 10.0})
+        self.shot("2025_01_02_debug_canvas_attempt_1success.png", b)
+        self.shot("2025_01_02_debug_canvas_attempt_2.png", a)
+
+        corpus = CaptchaCorpus(self.root)
+        self.assertEqual(corpus.build(self.shots), 2)
+        corpus.save()
+
+        loaded = CaptchaCorpus(self.root).load()
+        self.assertEqual(len(loaded), 2)
+        self.assertEqual(loaded.duplicates, 1)
+        record = loaded.records[content_hash(b)]
+        self.assertEqual((record["outcome"], record["label"], record["attempt"]), ("success", 0.0, 2))
+        self.assertEqual(record["telemetry"]["angles"], [12.0, 1.0])
+        self.assertEqual(record["duplicates"], ["2025_01_02_debug_canvas_attempt_1success.png"])
+        labelled = list(loaded.samples(labelled=True))
+        self.assertEqual(len(labelled), 1)
+        np.testing.assert_array_equal(labelled[0][1], b)
+        self.assertEqual([r["outcome"] for r, _ in loaded.samples(outcome="failed")], ["failed"])
+
+    def test_incremental_build(self):
+        """测试再次构建只导入新截图，已写满的分片不再改写，未满分片按尺寸补齐"""
+        for i in range(3):
+            self.shot(f"d1_debug_canvas_attempt_{i + 1}failed.png", make_canvas(i))
+        corpus = CaptchaCorpus(self.root, shard_size=2)
+        corpus.build(self.shots)
+        corpus.save()
+        self.assertEqual({n: s["count"] for n, s in corpus.shards.items()},
+                         {"shard_00000.npz": 2, "shard_00001.npz": 1})
+        full_mtime = os.path.getmtime(os.path.join(self.root, "shard_00000.npz"))
+
+        self.shot("d2_debug_canvas_attempt_1success.png", make_canvas(10))
+        self.shot("d2_debug_canvas_attempt_2success.png", make_canvas(11, size=60))
+        corpus = CaptchaCorpus(self.root, shard_size=2).load()
+        self.assertEqual(corpus.build(self.shots), 2)
+        corpus.save()
+        self.assertEqual(CaptchaCorpus(self.root, shard_size=2).load().build(self.shots), 0)
+
+        self.assertEqual(os.path.getmtime(os.path.join(self.root, "shard_00000.npz")), full_mtime)
+        self.assertEqual(corpus.shards["shard_00001.npz"]["count"], 2)
+        self.assertEqual(corpus.shards["shard_00002.npz"]["shape"], [60, 60, 3])
+        reloaded = CaptchaCorpus(self.root).load()
+        for record, img in reloaded.samples():
+            self.assertEqual(content_hash(img), record["hash"])
+        self.assertEqual(len(list(reloaded.samples())), 5)
+
+    def test_build_from_store(self):
+        """测试导入截图库中已标注的条目，未标注的跳过，重复内容不再解码"""
+        a, b = make_canvas(1), make_canvas(2)
+        store = ScreenshotStore(self.shots)
+        store.put("s1_debug_canvas_attempt_1", a)
+        store.put("s1_debug_canvas_attempt_2", b)
+        store.put("s2_debug_canvas_attempt_1", b)
+        store.put("s3_debug_canvas_attempt_1", a)
+        store.label("s1_debug_canvas_attempt_1", "failed", {"moved": 5.0})
+        store.label("s1_debug_canvas_attempt_2", "success")
+        store.label("s2_debug_canvas_attempt_1", "success")
+        store.save()
+
+        corpus = CaptchaCorpus(self.root)
+        with patch.object(ScreenshotStore, 'read', autospec=True, side_effect=ScreenshotStore.read) as read:
+            self.assertEqual(corpus.build(self.shots), 2)
+        self.assertEqual(read.call_count, 2)
+        corpus.save()
+        record = corpus.records[content_hash(b)]
+        self.assertEqual((record["source"], record["attempt"], record["label"]),
+                         ("s1_debug_canvas_attempt_2success.png", 2, 0.0))
+        self.assertEqual(record["duplicates"], ["s2_debug_canvas_attempt_1success.png"])
+        self.assertEqual(corpus.records[content_hash(a)]["telemetry"], {"moved": 5.0})
+        self.assertEqual(CaptchaCorpus(self.root).load().build(self.shots), 0)
+
+    def test_telemetry_sidecar(self):
+        """测试拖动遥测可序列化为截图旁的 JSON"""
+        telemetry = DragTelemetry(track_width=300, controller="secant")
+        telemetry.record(np.int64(20), np.float32(45.5), np.float64(20.0))
+        path = os.path.join(self.shots, "x_debug_canvas_attempt_1success.png")
+        write_sidecar(path, dict(telemetry.to_dict(attempt=1, moved=20.0), outcome="success"))
+        data = read_sidecar(path)
+        self.assertEqual(data["samples"], [[20.0, 45.5, 20.0]])
+        self.assertEqual((data["track_width"], data["controller"], data["outcome"]), (300, "secant", "success"))
+        with open(path[:-4] + ".json", encoding="utf-8") as f:
+            self.assertIn("version", json.load(f))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,159 @@
+import unittest
+from unittest.mock import patch, MagicMock
+import sys
+import os
+import time
+import base64
+import random
+import tempfile
+
+import cv2
+import numpy as np
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.core.captcha_index import CaptchaIndex, rotation_invariant_hash, hamming
+from src.core.captcha_screenshot import ScreenshotStore
+from src.core.captcha import reference_drag, normalize_angle
+from src.core.captcha_reference import ReferenceLibrary, polar_signature
+from src.core.captcha_calibration import SliderCalibration
+from fixtures import make_picture, rotate_image
+
+class TestRotationInvariantHash(unittest.TestCase):
+    def test_rotation_invariant(self):
+        """测试同一图片任意旋转后哈希几乎不变"""
+        base = rotation_invariant_hash(make_picture(3))
+        for angle in (5, 45, 90, 133, -100):
+            self.assertLessEqual(hamming(base, rotation_invariant_hash(rotate_image(make_picture(3), angle))), 4)
+
+    def test_distinct_pictures(self):
+        """测试不同图片哈希差异明显"""
+        base = rotation_invariant_hash(make_picture(3))
+        for seed in range(10, 20):
+            self.assertGreater(hamming(base, rotation_invariant_hash(make_picture(seed))), 8)
+
+class TestCaptchaIndex(unittest.TestCase):
+    def setUp(self):
+        self.log_patcher = patch('src.core.captcha_index.Log')
+        self.log_patcher.start()
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "data", "captcha_index.json")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+        self.log_patcher.stop()
+
+    def test_lookup_near_duplicate(self):
+        """测试海明距离在阈值内的哈希命中同一条目"""
+        index = CaptchaIndex(path=self.path)
+        index.insert(0b1011 << 40, reference="a.png")
+        self.assertEqual(index.lookup((0b1011 << 40) ^ 0b101).reference, "a.png")
+        self.assertIsNone(index.lookup((0b1011 << 40) ^ 0b11111))
+        index.insert((0b1011 << 40) ^ 0b1, reference="b.png")
+        self.assertEqual(len(index), 1)
+
+    def test_lru_bound(self):
+        """测试超过上限时淘汰最久未使用的条目"""
+        index = CaptchaIndex(path=self.path, max_entries=2)
+        a, b, c = 0, (1 << 64) - 1, 0xFFFFFFFF
+        index.insert(a, reference="a.png")
+        index.insert(b, reference="b.png")
+        index.lookup(a)
+        index.insert(c, reference="c.png")
+        self.assertIsNotNone(index.lookup(a))
+        self.assertIsNone(index.lookup(b))
+        self.assertEqual(len(index), 2)
+
+    def test_persistence_and_invalidate(self):
+        """测试索引保存后可重新加载，未通过验证的参考图会被清除"""
+        index = CaptchaIndex(path=self.path)
+        index.insert(0x1234, reference="x.png")
+        index.insert(0xFFFF0000FFFF0000, reference="y.png")
+        index.invalidate(0xFFFF0000FFFF0000)
+        index.save()
+        loaded = CaptchaIndex(path=self.path).load()
+        self.assertEqual(len(loaded), 2)
+        self.assertEqual(loaded.lookup(0x1234).reference, "x.png")
+        self.assertIsNone(loaded.lookup(0xFFFF0000FFFF0000).reference)
+
+    def test_incremental_build(self):
+        """测试历史截图增量导入，已导入的截图不会重复处理"""
+        root = os.path.join(self.tmp.name, "screenshot")
+        os.makedirs(root)
+        cv2.imwrite(os.path.join(root, "a_attempt_1success.png"), make_picture(1))
+        cv2.imwrite(os.path.join(root, "b_attempt_1failed.png"), make_picture(2))
+        index = CaptchaIndex(path=self.path)
+        self.assertEqual(index.build_from_screenshots(root), 1)
+        self.assertEqual(index.build_from_screenshots(root), 0)
+        entry = index.lookup(rotation_invariant_hash(rotate_image(make_picture(1), 70)))
+        self.assertEqual(entry.reference, "a_attempt_1success.png")
+
+    def test_build_from_store(self):
+        """测试从截图库导入通过截图，引用名与旧版文件名一致"""
+        root = os.path.join(self.tmp.name, "screenshot")
+        store = ScreenshotStore(root)
+        store.put("a_debug_canvas_attempt_1", make_picture(1))
+        store.put("b_debug_canvas_attempt_1", make_picture(2))
+        store.label("a_debug_canvas_attempt_1", "success")
+        store.label("b_debug_canvas_attempt_1", "failed")
+        store.save()
+        index = CaptchaIndex(path=self.path)
+        self.assertEqual(index.build_from_screenshots(root), 1)
+        self.assertEqual(index.build_from_screenshots(root), 0)
+        entry = index.lookup(rotation_invariant_hash(make_picture(1)))
+        self.assertEqual(entry.reference, "a_debug_canvas_attempt_1success.png")
+
+    def test_lookup_scales(self):
+        """测试数万条目时查找仍然很快"""
+        rng = random.Random(0)
+        index = CaptchaIndex(path=self.path)
+        keys = [rng.getrandbits(64) for _ in range(30000)]
+        for i, key in enumerate(keys):
+            index.insert(key, reference=f"{i}.png")
+        start = time.perf_counter()
+        for key in keys[:500]:
+            self.assertIsNotNone(index.lookup(key ^ 0b11))
+        self.assertLess((time.perf_counter() - start) / 500, 0.005)
+
+class TestIndexedReferenceDrag(unittest.TestCase):
+    def test_hit_matches_recorded_reference(self):
+        """测试索引命中时只与记录的参考图匹配，同一张图换了初始角度仍按当前角度拖到阈值内"""
+        picture = make_picture(1)
+        library = ReferenceLibrary(root="unused", cache_path="unused")
+        library.names = ["other.png", "picture.png"]
+        library.signatures = np.stack([polar_signature(make_picture(2)), polar_signature(picture)])
+        calibration = SliderCalibration(path="unused")
+        for dx in (10, 20, 30):
+            calibration.add_sample(300, dx, -1.25 * dx)
+        state = {"moved": 0, "moves": 0}
+
+        def angle():
+            # 估计器约定：转回正立需要的角度，拖动使它按每像素 -1.25° 变化
+            return normalize_angle(82 - 1.25 * state["moved"])
+
+        def move(dx, dy):
+            state["moved"] += dx
+            state["moves"] += 1
+            return actions
+
+        def execute_script(script, *args):
+            if 'getBoundingClientRect' in script:
+                return 300
+            rgb = np.ascontiguousarray(rotate_image(picture, -angle())[:, :, ::-1])
+            return [rgb.shape[1], rgb.shape[0], base64.b64encode(rgb.tobytes()).decode('ascii')]
+
+        actions = MagicMock()
+        actions.move_by_offset.side_effect = move
+        driver = MagicMock()
+        driver.execute_script.side_effect = execute_script
+        with patch('src.core.captcha.Log'), patch('src.core.captcha.time.sleep'), \
+                patch.object(library, 'match', side_effect=AssertionError("full match")):
+            moved = reference_drag(actions, driver, MagicMock(), '.track', '#c', library, tolerance=3,
+                                   calibration=calibration, ref_index=1)
+        self.assertEqual(moved, state["moved"])
+        self.assertLessEqual(abs(angle()), 3)
+        self.assertLessEqual(state["moves"], 3)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,110 @@
+import unittest
+from unittest.mock import patch, MagicMock
+import sys
+import os
+import base64
+
+import numpy as np
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.core.captcha import inpage_drag, Selectors, DragTelemetry
+from src.core.captcha_inpage import INPAGE_RELEASE_JS, InPageSolver
+
+SELECTORS = Selectors(canvas='#c', slider='.s', track='.t')
+
+class FakePage:
+    """
+    模拟页面：execute_async_script 依次返回预设的求解结果，并记录累计拖动距离
+    """
+    def __init__(self, results, start_angle=60, gain=-1.2):
+        self.results = list(results)
+        self.start_angle = start_angle
+        self.gain = gain
+        self.moved = 0
+        self.options = []
+        self.released = 0
+        self.driver = MagicMock()
+        self.driver.execute_async_script.side_effect = self.execute_async_script
+        self.driver.execute_script.side_effect = self.execute_script
+        self.driver.timeouts.script = 30
+
+    def execute_async_script(self, script, canvas, slider, track, options):
+        self.options.append(options)
+        result = self.results.pop(0)
+        if "moved" in result:
+            self.moved = result["moved"]
+        return result
+
+    def execute_script(self, script, *args):
+        if script == INPAGE_RELEASE_JS:
+            self.released += 1
+            return True
+        if 'getBoundingClientRect' in script:
+            return 300
+        rgb = np.full((4, 4, 3), self.moved % 256, dtype=np.uint8)
+        return [4, 4, base64.b64encode(rgb.tobytes()).decode('ascii')]
+
+    def estimator(self, img):
+        return self.start_angle + self.gain * self.moved
+
+class TestInPageDrag(unittest.TestCase):
+    def setUp(self):
+        self.patchers = [patch('src.core.captcha.Log'), patch('src.core.captcha_inpage.Log'),
+                         patch('src.core.captcha_verify.Log'), patch('src.core.captcha.time.sleep')]
+        for p in self.patchers:
+            p.start()
+
+    def tearDown(self):
+        for p in self.patchers:
+            p.stop()
+
+    def test_single_round_verified(self):
+        """测试页面内一轮求解后 OpenCV 校验达标，只有一次脚本往返"""
+        page = FakePage([{"moved": 50, "steps": [[15, -18, 0.4], [35, -42, 0.4]], "change": -60,
+                          "gain": -1.2, "pressed": True}])
+        telemetry = DragTelemetry()
+        moved, solver = inpage_drag(page.driver, SELECTORS, tolerance=3, estimator=page.estimator,
+                                    telemetry=telemetry)
+        self.assertEqual(moved, 50)
+        self.assertTrue(solver.pressed)
+        self.assertEqual(page.driver.execute_async_script.call_count, 1)
+        self.assertEqual(page.options[0]["angle"], 60)
+        self.assertEqual(telemetry.controller, "inpage")
+        self.assertEqual(telemetry.steps_to_tolerance, 2)
+        self.assertEqual(telemetry.samples[-1], (50, 60, 0))
+
+    def test_second_round_uses_verified_angle(self):
+        """测试校验未达标时按 OpenCV 角度与页面内测得的增益再求解一轮"""
+        page = FakePage([{"moved": 40, "steps": [[15, -18, 0.4], [25, -42, 0.4]], "gain": -1.5, "pressed": True},
+                         {"moved": 50, "steps": [[10, -12, 0.4]], "gain": -1.2, "pressed": True}])
+        moved, solver = inpage_drag(page.driver, SELECTORS, tolerance=3, estimator=page.estimator)
+        self.assertEqual(moved, 50)
+        self.assertEqual(page.options[1]["angle"], 12)
+        self.assertEqual(page.options[1]["gain"], -1.5)
+
+    def test_fallback_before_press(self):
+        """测试画面无明显方向时不按下滑块，交给其他拖动方式"""
+        page = FakePage([{"error": "low coherence", "coherence": 0.01, "pressed": False}])
+        self.assertEqual(inpage_drag(page.driver, SELECTORS, estimator=page.estimator), (None, None))
+        self.assertEqual(page.released, 0)
+
+    def test_release_on_failure_after_press(self):
+        """测试按下后出错且未移动时先松开再交给其他拖动方式"""
+        page = FakePage([{"error": "TypeError", "pressed": True, "moved": 0}])
+        self.assertEqual(inpage_drag(page.driver, SELECTORS, estimator=page.estimator), (None, None))
+        self.assertEqual(page.released, 1)
+
+    def test_script_timeout_restored(self):
+        """测试求解结束后（包括脚本抛出异常时）恢复原来的脚本超时"""
+        for result in ({"moved": 50, "steps": [[50, -60, 0.4]], "pressed": True}, RuntimeError("boom")):
+            page = FakePage([result])
+            page.driver.timeouts.script = 7
+            if isinstance(result, Exception):
+                page.driver.execute_async_script.side_effect = result
+            InPageSolver(page.driver, SELECTORS, timeout=15).solve(60)
+            self.assertEqual([c.args[0] for c in page.driver.set_script_timeout.call_args_list], [15, 7])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+import unittest
+from unittest.mock import patch
+import sys
+import os
+import json
+import time
+import tempfile
+
+import numpy as np
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.core.captcha import AngleEnsemble, AngleEstimator, CaptchaSolver
+from src.core.captcha_model import AngleModel, train_model, model_features, MODEL_FORMAT
+from src.core.captcha_synthetic import SyntheticCaptcha, procedural_seed, angle_error
+
+class TestAngleModel(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.images = [procedural_seed(128, seed=i) for i in range(2)]
+        with patch('src.core.captcha_model.Log'):
+            cls.model, cls.report = train_model(cls.images, samples=1200, epochs=8, hidden=32, val_samples=200,
+                                                disc_prob=0, log=lambda *a: None)
+
+    def setUp(self):
+        self.log_patcher = patch('src.core.captcha_model.Log')
+        self.log_patcher.start()
+
+    def tearDown(self):
+        self.log_patcher.stop()
+
+    def test_training_learns_rotation(self):
+        """测试 CPU 上训练后验证误差远低于随机猜测（平均 90°）"""
+        self.assertLess(self.report["val_mae"], 20)
+        gen = SyntheticCaptcha(self.images, size=128, disc_prob=0)
+        errors = [angle_error(self.model.estimate(s.img)[0], s.angle) for s in gen.samples(50, seed=9)]
+        self.assertLess(np.median(errors), 20)
+
+    def test_save_load_roundtrip(self):
+        """测试模型文件带格式与版本信息，读回后输出一致；版本不匹配时不加载"""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = self.model.save(os.path.join(tmp, "model.npz"))
+            loaded = AngleModel.load(path)
+            img = self.images[0]
+            self.assertAlmostEqual(loaded.estimate(img)[0], self.model.estimate(img)[0], places=4)
+            self.assertEqual(loaded.meta["format"], MODEL_FORMAT)
+            self.assertIn("val_mae", loaded.meta)
+
+            with np.load(path) as data:
+                arrays = {k: data[k] for k in data.files}
+            meta = json.loads(str(arrays["meta"]))
+            arrays["meta"] = np.array(json.dumps(dict(meta, version=meta["version"] + 1)))
+            np.savez(path, **arrays)
+            self.assertIsNone(AngleModel.load(path))
+            self.assertIsNone(AngleModel.load(os.path.join(tmp, "missing.npz")))
+
+    def test_inference_latency(self):
+        """测试单帧推理（含特征提取）在几毫秒以内，FrameAnalysis 与原图输入一致"""
+        solver = CaptchaSolver()
+        frames = [s.img for s in SyntheticCaptcha(self.images, size=280).samples(20, seed=3)]
+        self.model.estimate(solver.frame(frames[0]))
+        started = time.perf_counter()
+        for img in frames:
+            angle, confidence = self.model.estimate(solver.frame(img))
+            self.assertTrue(0 <= confidence <= 1)
+        self.assertLess((time.perf_counter() - started) * 1000 / len(frames), 3)
+        self.assertEqual(model_features(frames[0]).shape, (32 * 32,))
+
+    def test_ensemble_slot(self):
+        """测试模型估计器按名称替换，插入到指定优先级"""
+        ensemble = AngleEnsemble()
+        estimator = AngleEstimator("model", self.model.estimate, 0.8, absolute=True)
+        ensemble.add(estimator, index=1)
+        ensemble.add(estimator, index=1)
+        self.assertEqual([e.name for e in ensemble.estimators], ["ring", "model", "pca", "hough", "normal"])
+        ensemble.remove("model")
+        self.assertNotIn("model", [e.name for e in ensemble.estimators])
+
+if __name__ == '__main__':
+    unittest.main()
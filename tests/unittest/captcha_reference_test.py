@@ -0,0 +1,120 @@
+import unittest
+from unittest.mock import patch, MagicMock
+import sys
+import os
+import base64
+import tempfile
+
+import cv2
+import numpy as np
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.core.captcha import reference_drag, normalize_angle, estimate_angle_ring, reset_ring_layouts
+from src.core.captcha_reference import ReferenceLibrary, polar_signature
+from src.core.captcha_synthetic import SyntheticCaptcha
+from src.core.captcha_screenshot import ScreenshotStore
+from fixtures import make_picture, rotate_image
+
+class TestReferenceLibrary(unittest.TestCase):
+    def setUp(self):
+        self.log_patcher = patch('src.core.captcha_reference.Log')
+        self.log_patcher.start()
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = os.path.join(self.tmp.name, "screenshot")
+        os.makedirs(self.root)
+        self.cache = os.path.join(self.tmp.name, "data", "reference_library.npz")
+        for seed in range(4):
+            cv2.imwrite(os.path.join(self.root, f"2025_01_0{seed + 1}_debug_canvas_attempt_1success.png"),
+                        make_picture(seed))
+        cv2.imwrite(os.path.join(self.root, "2025_01_09_debug_canvas_attempt_1failed.png"), make_picture(9))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+        self.log_patcher.stop()
+
+    def test_match_recovers_rotation(self):
+        """测试相位相关可找回正确参考图与旋转角度"""
+        library = ReferenceLibrary(root=self.root, cache_path=self.cache).load()
+        self.assertEqual(len(library), 4)
+        target = library.names.index("2025_01_03_debug_canvas_attempt_1success.png")
+        for angle in (0, 25, -70, 140):
+            found, confidence, index = library.match(rotate_image(make_picture(2), angle))
+            self.assertEqual(index, target)
+            # rotate_image 逆时针为正，估计值是转回正立需要的角度
+            self.assertLess(abs(normalize_angle(found + angle)), 2.0)
+            self.assertGreater(confidence, 0.5)
+
+    def test_unknown_picture_low_confidence(self):
+        """测试图库中没有的图片置信度较低"""
+        library = ReferenceLibrary(root=self.root, cache_path=self.cache).load()
+        _, confidence, _ = library.match(make_picture(42))
+        self.assertLess(confidence, 0.5)
+
+    def test_imported_legacy_loaded_once(self):
+        """测试旧版截图迁入截图库且保留原文件时，参考图库中只出现一次"""
+        with patch('src.core.captcha_screenshot.Log'):
+            self.assertEqual(ScreenshotStore(self.root).import_legacy(), 5)
+        library = ReferenceLibrary(root=self.root, cache_path=self.cache).load()
+        self.assertEqual(len(library), 4)
+        self.assertEqual(len(set(library.names)), 4)
+
+    def test_incremental_cache(self):
+        """测试签名缓存增量复用，只解码新增截图"""
+        ReferenceLibrary(root=self.root, cache_path=self.cache).load()
+        self.assertTrue(os.path.exists(self.cache))
+        cv2.imwrite(os.path.join(self.root, "2025_01_05_debug_canvas_attempt_2success.png"), make_picture(5))
+        with patch('src.core.captcha_reference.cv2.imread', wraps=cv2.imread) as mock_read:
+            library = ReferenceLibrary(root=self.root, cache_path=self.cache).load()
+        self.assertEqual(mock_read.call_count, 1)
+        self.assertEqual(len(library), 5)
+
+    def test_sign_matches_other_estimators(self):
+        """测试同一旋转下参考图库、圆环估计与合成样本的真实角度符号一致"""
+        generator = SyntheticCaptcha(noise=0, jpeg_quality=None)
+        upright = generator.sample(0, angle=0, layout="disc").img
+        library = ReferenceLibrary(root=self.root, cache_path=self.cache)
+        library.names = ["upright"]
+        library.signatures = np.stack([polar_signature(upright)])
+        for rotation in (30, -45):
+            sample = generator.sample(0, angle=rotation, layout="disc")
+            reset_ring_layouts()
+            ring, _ = estimate_angle_ring(sample.img)
+            found, _, _ = library.match(sample.img)
+            self.assertLess(abs(normalize_angle(ring - sample.angle)), 3.0)
+            self.assertLess(abs(normalize_angle(found - sample.angle)), 3.0)
+
+    def test_reference_drag_converges(self):
+        """测试高置信度匹配时一次性拖动到位，只需极少的移动"""
+        library = ReferenceLibrary(root=self.root, cache_path=self.cache).load()
+        picture = make_picture(1)
+        state = {"moved": 0, "moves": 0}
+        gain = -1.2
+
+        def angle():
+            return normalize_angle(60 + gain * state["moved"])
+
+        def move(dx, dy):
+            state["moved"] += dx
+            state["moves"] += 1
+            return actions
+
+        def execute_script(script, *args):
+            if 'getBoundingClientRect' in script:
+                return 300
+            rgb = np.ascontiguousarray(rotate_image(picture, angle())[:, :, ::-1])
+            return [rgb.shape[1], rgb.shape[0], base64.b64encode(rgb.tobytes()).decode('ascii')]
+
+        actions = MagicMock()
+        actions.move_by_offset.side_effect = move
+        driver = MagicMock()
+        driver.execute_script.side_effect = execute_script
+        with patch('src.core.captcha.Log'), patch('src.core.captcha.time.sleep'):
+            moved = reference_drag(actions, driver, MagicMock(), '.track', '#c', library, tolerance=3)
+        self.assertEqual(moved, state["moved"])
+        self.assertLessEqual(abs(angle()), 3)
+        self.assertLessEqual(state["moves"], 4)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,208 @@
+import unittest
+from unittest.mock import patch
+import sys
+import os
+import time
+import tempfile
+import threading
+
+import cv2
+import numpy as np
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.core.captcha_screenshot import ScreenshotWriter, ScreenshotStore, RetentionPolicy, write_sidecar
+
+def make_frame(seed, size=32):
+    rng = np.random.default_rng(seed)
+    return (rng.random((size, size, 3)) * 255).astype(np.uint8)
+
+def shot_name(day, attempt):
+    return f"2025_01_{day:02d}_08_30_00_000000_debug_canvas_attempt_{attempt}"
+
+class TestScreenshotStore(unittest.TestCase):
+    def setUp(self):
+        self.log_patcher = patch('src.core.captcha_screenshot.Log')
+        self.log_patcher.start()
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+        self.log_patcher.stop()
+
+    def blob_files(self):
+        return [f for _, _, files in os.walk(os.path.join(self.tmp.name, "blobs")) for f in files]
+
+    def test_dedupe_and_query(self):
+        """测试相同内容共用一个文件，按日期、运行、结果查询，保存后可重新加载"""
+        store = ScreenshotStore(self.tmp.name)
+        a, b = make_frame(1), make_frame(2)
+        store.put(shot_name(1, 1), a, run="r1")
+        store.put(shot_name(1, 2), a, run="r1")
+        store.put(shot_name(2, 1), b, run="r2")
+        store.label(shot_name(1, 2), "success", {"moved": 12.0})
+        store.label(shot_name(2, 1), "failed")
+        store.save()
+
+        self.assertEqual(len(self.blob_files()), 2)
+        loaded = ScreenshotStore(self.tmp.name).load()
+        self.assertEqual([e["name"] for e in loaded.query(run="r1")], [shot_name(1, 1), shot_name(1, 2)])
+        self.assertEqual([e["name"] for e in loaded.query(date="2025-01-02")], [shot_name(2, 1)])
+        success = loaded.query(outcome="success")
+        self.assertEqual((len(success), success[0]["attempt"], success[0]["telemetry"]), (1, 2, {"moved": 12.0}))
+        np.testing.assert_array_equal(loaded.read(success[0]), a)
+
+    def test_png_format(self):
+        """测试 PNG 编码同样无损"""
+        store = ScreenshotStore(self.tmp.name, fmt="png", png_level=9)
+        entry = store.put(shot_name(1, 1), make_frame(3))
+        self.assertTrue(store.blob_path(entry).endswith(".png"))
+        np.testing.assert_array_equal(store.read(entry), make_frame(3))
+
+    def test_sweep_by_count_and_bytes(self):
+        """测试按条数与总大小从最旧的截图开始增量清理，共用的文件在最后一个引用删除后才删除"""
+        store = ScreenshotStore(self.tmp.name, policy=RetentionPolicy(max_age_days=None, max_count=3, max_bytes=None))
+        for i in range(5):
+            store.put(shot_name(1, i + 1), make_frame(i % 4), timestamp=1000 + i)
+        self.assertEqual(store.sweep(budget=1), 1)
+        self.assertEqual(store.sweep(), 1)
+        self.assertEqual(store.sweep(), 0)
+        self.assertEqual([e["attempt"] for e in store.query()], [3, 4, 5])
+        # 第 5 张与已删除的第 1 张内容相同，文件保留
+        self.assertEqual(len(self.blob_files()), 3)
+
+        store.policy = RetentionPolicy(max_age_days=None, max_count=None, max_bytes=store.total_bytes - 1)
+        self.assertEqual(store.sweep(), 1)
+        self.assertEqual(len(store), 2)
+
+    def test_sweep_by_age(self):
+        """测试超过保留天数的截图被清理"""
+        store = ScreenshotStore(self.tmp.name, policy=RetentionPolicy(max_age_days=7, max_count=None, max_bytes=None))
+        store.put(shot_name(1, 1), make_frame(1), timestamp=time.time() - 8 * 86400)
+        store.put(shot_name(1, 2), make_frame(2))
+        self.assertEqual(store.sweep(), 1)
+        self.assertEqual([e["attempt"] for e in store.query()], [2])
+        self.assertEqual(len(self.blob_files()), 1)
+
+    def test_import_legacy(self):
+        """测试旧版截图与遥测复制进截图库，原文件默认保留且不会重复迁移"""
+        path = os.path.join(self.tmp.name, shot_name(1, 2) + "success.png")
+        cv2.imwrite(path, make_frame(1))
+        write_sidecar(path, {"moved": 30.0})
+        cv2.imwrite(os.path.join(self.tmp.name, "other.png"), make_frame(2))
+
+        store = ScreenshotStore(self.tmp.name)
+        self.assertEqual(store.import_legacy(), 1)
+        entry = store.query(outcome="success")[0]
+        self.assertEqual((entry["name"], entry["attempt"], entry["telemetry"]["moved"]), (shot_name(1, 2), 2, 30.0))
+        self.assertTrue(os.path.exists(path))
+        self.assertEqual(ScreenshotStore(self.tmp.name).load().import_legacy(), 0)
+
+    def test_import_legacy_remove(self):
+        """测试开启 remove_legacy 时迁移后删除原文件与遥测"""
+        path = os.path.join(self.tmp.name, shot_name(1, 2) + "failed.png")
+        cv2.imwrite(path, make_frame(1))
+        write_sidecar(path, {"moved": 30.0})
+        cv2.imwrite(os.path.join(self.tmp.name, "other.png"), make_frame(2))
+
+        store = ScreenshotStore(self.tmp.name, policy=RetentionPolicy(remove_legacy=True))
+        self.assertEqual(store.import_legacy(), 1)
+        self.assertEqual(sorted(f for f in os.listdir(self.tmp.name) if not os.path.isdir(
+            os.path.join(self.tmp.name, f))), ["other.png", "store.json"])
+
+    def test_import_grace(self):
+        """测试迁入的旧截图按迁入时间计算保留期，首次清理不会删除"""
+        path = os.path.join(self.tmp.name, shot_name(1, 1) + "success.png")
+        cv2.imwrite(path, make_frame(1))
+        old = time.time() - 90 * 86400
+        os.utime(path, (old, old))
+
+        store = ScreenshotStore(self.tmp.name, policy=RetentionPolicy(max_age_days=30, max_count=1, max_bytes=None))
+        store.import_legacy()
+        store.put(shot_name(2, 1), make_frame(2), timestamp=time.time() - 86400)
+        self.assertEqual(store.sweep(), 1)
+        # 原时间更早的迁入条目仍在，较早写入的新截图先被清理
+        self.assertEqual([e["name"] for e in store.query()], [shot_name(1, 1)])
+        self.assertAlmostEqual(store.query()[0]["time"], old, places=0)
+
+    def test_save_merges_other_process(self):
+        """测试两个进程各自保存时合并索引，不丢失对方的条目，也不恢复已清理的条目"""
+        first = ScreenshotStore(self.tmp.name, policy=RetentionPolicy(max_age_days=None, max_count=1, max_bytes=None))
+        second = ScreenshotStore(self.tmp.name)
+        first.put(shot_name(1, 1), make_frame(1), timestamp=1000)
+        first.save()
+        second.load()
+        second.put(shot_name(2, 1), make_frame(2), timestamp=2000)
+        first.put(shot_name(3, 1), make_frame(3), timestamp=3000)
+        self.assertEqual(first.sweep(), 1)
+        second.save()
+        first.save()
+
+        loaded = ScreenshotStore(self.tmp.name).load()
+        self.assertEqual([e["name"] for e in loaded.query()], [shot_name(2, 1), shot_name(3, 1)])
+        self.assertEqual(sorted(b["refs"] for b in loaded.blobs.values()), [1, 1])
+        self.assertFalse(os.path.exists(loaded.index_path + ".lock"))
+
+    def test_stale_lock_taken_over(self):
+        """测试上次异常退出残留的锁文件超时后被接管"""
+        store = ScreenshotStore(self.tmp.name)
+        store.put(shot_name(1, 1), make_frame(1))
+        lock_path = store.index_path + ".lock"
+        open(lock_path, "w").close()
+        old = time.time() - 600
+        os.utime(lock_path, (old, old))
+        store.save()
+        self.assertEqual(len(ScreenshotStore(self.tmp.name).load()), 1)
+
+class TestScreenshotWriter(unittest.TestCase):
+    def setUp(self):
+        self.log_patcher = patch('src.core.captcha_screenshot.Log')
+        self.log_patcher.start()
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+        self.log_patcher.stop()
+
+    def test_write_and_label(self):
+        """测试后台写入截图，结果确定后标注结果与遥测并保存索引"""
+        writer = ScreenshotWriter(ScreenshotStore(self.tmp.name))
+        frame = make_frame(1)
+        self.assertTrue(writer.submit(shot_name(1, 1), frame, run="r1"))
+        writer.label(shot_name(1, 1), "success", {"attempt": 1})
+        writer.close()
+
+        store = ScreenshotStore(self.tmp.name).load()
+        entry = store.query(outcome="success", run="r1")[0]
+        np.testing.assert_array_equal(store.read(entry), frame)
+        self.assertEqual(entry["telemetry"], {"attempt": 1})
+        self.assertEqual(writer.written, 1)
+
+    def test_queue_full_drops(self):
+        """测试写入线程忙、队列已满时丢弃截图而不阻塞，丢弃的截图标注任务被忽略"""
+        store = ScreenshotStore(self.tmp.name)
+        writer = ScreenshotWriter(store, max_queue=1)
+        busy, release = threading.Event(), threading.Event()
+        real_put = store.put
+
+        def slow_put(*args, **kwargs):
+            busy.set()
+            release.wait(5)
+            return real_put(*args, **kwargs)
+
+        with patch.object(store, 'put', side_effect=slow_put):
+            self.assertTrue(writer.submit("first", make_frame(1)))
+            busy.wait(5)
+            self.assertTrue(writer.submit("second", make_frame(2)))
+            self.assertFalse(writer.submit("third", make_frame(3)))
+            release.set()
+            writer.flush()
+        writer.label("third", "failed")
+        writer.close()
+
+        self.assertEqual(writer.dropped, 1)
+        self.assertEqual(sorted(store.entries), ["first", "second"])
+
+if __name__ == '__main__':
+    unittest.main()
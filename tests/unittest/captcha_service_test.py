@@ -0,0 +1,106 @@
+import unittest
+from unittest.mock import patch, MagicMock
+import sys
+import os
+
+import numpy as np
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.core.captcha import CaptchaSolver, FrameStream, reset_ring_layouts
+from src.core import captcha_service
+from src.core.captcha_service import EstimatorService
+from fixtures import make_image, rotate_image
+
+class TestEstimatorService(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.log_patcher = patch('src.core.captcha_service.Log')
+        cls.log_patcher.start()
+        cls.service = EstimatorService(workers=1, slots=2, warm_shape=(120, 120, 3)).start(wait=True)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.service.close()
+        cls.log_patcher.stop()
+
+    def test_matches_inline_estimate(self):
+        """测试进程池的估计结果与本进程一致，非连续视图同样可以传递"""
+        with patch('src.core.captcha.Log'):
+            for i, angle in enumerate((25, -60)):
+                # 与原始像素取图相同的负步长视图
+                img = np.ascontiguousarray(rotate_image(make_image(seed=i), angle)[:, :, ::-1])[:, :, ::-1]
+                reset_ring_layouts()
+                expected = CaptchaSolver().estimate(img)
+                self.assertAlmostEqual(self.service.estimate(img), expected, places=3)
+
+    def test_backpressure_and_metrics(self):
+        """测试缓冲区全部在估计中时拒绝提交，完成后计入延迟统计"""
+        img = make_image(seed=3)
+        futures = [self.service.submit(img) for _ in range(3)]
+        self.assertIsNone(futures[2])
+        for future in futures[:2]:
+            future.result(timeout=10)
+        metrics = self.service.metrics()
+        self.assertEqual(metrics["depth"], 0)
+        self.assertGreaterEqual(metrics["max_depth"], 2)
+        self.assertGreaterEqual(metrics["rejected"], 1)
+        self.assertGreater(metrics["latency_p50_ms"], 0)
+        self.assertLessEqual(metrics["compute_p50_ms"], metrics["latency_p95_ms"])
+
+    def test_frame_stream_uses_service(self):
+        """测试画面流把画面交给估计服务，submit 立即返回"""
+        img = rotate_image(make_image(seed=4), 40)
+        estimator = MagicMock(return_value=0.0)
+        with patch('src.core.captcha.Log'), patch('src.core.captcha.get_image', return_value=img):
+            stream = FrameStream(MagicMock(), '#c', estimator=estimator, service=self.service)
+            pending = stream.submit()
+            angle = pending()
+        self.assertIsNotNone(angle)
+        estimator.assert_not_called()
+        self.assertEqual((stream.captured, stream.analysed), (1, 1))
+
+class TestWorkerState(unittest.TestCase):
+    def setUp(self):
+        self.patchers = [patch.object(captcha_service, '_worker_solver', MagicMock(**{"estimate.return_value": 1.0})),
+                         patch.object(captcha_service, '_worker_segments', {}),
+                         patch.object(captcha_service, '_worker_generation', 0)]
+        for patcher in self.patchers:
+            patcher.start()
+        self.slots = [captcha_service.FrameSlot() for _ in range(2)]
+
+    def tearDown(self):
+        for patcher in reversed(self.patchers):
+            patcher.stop()
+        for segment in list(captcha_service._worker_segments.values()):
+            segment.close()
+        for slot in self.slots:
+            slot.release()
+
+    def estimate(self, slot, img, generation):
+        name = slot.write(img)
+        live = tuple(s.segment.name for s in self.slots if s.segment is not None)
+        return captcha_service._estimate_in_worker(name, img.shape, img.dtype.str, generation, live)
+
+    def test_reset_once_per_generation(self):
+        """测试验证码代数变化时工作进程清除接缝半径，同一代内只清除一次"""
+        img = make_image(seed=1)
+        with patch('src.core.captcha.reset_ring_layouts') as reset:
+            self.estimate(self.slots[0], img, 0)
+            self.assertEqual(reset.call_count, 0)
+            self.estimate(self.slots[0], img, 1)
+            self.estimate(self.slots[1], img, 1)
+            self.assertEqual(reset.call_count, 1)
+
+    def test_stale_segments_closed(self):
+        """测试缓冲区重新分配后，工作进程关闭旧共享内存的映射"""
+        small, large = make_image(40, 40), make_image(80, 80)
+        self.estimate(self.slots[0], small, 0)
+        old = self.slots[0].segment.name
+        self.estimate(self.slots[0], large, 0)
+        self.assertNotIn(old, captcha_service._worker_segments)
+        self.assertEqual(list(captcha_service._worker_segments), [self.slots[0].segment.name])
+
+if __name__ == '__main__':
+    unittest.main()
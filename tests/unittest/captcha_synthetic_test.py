@@ -0,0 +1,59 @@
+import unittest
+import sys
+import os
+import tempfile
+
+import cv2
+import numpy as np
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.core.captcha import estimate_angle_ring, reset_ring_layouts
+from src.core.captcha_synthetic import SyntheticCaptcha, load_seeds, angle_error
+
+class TestSyntheticCaptcha(unittest.TestCase):
+    def test_deterministic(self):
+        """测试同一 (seed, index) 生成同一画面，不同序号画面不同"""
+        gen = SyntheticCaptcha(procedural=4, size=160)
+        a, b = gen.sample(3, seed=7), gen.sample(3, seed=7)
+        np.testing.assert_array_equal(a.img, b.img)
+        self.assertEqual((a.angle, a.layout), (b.angle, b.layout))
+        self.assertFalse(np.array_equal(a.img, gen.sample(4, seed=7).img))
+        self.assertEqual(a.img.shape, (160, 160, 3))
+
+    def test_angle_convention(self):
+        """测试真实角度与估计器同一约定：内圆盘逆时针转 a 时估计值为 -a"""
+        gen = SyntheticCaptcha(size=280, noise=0, jpeg_quality=None)
+        for index, angle in enumerate((35, -120, 200)):
+            reset_ring_layouts()
+            sample = gen.sample(index, angle=angle, layout="disc")
+            estimated, confidence = estimate_angle_ring(sample.img)
+            self.assertLess(angle_error(estimated, sample.angle), 2)
+            self.assertLess(angle_error(sample.angle, -angle), 1e-9)
+
+    def test_corners_are_background(self):
+        """测试画布裁成圆形，四角为背景色"""
+        sample = SyntheticCaptcha(size=120, noise=0, jpeg_quality=None).sample(0)
+        np.testing.assert_array_equal(sample.img[0, 0], SyntheticCaptcha.BACKGROUND)
+
+    def test_angle_error_period(self):
+        """测试误差按估计器周期折算"""
+        self.assertAlmostEqual(angle_error(170, -175), 15)
+        self.assertAlmostEqual(angle_error(-85, 90, period=180), 5)
+        self.assertIsNone(angle_error(None, 10))
+
+    def test_load_seeds_center_crop(self):
+        """测试种子图片中心裁剪为正方形并缩放，无法读取的文件跳过"""
+        img = np.zeros((100, 200, 3), dtype=np.uint8)
+        img[:, 50:150] = 255
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "seed.png")
+            cv2.imwrite(path, img)
+            seeds = load_seeds([path, os.path.join(tmp, "missing.png")], size=64)
+        self.assertEqual(len(seeds), 1)
+        self.assertEqual(seeds[0].shape, (64, 64, 3))
+        self.assertTrue((seeds[0] == 255).all())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,477 @@
+import unittest
+from unittest.mock import patch, MagicMock
+import sys
+import os
+import base64
+import types
+import tracemalloc
+
+import cv2
+import numpy as np
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.core import captcha
+from src.core.captcha import RotationEngine, FrameAnalysis, estimate_angle, estimate_angle_normal, \
+    estimate_angle_pca, estimate_angle_hough, correct_angle_with_semantics, raw_to_cv2, dataurl_to_cv2, get_image, \
+    FrameStream, dynamic_adjust_drag, normalize_angle, CaptchaSolver, estimate_angle_ring, detect_ring, \
+    AngleEnsemble, AngleEstimator, reset_ring_layouts, AngleEstimate, Selectors, RefreshStats, refresh_low_confidence, \
+    last_frame
+from fixtures import make_image, rotate_image
+
+def legacy_scores(gray, step=10):
+    scores = []
+    for a in range(0, 360, step):
+        M = cv2.getRotationMatrix2D((gray.shape[1] / 2, gray.shape[0] / 2), a, 1.0)
+        rot = cv2.warpAffine(gray, M, (gray.shape[1], gray.shape[0]), flags=cv2.INTER_LINEAR,
+                             borderMode=cv2.BORDER_REPLICATE)
+        scores.append(cv2.Laplacian(rot, cv2.CV_64F).var())
+    return np.array(scores)
+
+class TestRotationEngine(unittest.TestCase):
+    def test_scores_match_warp_affine(self):
+        """测试批量得分与逐角度 warpAffine + Laplacian 的结果一致"""
+        gray = cv2.cvtColor(make_image(), cv2.COLOR_BGR2GRAY)
+        engine = RotationEngine()
+        scores = engine.scores(gray, engine.angles())
+        expected = legacy_scores(gray)
+        np.testing.assert_allclose(scores, expected, rtol=1e-2)
+        self.assertEqual(int(np.argmax(scores)), int(np.argmax(expected)))
+
+    def test_rotate_all_shape(self):
+        """测试批量旋转输出的形状和 0° 原图"""
+        gray = cv2.cvtColor(make_image(90, 130), cv2.COLOR_BGR2GRAY)
+        engine = RotationEngine(step=30)
+        rot = engine.rotate_all(gray, engine.angles())
+        self.assertEqual(rot.shape, (12, 90, 130))
+        np.testing.assert_array_equal(rot[0], gray)
+
+    def test_maps_are_cached(self):
+        """测试相同尺寸与角度集合复用缓存网格，超过上限时淘汰最旧项"""
+        engine = RotationEngine(max_cache=2)
+        angles = engine.angles()
+        maps = engine.get_maps((60, 60), angles)
+        self.assertIs(engine.get_maps((60, 60), angles), maps)
+        engine.get_maps((60, 80), angles)
+        engine.get_maps((80, 80), angles)
+        self.assertEqual(len(engine._cache), 2)
+        self.assertIsNot(engine.get_maps((60, 60), angles), maps)
+
+    def test_configurable_resolution(self):
+        """测试角度分辨率可配置"""
+        engine = RotationEngine(step=5)
+        self.assertEqual(len(engine.angles()), 72)
+        self.assertEqual(len(engine.angles(step=45)), 8)
+        angle, confidence = estimate_angle_normal(make_image(), step=45)
+        self.assertGreaterEqual(confidence, 0)
+        self.assertIn(angle, [float(a) for a in range(0, 360, 45)])
+
+    def test_search_sub_degree(self):
+        """测试多分辨率搜索能找到网格之间的最优角度，并精确到亚度级"""
+        engine = RotationEngine()
+        dist = lambda a, c: (np.asarray(a) - c + 180) % 360 - 180
+        peak = lambda a: np.exp(-dist(a, 37.3) ** 2 / 800) + 0.6 * np.exp(-dist(a, 210) ** 2 / 800)
+        with patch.object(engine, 'scores', side_effect=lambda gray, angles, *args: peak(angles)), \
+                patch.object(engine, 'score_one', side_effect=lambda gray, a, *args: float(peak(a))):
+            self.assertAlmostEqual(engine.search(np.zeros((128, 128), np.uint8)), 37.3, delta=0.2)
+            self.assertEqual(engine.best_angle(np.zeros((128, 128), np.uint8)), 40.0)
+
+    def test_search_matches_grid_cheaper(self):
+        """测试真实锐度得分下搜索结果不差于网格，且开销明显少于 36 次原图旋转"""
+        gray = cv2.cvtColor(make_image(160, 160, seed=3), cv2.COLOR_BGR2GRAY)
+        engine = RotationEngine()
+        grid = engine.best_angle(gray)
+        angle = engine.search(gray)
+        self.assertGreaterEqual(engine.score_one(gray, angle), engine.score_one(gray, grid) * 0.999)
+        self.assertLess(engine.last_cost, len(engine.angles()) * 0.75)
+
+def make_bar_image(h=120, w=120):
+    img = np.full((h, w, 3), 200, dtype=np.uint8)
+    cv2.rectangle(img, (20, 50), (100, 70), (30, 30, 30), -1)
+    return img
+
+class TestFrameAnalysis(unittest.TestCase):
+    def test_shared_preprocessing(self):
+        """测试完整估计只做一次灰度转换和一次边缘检测"""
+        img = make_bar_image()
+        with patch('src.core.captcha.cv2.cvtColor', wraps=cv2.cvtColor) as mock_cvt, \
+                patch('src.core.captcha.cv2.Canny', wraps=cv2.Canny) as mock_canny, \
+                patch.object(captcha, 'Log'):
+            frame = FrameAnalysis(img)
+            estimate_angle(frame)
+            estimate_angle_hough(frame)
+            estimate_angle_normal(frame)
+        self.assertEqual(mock_cvt.call_count, 1)
+        self.assertEqual(mock_canny.call_count, 1)
+
+    def test_estimators_accept_raw_image(self):
+        """测试估计器仍可直接传入 BGR 图像，结果与共享上下文一致"""
+        img = make_bar_image()
+        frame = FrameAnalysis(img)
+        self.assertAlmostEqual(estimate_angle_pca(img), estimate_angle_pca(frame))
+        self.assertEqual(correct_angle_with_semantics(img, 10), correct_angle_with_semantics(frame, 10))
+        top, bottom = frame.half_brightness
+        inside = frame.mask > 0
+        self.assertAlmostEqual(top, frame.gray[:60][inside[:60]].mean())
+        self.assertAlmostEqual(bottom, frame.gray[60:][inside[60:]].mean())
+
+    def test_working_resolution(self):
+        """测试大画面按面积插值缩小到工作分辨率，角度与原图一致"""
+        img = cv2.resize(make_bar_image(), (480, 480), interpolation=cv2.INTER_NEAREST)
+        frame = FrameAnalysis(img)
+        self.assertEqual(frame.gray.shape, (128, 128))
+        self.assertAlmostEqual(frame.scale, 128 / 480)
+        full = FrameAnalysis(img, work_size=0, mask_ratio=0)
+        self.assertEqual(full.gray.shape, (480, 480))
+        self.assertAlmostEqual(abs(estimate_angle_pca(frame)[0]) % 180, abs(estimate_angle_pca(full)[0]) % 180, delta=2)
+
+    def test_circular_mask_excludes_corners(self):
+        """测试圆形 ROI 排除方形四角的边缘，遮罩按尺寸缓存"""
+        img = np.full((120, 120, 3), 200, dtype=np.uint8)
+        cv2.line(img, (0, 10), (40, 0), (0, 0, 0), 2)
+        self.assertEqual(int(np.count_nonzero(FrameAnalysis(img).edges)), 0)
+        self.assertGreater(int(np.count_nonzero(FrameAnalysis(img, mask_ratio=0).edges)), 0)
+        self.assertIs(FrameAnalysis(img).mask, FrameAnalysis(img).mask)
+
+def to_raw_view(img):
+    # 与原始像素取图相同的负步长 BGR 视图
+    rgb = np.ascontiguousarray(img[:, :, ::-1])
+    return raw_to_cv2([img.shape[1], img.shape[0], base64.b64encode(rgb.tobytes()).decode('ascii')])
+
+class TestCaptchaSolver(unittest.TestCase):
+    def test_moments_match_eigen_pca(self):
+        """测试由二阶矩得到的主方向与协方差特征向量一致（180° 周期）"""
+        for angle in (0, 25, -60, 110):
+            frame = FrameAnalysis(rotate_image(make_bar_image(), angle))
+            ys, xs = np.nonzero(frame.edges)
+            vals, vecs = np.linalg.eigh(np.cov(np.vstack([xs, ys]).astype(np.float64)))
+            expected = np.degrees(np.arctan2(vecs[1, -1], vecs[0, -1]))
+            angle, confidence = estimate_angle_pca(frame)
+            diff = (angle - expected) % 180
+            self.assertLess(min(diff, 180 - diff), 0.5)
+            # 置信度即特征值比 (λ1 - λ2) / (λ1 + λ2)
+            self.assertAlmostEqual(confidence, (vals[1] - vals[0]) / (vals[1] + vals[0]), places=2)
+
+    def test_buffers_reused(self):
+        """测试同尺寸画面复用灰度与边缘缓冲区，结果与独立分析一致"""
+        solver = CaptchaSolver()
+        img = make_bar_image(280, 280)
+        first = solver.frame(img)
+        gray, edges = first.gray, first.edges
+        second = solver.frame(to_raw_view(rotate_image(img, 30)))
+        self.assertIs(second.gray, gray)
+        self.assertIs(second.edges, edges)
+        np.testing.assert_array_equal(second.edges, FrameAnalysis(rotate_image(img, 30)).edges)
+
+    def test_no_per_frame_allocations(self):
+        """测试预热后连续帧的估计几乎不再分配内存"""
+        frames = [to_raw_view(rotate_image(make_image(280, 280, seed=i), 20 * i)) for i in range(6)]
+        solver = CaptchaSolver()
+        quiet = types.SimpleNamespace(info=lambda *a: None, waring=lambda *a: None, error=lambda *a: None)
+
+        # 其他用例可能留下同尺寸的接缝半径缓存，预热前清空，保证每次运行走同一路径
+        reset_ring_layouts()
+
+        def traced_peak(estimate):
+            for img in frames:
+                estimate(img)
+            tracemalloc.start()
+            try:
+                base = tracemalloc.get_traced_memory()[0]
+                for img in frames:
+                    estimate(img)
+                return tracemalloc.get_traced_memory()[1] - base
+            finally:
+                tracemalloc.stop()
+
+        with patch.object(captcha, 'Log', quiet):
+            self.assertLess(traced_peak(solver.estimate), 16 * 1024)
+            self.assertGreater(traced_peak(estimate_angle), 100 * 1024)
+
+def make_disc(angle, size=280, ratio=0.6, seed=0):
+    # 外圈图片不动，内圆盘旋转 angle（cv2 约定，逆时针为正）；底图用大尺度模糊噪声模拟照片
+    rng = np.random.default_rng(seed)
+    gray = cv2.GaussianBlur((rng.random((size, size)) * 255).astype(np.uint8), (0, 0), 4)
+    img = cv2.cvtColor(cv2.normalize(gray, None, 0, 255, cv2.NORM_MINMAX), cv2.COLOR_GRAY2BGR)
+    mask = np.zeros((size, size), dtype=np.uint8)
+    cv2.circle(mask, (size // 2, size // 2), int(size / 2 * ratio), 255, -1)
+    disc = img.copy()
+    disc[mask > 0] = rotate_image(img, angle)[mask > 0]
+    return disc
+
+class TestRingEstimator(unittest.TestCase):
+    def setUp(self):
+        captcha._ring_layouts.clear()
+
+    def test_ring_recovers_disc_rotation(self):
+        """测试圆环互相关恢复内圆盘相对外圈的旋转角度，置信度高"""
+        for angle in (30, -75, 140):
+            estimated, confidence = estimate_angle_ring(make_disc(angle, seed=1))
+            self.assertLess(abs(normalize_angle(estimated + angle)), 2)
+            self.assertGreater(confidence, 0.6)
+
+    def test_plain_image_has_no_ring(self):
+        """测试没有内外圆盘接缝的画面不走圆环估计"""
+        img = rotate_image(make_disc(0, size=260, seed=2), 40)
+        self.assertIsNone(detect_ring(img))
+        self.assertEqual(estimate_angle_ring(img), (None, 0.0))
+
+    def test_layout_cached_per_shape(self):
+        """测试接近对齐、接缝变弱时沿用同尺寸画布已检测到的接缝半径"""
+        radius = detect_ring(make_disc(60, size=240, seed=3))
+        self.assertIsNotNone(radius)
+        self.assertEqual(detect_ring(make_disc(0, size=240, seed=3)), radius)
+
+    def test_cached_layout_rechecked(self):
+        """测试整图旋转或换图后不沿用缓存的接缝半径，不会以高置信度返回约 0°"""
+        self.assertIsNotNone(detect_ring(make_disc(60, size=240, seed=3)))
+        for angle in (25, 90, -130):
+            img = rotate_image(make_disc(0, size=240, seed=3), angle)
+            self.assertIsNone(detect_ring(img))
+            self.assertEqual(estimate_angle_ring(img), (None, 0.0))
+        self.assertIsNone(detect_ring(make_disc(0, size=240, seed=5)))
+
+    def test_estimate_angle_selects_ring(self):
+        """测试圆盘布局自动选用圆环估计，跳过全局估计链"""
+        ensemble = AngleEnsemble()
+        with patch.object(captcha, 'Log'):
+            angle = estimate_angle(make_disc(-50, size=300, seed=4), ensemble)
+        self.assertEqual(ensemble.stats["ring"].hits, 1)
+        self.assertEqual(ensemble.stats["pca"].calls, 0)
+        self.assertLess(abs(normalize_angle(angle - 50)), 2)
+
+class TestAngleEnsemble(unittest.TestCase):
+    def setUp(self):
+        self.log_patcher = patch('src.core.captcha.Log')
+        self.log_patcher.start()
+
+    def tearDown(self):
+        self.log_patcher.stop()
+
+    def make_ensemble(self, results, **kwargs):
+        self.calls = []
+
+        def estimator(name, result):
+            def func(frame):
+                self.calls.append(name)
+                return result
+            return AngleEstimator(name, func, 0.5)
+        return AngleEnsemble([estimator(f"e{i}", r) for i, r in enumerate(results)], **kwargs)
+
+    def test_pca_confidence_isotropic(self):
+        """测试边缘点各向同性时 PCA 置信度低，估计交给后续估计器"""
+        self.assertGreater(estimate_angle_pca(make_bar_image())[1], 0.5)
+        self.assertLess(estimate_angle_pca(make_image(160, 160))[1], 0.2)
+
+    def test_early_exit(self):
+        """测试第一个置信度达标的结果直接采用，后续估计器不再运行"""
+        ensemble = self.make_ensemble([(None, 0.0), (10.0, 0.3), (20.0, 0.8), (30.0, 0.9)])
+        result = ensemble.estimate(make_bar_image())
+        self.assertEqual((result.angle, result.source), (20.0, "e2"))
+        self.assertEqual(self.calls, ["e0", "e1", "e2"])
+        self.assertEqual((ensemble.stats["e0"].misses, ensemble.stats["e2"].hits), (1, 1))
+        self.assertEqual(ensemble.stats["e3"].calls, 0)
+
+    def test_weighted_combination(self):
+        """测试都不达标时按置信度做 180° 周期的加权平均"""
+        ensemble = self.make_ensemble([(-80.0, 0.3), (88.0, 0.1)])
+        result = ensemble.estimate(make_bar_image())
+        self.assertEqual(result.source, "weighted")
+        # 两倍角向量平均：-80° 与 88° 相差 12°（180° 周期），结果偏向置信度高的 -80°
+        self.assertAlmostEqual(result.angle, -83, delta=0.5)
+
+    def test_parallel_matches_sequential(self):
+        """测试并发模式运行全部估计器，选取规则与顺序模式一致"""
+        results = [(10.0, 0.3), (20.0, 0.8), (30.0, 0.9)]
+        ensemble = self.make_ensemble(results, parallel=True)
+        try:
+            result = ensemble.estimate(make_bar_image())
+        finally:
+            ensemble.close()
+        self.assertEqual((result.angle, result.source), (20.0, "e1"))
+        self.assertEqual(sorted(self.calls), ["e0", "e1", "e2"])
+        self.assertIn("命中率", ensemble.summary())
+
+    def test_default_ensemble_parallel(self):
+        """测试默认估计器在线程池中并发运行时结果与顺序运行相同"""
+        img = rotate_image(make_bar_image(160, 160), 30)
+        sequential = estimate_angle(img, AngleEnsemble())
+        ensemble = AngleEnsemble(parallel=True)
+        try:
+            self.assertAlmostEqual(estimate_angle(img, ensemble), sequential)
+        finally:
+            ensemble.close()
+
+class TestRawCapture(unittest.TestCase):
+    def setUp(self):
+        self.log_patcher = patch('src.core.captcha.Log')
+        self.log_patcher.start()
+        self.img = make_bar_image(40, 64)
+        rgb = np.ascontiguousarray(self.img[:, :, ::-1])
+        self.raw = [64, 40, base64.b64encode(rgb.tobytes()).decode('ascii')]
+        ok, png = cv2.imencode('.png', self.img)
+        self.dataurl = "data:image/png;base64," + base64.b64encode(png.tobytes()).decode('ascii')
+
+    def tearDown(self):
+        self.log_patcher.stop()
+
+    def test_raw_to_cv2(self):
+        """测试原始像素直接映射为 BGR 视图，与 dataURL 解码结果一致"""
+        img = raw_to_cv2(self.raw)
+        np.testing.assert_array_equal(img, self.img)
+        np.testing.assert_array_equal(img, dataurl_to_cv2(self.dataurl))
+
+    def test_get_image_prefers_raw(self):
+        """测试优先使用原始像素取图"""
+        driver = MagicMock()
+        driver.execute_script.return_value = self.raw
+        np.testing.assert_array_equal(get_image(driver, '#c'), self.img)
+        self.assertEqual(driver.execute_script.call_count, 1)
+
+    def test_get_image_keeps_last_frame(self):
+        """测试最近取到的画面可供调试截图复用"""
+        driver = MagicMock()
+        driver.execute_script.return_value = self.raw
+        img = get_image(driver, '#c')
+        self.assertIs(last_frame(), img)
+
+    def test_get_image_falls_back_to_dataurl(self):
+        """测试原始像素不可用（如画布被污染）时回退到 dataURL"""
+        driver = MagicMock()
+        driver.execute_script.side_effect = [None, self.dataurl]
+        np.testing.assert_array_equal(get_image(driver, '#c'), self.img)
+        self.assertEqual(driver.execute_script.call_count, 2)
+
+class FakeCaptcha:
+    """模拟验证码页面：滑块每移动 1px 图片旋转 gain 度，画面内容随位置变化"""
+    def __init__(self, start_angle=40.0, gain=-1.0, track_width=300):
+        self.start_angle = start_angle
+        self.gain = gain
+        self.track_width = track_width
+        self.moved = 0
+        self.moves = []
+        self.actions = MagicMock()
+        self.actions.move_by_offset.side_effect = self._move
+        self.driver = MagicMock()
+        self.driver.execute_script.side_effect = self._execute_script
+
+    @property
+    def angle(self):
+        return normalize_angle(self.start_angle + self.gain * self.moved)
+
+    def _move(self, dx, dy):
+        self.moved += dx
+        self.moves.append(dx)
+        return self.actions
+
+    def _execute_script(self, script, *args):
+        if 'getBoundingClientRect' in script:
+            return self.track_width
+        rgb = np.full((4, 4, 3), self.moved % 256, dtype=np.uint8)
+        return [4, 4, base64.b64encode(rgb.tobytes()).decode('ascii')]
+
+    def estimator(self, img):
+        return self.angle
+
+class TestFrameStream(unittest.TestCase):
+    def setUp(self):
+        self.log_patcher = patch('src.core.captcha.Log')
+        self.log_patcher.start()
+
+    def tearDown(self):
+        self.log_patcher.stop()
+
+    def test_unchanged_frame_not_reanalysed(self):
+        """测试画面未变化时不重复估计"""
+        fake = FakeCaptcha()
+        estimator = MagicMock(side_effect=fake.estimator)
+        stream = FrameStream(fake.driver, '#c', estimator=estimator)
+        self.assertEqual(stream.capture(), 40.0)
+        self.assertEqual(stream.capture(), 40.0)
+        self.assertEqual(estimator.call_count, 1)
+        fake.moved = 5
+        self.assertEqual(stream.capture(), 35.0)
+        self.assertEqual((stream.captured, stream.analysed), (3, 2))
+
+    def test_drag_estimates_each_frame_once(self):
+        """测试拖动循环每一步只取图、估计一次"""
+        fake = FakeCaptcha(start_angle=40.0, gain=-1.0)
+        with patch('src.core.captcha.estimate_angle', side_effect=fake.estimator) as mock_estimate, \
+                patch('src.core.captcha.time.sleep'):
+            moved = dynamic_adjust_drag(fake.actions, fake.driver, MagicMock(), '.track', '#c',
+                                        max_steps=50, tolerance=3)
+        self.assertLessEqual(abs(fake.angle), 3)
+        self.assertEqual(moved, fake.moved)
+        self.assertEqual(mock_estimate.call_count, len(fake.moves) + 1)
+
+class FakeRefreshPage:
+    """模拟带换图按钮的验证码页面：每次点击换图后画布换成下一张"""
+    def __init__(self, button=True):
+        self.button = button
+        self.clicks = 0
+        self.driver = MagicMock()
+        self.driver.execute_script.side_effect = self._execute_script
+
+    def image(self, index):
+        return np.full((4, 4, 3), index, dtype=np.uint8)
+
+    def _execute_script(self, script, *args):
+        if 'click()' in script:
+            if self.button:
+                self.clicks += 1
+            return self.button
+        rgb = self.image(self.clicks)
+        return [4, 4, base64.b64encode(rgb.tobytes()).decode('ascii')]
+
+class TestCaptchaRefresh(unittest.TestCase):
+    def setUp(self):
+        self.log_patcher = patch('src.core.captcha.Log')
+        self.log_patcher.start()
+        self.sleep_patcher = patch('src.core.captcha.time.sleep')
+        self.sleep_patcher.start()
+        self.selectors = Selectors(canvas='#c', slider='.s', track='.t', refresh='.r')
+
+    def tearDown(self):
+        self.sleep_patcher.stop()
+        self.log_patcher.stop()
+
+    def assess(self, page, confidences, **kwargs):
+        # 第 i 张画面的估计置信度为 confidences[i]
+        ensemble = MagicMock()
+        ensemble.estimate.side_effect = lambda frame: AngleEstimate(10.0, confidences[int(frame.img[0, 0, 0])], "pca")
+        stats = RefreshStats()
+        with patch('src.core.captcha._angle_ensemble', ensemble):
+            img = refresh_low_confidence(page.driver, self.selectors, page.image(0), stats, 0.5, **kwargs)
+        return int(img[0, 0, 0]), stats, ensemble
+
+    def test_refresh_until_confident(self):
+        """测试置信度不足时换图，直到画面可靠"""
+        page = FakeRefreshPage()
+        index, stats, ensemble = self.assess(page, [0.1, 0.2, 0.9, 0.9])
+        self.assertEqual((index, stats.refreshes, page.clicks), (2, 2, 2))
+        self.assertEqual(ensemble.estimate.call_count, 3)
+        self.assertFalse(stats.disabled)
+
+    def test_refresh_cap(self):
+        """测试换图次数达到上限后照常使用当前画面"""
+        page = FakeRefreshPage()
+        index, stats, _ = self.assess(page, [0.1] * 5, max_refreshes=2)
+        self.assertEqual((index, stats.refreshes), (2, 2))
+
+    def test_refresh_unavailable(self):
+        """测试找不到换图按钮时保留原画面，且本次运行不再换图"""
+        page = FakeRefreshPage(button=False)
+        index, stats, _ = self.assess(page, [0.1])
+        self.assertEqual((index, stats.refreshes), (0, 0))
+        self.assertTrue(stats.disabled)
+
+    def test_seconds_saved(self):
+        """测试按实际尝试耗时估算节省的时间"""
+        stats = RefreshStats(refreshes=2, refresh_seconds=1.0)
+        self.assertEqual(stats.seconds_saved(), 2 * stats.attempt_cost() - 1.0)
+        stats.attempt_seconds = [5.0, 7.0]
+        self.assertEqual(stats.seconds_saved(), 11.0)
+
+if __name__ == '__main__':
+    unittest.main()
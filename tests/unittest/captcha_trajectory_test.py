@@ -0,0 +1,145 @@
+import unittest
+from unittest.mock import patch, MagicMock
+import sys
+import os
+import base64
+import random
+
+import numpy as np
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from selenium.webdriver.remote.command import Command
+
+from src.core.captcha import dynamic_adjust_drag, planned_drag, plan_chunks, normalize_angle
+from src.core.captcha_calibration import SliderCalibration
+from src.core.captcha_trajectory import plan_path, TrajectoryActions
+
+class TestPlanPath(unittest.TestCase):
+    def test_path_sums_to_offset(self):
+        """测试各段位移之和严格等于目标位移，时长为正"""
+        rng = random.Random(0)
+        for dx, dy in [(0, 0), (1, 0), (-7, 2), (63, -1), (240, 0)]:
+            path = plan_path(dx, dy, rng=rng)
+            self.assertEqual(sum(p[0] for p in path), dx)
+            self.assertEqual(sum(p[1] for p in path), dy)
+            self.assertTrue(all(p[2] >= 1 for p in path))
+            self.assertLessEqual(len(path), 10)
+
+    def test_bell_shaped_velocity(self):
+        """测试速度中间快、两端慢"""
+        path = plan_path(150, rng=random.Random(1))
+        speeds = [abs(p[0]) for p in path]
+        self.assertGreater(max(speeds[2:-2]), speeds[0])
+        self.assertGreater(max(speeds[2:-2]), speeds[-1])
+
+class TestTrajectoryActions(unittest.TestCase):
+    def test_single_payload_per_perform(self):
+        """测试按下与第一段轨迹合并为一次请求，整段轨迹一次提交"""
+        driver = MagicMock()
+        actions = TrajectoryActions(driver, rng=random.Random(2))
+        actions.click_and_hold(MagicMock()).perform()
+        driver.execute.assert_not_called()
+        actions.move_by_offset(80, 1).perform()
+        self.assertEqual(driver.execute.call_count, 1)
+        command, payload = driver.execute.call_args[0]
+        self.assertEqual(command, Command.W3C_ACTIONS)
+        steps = payload["actions"][0]["actions"]
+        self.assertEqual(steps[1]["type"], "pointerDown")
+        moves = [a for a in steps[2:] if a["type"] == "pointerMove"]
+        self.assertGreater(len(moves), 1)
+        self.assertEqual(sum(a["x"] for a in moves), 80)
+
+        actions.pause(0.1).release().perform()
+        self.assertEqual(driver.execute.call_count, 2)
+        self.assertEqual(actions.payloads, 2)
+        self.assertEqual(driver.execute.call_args[0][1]["actions"][0]["actions"][-1]["type"], "pointerUp")
+
+    def test_drag_request_count(self):
+        """测试拖动流程中每步只发送一次动作请求"""
+        state = {"moved": 0}
+
+        def execute(command, payload):
+            for action in payload["actions"][0]["actions"]:
+                if action["type"] == "pointerMove" and action.get("origin") == "pointer":
+                    state["moved"] += action["x"]
+
+        def execute_script(script, *args):
+            if 'getBoundingClientRect' in script:
+                return 300
+            rgb = np.full((4, 4, 3), state["moved"] % 256, dtype=np.uint8)
+            return [4, 4, base64.b64encode(rgb.tobytes()).decode('ascii')]
+
+        driver = MagicMock()
+        driver.execute.side_effect = execute
+        driver.execute_script.side_effect = execute_script
+        estimator = lambda img: normalize_angle(70 - 1.25 * state["moved"])
+        actions = TrajectoryActions(driver, rng=random.Random(3))
+        with patch('src.core.captcha.Log'), patch('src.core.captcha.time.sleep'):
+            dynamic_adjust_drag(actions, driver, MagicMock(), '.track', '#c', max_steps=50, tolerance=3,
+                                estimator=estimator, controller="secant")
+        self.assertLessEqual(abs(estimator(None)), 3)
+        self.assertEqual(actions.payloads, driver.execute.call_count)
+        self.assertLessEqual(actions.payloads, 4)
+        self.assertGreater(actions.segments, actions.payloads)
+
+class TestPlannedDrag(unittest.TestCase):
+    def setUp(self):
+        self.state = {"moved": 0}
+
+    def make_driver(self):
+        state = self.state
+
+        def execute(command, payload):
+            for action in payload["actions"][0]["actions"]:
+                if action["type"] == "pointerMove" and action.get("origin") == "pointer":
+                    state["moved"] += action["x"]
+
+        def execute_script(script, *args):
+            if 'getBoundingClientRect' in script:
+                return 300
+            rgb = np.full((4, 4, 3), state["moved"] % 256, dtype=np.uint8)
+            return [4, 4, base64.b64encode(rgb.tobytes()).decode('ascii')]
+
+        driver = MagicMock()
+        driver.execute.side_effect = execute
+        driver.execute_script.side_effect = execute_script
+        return driver
+
+    def solve(self, start_angle, gain, calibration=None):
+        driver = self.make_driver()
+        estimator = lambda img: normalize_angle(start_angle + gain * self.state["moved"])
+        actions = TrajectoryActions(driver, rng=random.Random(4))
+        with patch('src.core.captcha.Log'), patch('src.core.captcha.time.sleep'), \
+                patch('src.core.captcha.estimate_angle', side_effect=estimator):
+            planned_drag(actions, driver, MagicMock(), '.track', '#c', tolerance=3, calibration=calibration)
+        actions.pause(0.1).release().perform()
+        return estimator(None), driver.execute.call_count
+
+    def test_plan_chunks(self):
+        """测试分块之和等于目标距离，第一块覆盖大部分距离"""
+        self.assertEqual(plan_chunks(100), [75, 19, 6])
+        self.assertEqual(sum(plan_chunks(-57)), -57)
+        self.assertEqual(plan_chunks(2), [2])
+        self.assertEqual(plan_chunks(0), [])
+
+    def test_requests_per_solve(self):
+        """测试默认步长表下一次求解（含按下、试探、整段轨迹、松开）只发送少量动作请求"""
+        for start, gain in [(70, -1.25), (-110, -1.1), (45, -0.9)]:
+            self.state["moved"] = 0
+            angle, performs = self.solve(start, gain)
+            self.assertLessEqual(abs(angle), 3)
+            self.assertLessEqual(performs, 6)
+
+    def test_replan_on_disagreement(self):
+        """测试标定模型与实际增益不符时按反馈重新规划，仍能收敛"""
+        calibration = SliderCalibration(path=os.devnull)
+        for dx in (4, 8, 12):
+            calibration.add_sample(300, dx, dx * -0.8)
+        angle, performs = self.solve(90, -1.3, calibration)
+        self.assertLessEqual(abs(angle), 3)
+        self.assertLessEqual(performs, 8)
+
+if __name__ == '__main__':
+    unittest.main()
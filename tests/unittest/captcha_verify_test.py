@@ -0,0 +1,141 @@
+import unittest
+from unittest.mock import patch, MagicMock
+import sys
+import os
+
+from selenium.common.exceptions import JavascriptException, NoSuchWindowException, WebDriverException, \
+    TimeoutException
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.core.captcha_verify import CaptchaVerifier, VERIFY_ARM_JS, VISIBLE_STATE_JS
+
+SUCCESS_URL = "https://kq.example.com/"
+LOGIN_URL = "https://kq.example.com/login"
+
+class FakeVerifyPage:
+    """
+    模拟验证结果页面：等待脚本返回预设的信号（或抛出异常模拟页面卸载），
+    读取 current_url 若干次后地址变为 urls 中的下一个
+    """
+    def __init__(self, signal, urls=(LOGIN_URL,), arm=True, state_visible=(False,)):
+        self.signal = signal
+        self.urls = list(urls)
+        self.state_visible = list(state_visible)
+        self.driver = MagicMock()
+        self.driver.execute_script.side_effect = self.execute_script
+        self.driver.execute_async_script.side_effect = self.execute_async_script
+        self.driver.timeouts.script = 30
+        type(self.driver).current_url = property(lambda d: self.current_url())
+        self.arm = arm
+
+    def current_url(self):
+        return self.urls.pop(0) if len(self.urls) > 1 else self.urls[0]
+
+    def execute_script(self, script, *args):
+        if script == VERIFY_ARM_JS:
+            if not self.arm:
+                raise JavascriptException("blocked")
+            return True
+        if script == VISIBLE_STATE_JS:
+            return self.state_visible.pop(0) if len(self.state_visible) > 1 else self.state_visible[0]
+        raise AssertionError(script)
+
+    def execute_async_script(self, script, *args):
+        if isinstance(self.signal, Exception):
+            raise self.signal
+        return self.signal
+
+class TestCaptchaVerifier(unittest.TestCase):
+    def setUp(self):
+        self.log_patcher = patch('src.core.captcha_verify.Log')
+        self.log_patcher.start()
+        self.sleep_patcher = patch('src.core.captcha_verify.time.sleep')
+        self.sleep = self.sleep_patcher.start()
+
+    def tearDown(self):
+        self.sleep_patcher.stop()
+        self.log_patcher.stop()
+
+    def verifier(self, page, **kwargs):
+        verifier = CaptchaVerifier(page.driver, SUCCESS_URL, success_sel='.ok', failure_sel='.fail', **kwargs)
+        verifier.arm()
+        return verifier
+
+    def test_url_signal(self):
+        """测试收到地址变化信号立即判定通过，不做固定等待"""
+        page = FakeVerifyPage({"state": "url", "url": SUCCESS_URL}, urls=[SUCCESS_URL])
+        verifier = self.verifier(page)
+        self.assertTrue(verifier.wait())
+        self.assertEqual(verifier.signal, "url")
+        self.sleep.assert_not_called()
+
+    def test_unload_waits_for_url(self):
+        """测试页面跳转中断等待脚本时，等待地址变为目标页"""
+        page = FakeVerifyPage(JavascriptException("document unloaded while waiting for result"),
+                              urls=[LOGIN_URL, LOGIN_URL, SUCCESS_URL])
+        verifier = self.verifier(page, navigate_timeout=5)
+        self.assertTrue(verifier.wait())
+        self.assertEqual(verifier.signal, "unload")
+
+    def test_closed_window_treated_as_unload(self):
+        """测试窗口已关闭同样按页面跳转处理"""
+        page = FakeVerifyPage(NoSuchWindowException("window closed"), urls=[SUCCESS_URL])
+        verifier = self.verifier(page)
+        self.assertTrue(verifier.wait())
+        self.assertEqual(verifier.signal, "unload")
+
+    def test_other_error_not_awaited(self):
+        """测试与跳转无关的错误记为 error、判定未通过，不等待目标地址"""
+        page = FakeVerifyPage(WebDriverException("invalid session id"), urls=[SUCCESS_URL])
+        verifier = self.verifier(page, navigate_timeout=60)
+        with patch.object(verifier, '_on_url') as on_url:
+            self.assertFalse(verifier.wait())
+        on_url.assert_not_called()
+        self.assertEqual(verifier.signal, "error")
+
+        page = FakeVerifyPage(TimeoutException("script timeout"))
+        verifier = self.verifier(page, navigate_timeout=60)
+        with patch.object(verifier, '_on_url') as on_url:
+            self.assertFalse(verifier.wait())
+        on_url.assert_not_called()
+        self.assertEqual(verifier.signal, "timeout")
+
+    def test_script_timeout_restored(self):
+        """测试等待结束后（包括脚本抛出异常时）恢复原来的脚本超时"""
+        for signal in ({"state": "failure"}, JavascriptException("document unloaded"), WebDriverException("boom")):
+            page = FakeVerifyPage(signal, urls=[SUCCESS_URL])
+            page.driver.timeouts.script = 12.5
+            self.verifier(page, timeout=3).wait()
+            self.assertEqual([c.args[0] for c in page.driver.set_script_timeout.call_args_list], [4, 12.5])
+
+    def test_failure_signal(self):
+        """测试失败状态元素出现时立即判定未通过，并等待提示消失"""
+        page = FakeVerifyPage({"state": "failure"}, state_visible=[True, True, False])
+        verifier = self.verifier(page)
+        self.assertFalse(verifier.wait())
+        self.assertEqual(verifier.signal, "failure")
+        verifier.wait_reset(timeout=5)
+        self.assertEqual(page.state_visible, [False])
+
+    def test_navigate_elsewhere_not_awaited(self):
+        """测试跳转到其他页面时不等待目标地址"""
+        page = FakeVerifyPage({"state": "navigate", "url": LOGIN_URL})
+        verifier = self.verifier(page, navigate_timeout=60)
+        with patch.object(verifier, '_on_url') as on_url:
+            self.assertFalse(verifier.wait())
+        on_url.assert_not_called()
+
+    def test_fallback_sleep(self):
+        """测试监听注入失败时退回固定等待并按地址判断"""
+        page = FakeVerifyPage(None, urls=[SUCCESS_URL], arm=False)
+        verifier = self.verifier(page)
+        self.assertFalse(verifier.armed)
+        self.assertTrue(verifier.wait())
+        self.assertEqual(verifier.signal, "sleep")
+        self.assertEqual(self.sleep.call_count, 2)
+        page.driver.execute_async_script.assert_not_called()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# 共享的测试图片构造函数（fixtures.py）与测试文件同目录，显式加入导入路径，不依赖 pytest 的导入模式
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
@@ -0,0 +1,20 @@
+import cv2
+import numpy as np
+
+# 各测试共用的验证码图片构造函数
+
+def make_picture(seed, size=160):
+    # 低频彩色噪声放大，旋转后纹理仍可辨认
+    rng = np.random.default_rng(seed)
+    noise = (rng.random((size // 8, size // 8, 3)) * 255).astype(np.uint8)
+    return cv2.resize(noise, (size, size), interpolation=cv2.INTER_CUBIC)
+
+def make_image(h=120, w=120, seed=0):
+    # 模糊后的灰度噪声，转为 BGR
+    rng = np.random.default_rng(seed)
+    gray = cv2.GaussianBlur((rng.random((h, w)) * 255).astype(np.uint8), (5, 5), 0)
+    return cv2.cvtColor(gray, cv2.COLOR_GRAY2BGR)
+
+def rotate_image(img, angle):
+    M = cv2.getRotationMatrix2D((img.shape[1] / 2, img.shape[0] / 2), angle, 1.0)
+    return cv2.warpAffine(img, M, (img.shape[1], img.shape[0]), borderMode=cv2.BORDER_REPLICATE)
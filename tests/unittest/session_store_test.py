@@ -0,0 +1,213 @@
+import unittest
+from unittest.mock import patch, MagicMock
+import sys
+import os
+import time
+import tempfile
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.core.session_store import SessionStore, encrypt, decrypt, restore_session, load_session_key, DPAPI_MAGIC
+from src.core.auto_clock import AutoClock, Config
+
+KEY = b"k" * 32
+PROBE_URL = "https://kq.example.com/"
+LOGIN_URL = "https://kq.example.com/login"
+
+def make_cookie(name, expiry=None):
+    cookie = {"name": name, "value": f"{name}-value", "domain": "kq.example.com", "path": "/"}
+    if expiry is not None:
+        cookie["expiry"] = expiry
+    return cookie
+
+class TestSessionCipher(unittest.TestCase):
+    def test_round_trip(self):
+        """测试加密后可解密，相同明文每次密文不同"""
+        plaintext = "会话数据".encode("utf-8") * 20
+        blob = encrypt(KEY, plaintext, b"account")
+        self.assertEqual(decrypt(KEY, blob, b"account"), plaintext)
+        self.assertNotEqual(encrypt(KEY, plaintext, b"account"), blob)
+        self.assertNotIn(plaintext[:12], blob)
+
+    def test_tamper_and_wrong_binding(self):
+        """测试密文被修改、密钥不同或账号不同时解密失败"""
+        blob = encrypt(KEY, b"cookies", b"account")
+        tampered = bytearray(blob)
+        tampered[len(tampered) // 2] ^= 1
+        with self.assertRaises(ValueError):
+            decrypt(KEY, bytes(tampered), b"account")
+        with self.assertRaises(ValueError):
+            decrypt(b"x" * 32, blob, b"account")
+        with self.assertRaises(ValueError):
+            decrypt(KEY, blob, b"other")
+
+class FakeKeyring:
+    """模拟系统密钥环"""
+    def __init__(self):
+        self.passwords = {}
+
+    def get_password(self, service, user):
+        return self.passwords.get((service, user))
+
+    def set_password(self, service, user, password):
+        self.passwords[(service, user)] = password
+
+class TestSessionKey(unittest.TestCase):
+    def setUp(self):
+        self.log_patcher = patch('src.core.session_store.Log')
+        self.log = self.log_patcher.start()
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "session.key")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+        self.log_patcher.stop()
+
+    def test_dpapi_wraps_key(self):
+        """测试 Windows 上密钥文件只保存 DPAPI 加密后的密钥，旧版明文密钥沿用并改为加密保存"""
+        fake_dpapi = lambda data, protect: bytes(b ^ 0x5A for b in data)
+        with patch('src.core.session_store.platform.system', return_value="Windows"), \
+                patch('src.core.session_store._dpapi', side_effect=fake_dpapi):
+            key = load_session_key(self.path)
+            with open(self.path, "rb") as f:
+                raw = f.read()
+            self.assertTrue(raw.startswith(DPAPI_MAGIC))
+            self.assertNotIn(key, raw)
+            self.assertEqual(load_session_key(self.path), key)
+
+            legacy = b"L" * 32
+            with open(self.path, "wb") as f:
+                f.write(legacy)
+            self.assertEqual(load_session_key(self.path), legacy)
+            with open(self.path, "rb") as f:
+                self.assertTrue(f.read().startswith(DPAPI_MAGIC))
+
+    def test_keyring_and_fallback(self):
+        """测试其他系统使用系统密钥环，不写密钥文件；未安装 keyring 时退回明文密钥文件并提示"""
+        keyring = FakeKeyring()
+        with patch('src.core.session_store.platform.system', return_value="Linux"), \
+                patch.dict(sys.modules, {"keyring": keyring}):
+            key = load_session_key(self.path)
+            self.assertEqual(load_session_key(self.path), key)
+        self.assertEqual(len(keyring.passwords), 1)
+        self.assertFalse(os.path.exists(self.path))
+
+        with patch('src.core.session_store.platform.system', return_value="Linux"), \
+                patch.dict(sys.modules, {"keyring": None}):
+            key = load_session_key(self.path)
+        self.assertTrue(os.path.exists(self.path))
+        self.assertEqual(len(key), 32)
+        self.log.waring.assert_called()
+
+class TestSessionStore(unittest.TestCase):
+    def setUp(self):
+        self.log_patcher = patch('src.core.session_store.Log')
+        self.log_patcher.start()
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+        self.log_patcher.stop()
+
+    def store(self, user="alice"):
+        return SessionStore(user, root=self.tmp.name, key=KEY).load()
+
+    def test_save_and_load(self):
+        """测试会话与统计加密保存后可重新加载，文件中不出现账号与 Cookie 明文"""
+        store = self.store()
+        store.put([make_cookie("JSESSIONID")], {"token": "abc"}, PROBE_URL)
+        store.record_full(30.0)
+        store.save()
+
+        with open(store.path, "rb") as f:
+            raw = f.read()
+        self.assertNotIn(b"alice", raw)
+        self.assertNotIn(b"JSESSIONID", raw)
+        self.assertNotIn(b"alice", os.path.basename(store.path).encode())
+
+        loaded = self.store()
+        self.assertEqual(loaded.session["local_storage"], {"token": "abc"})
+        self.assertEqual(loaded.stats["full_seconds"], 30.0)
+        self.assertIsNone(self.store("bob").session)
+
+    def test_hit_rate_and_saved_seconds(self):
+        """测试命中率与节省时间：以完整流程耗时的指数平均为基准"""
+        store = self.store()
+        self.assertIsNone(store.record_run(True, 2.0))
+        store.record_run(False)
+        store.record_full(30.0)
+        store.record_full(40.0)
+        self.assertAlmostEqual(store.stats["full_seconds"], 33.0)
+        self.assertAlmostEqual(store.record_run(True, 3.0), 30.0)
+        self.assertAlmostEqual(store.hit_rate, 2 / 3)
+        self.assertIn("2/3", store.summary())
+        self.assertAlmostEqual(store.stats["saved_seconds"], 30.0)
+
+    def test_restore_skips_expired(self):
+        """测试 Cookie 全部过期时不访问页面直接判定失效"""
+        store = self.store()
+        store.put([make_cookie("JSESSIONID", expiry=time.time() - 10)], {}, PROBE_URL)
+        driver = MagicMock()
+        self.assertFalse(restore_session(driver, store, PROBE_URL, LOGIN_URL))
+        driver.get.assert_not_called()
+
+    def test_restore_probe(self):
+        """测试写入 Cookie 与 localStorage 后访问打卡页，停留在打卡页为有效，被重定向到登录页为失效"""
+        store = self.store()
+        store.put([make_cookie("JSESSIONID"), make_cookie("old", expiry=time.time() - 10)], {"token": "abc"},
+                  PROBE_URL)
+        for final_url, expected in ((PROBE_URL, True), (LOGIN_URL, False)):
+            driver = MagicMock()
+            driver.current_url = final_url
+            driver.find_elements.return_value = []
+            self.assertEqual(restore_session(driver, store, PROBE_URL, LOGIN_URL), expected)
+            self.assertEqual([c.args[0] for c in driver.get.call_args_list], [LOGIN_URL, PROBE_URL])
+            driver.add_cookie.assert_called_once_with(make_cookie("JSESSIONID"))
+            self.assertEqual(driver.execute_script.call_args.args[1], {"token": "abc"})
+
+class TestReuseSession(unittest.TestCase):
+    def setUp(self):
+        self.patchers = [patch('src.core.session_store.Log'), patch('src.core.auto_clock.Log'),
+                         patch.object(AutoClock, 'create_driver', side_effect=lambda: MagicMock())]
+        for patcher in self.patchers:
+            patcher.start()
+        self.tmp = tempfile.TemporaryDirectory()
+        self.store_patcher = patch('src.core.auto_clock.SessionStore',
+                                   side_effect=lambda user: SessionStore(user, root=self.tmp.name, key=KEY))
+        self.store_patcher.start()
+
+    def tearDown(self):
+        self.store_patcher.stop()
+        self.tmp.cleanup()
+        for patcher in reversed(self.patchers):
+            patcher.stop()
+
+    def auto_clock(self):
+        return AutoClock(Config(driver_path="msedgedriver", remote_url=LOGIN_URL, user_name="alice",
+                                user_password="secret"))
+
+    def test_default_off(self):
+        """测试会话复用默认关闭"""
+        self.assertFalse(self.auto_clock().session_reuse)
+
+    def test_no_session_not_cleared(self):
+        """测试没有保存的会话时不访问页面，也不清除 Cookie"""
+        auto_clock = self.auto_clock()
+        self.assertIsNone(auto_clock.reuse_session())
+        auto_clock.driver.get.assert_not_called()
+        auto_clock.driver.delete_all_cookies.assert_not_called()
+
+    def test_invalid_session_cleared(self):
+        """测试写入的会话已失效时清除写入的 Cookie 后再走完整流程"""
+        store = SessionStore("alice", root=self.tmp.name, key=KEY)
+        store.put([make_cookie("JSESSIONID")], {}, PROBE_URL)
+        store.save()
+        auto_clock = self.auto_clock()
+        auto_clock.driver.current_url = LOGIN_URL
+        self.assertIsNone(auto_clock.reuse_session())
+        auto_clock.driver.add_cookie.assert_called_once()
+        auto_clock.driver.delete_all_cookies.assert_called_once()
+
+if __name__ == '__main__':
+    unittest.main()